@@ -1,49 +1,25 @@
-import json
-import os
-from dotenv import load_dotenv
-import sys
-from common_id_utils import find_next_available_id, load_tasks, save_tasks
+"""
+新しいタスクを一括追加する / Bulk insert new tasks
+
+標準入力かファイルから JSON Lines・JSON配列を読み込み、新しいタスクとして追加します。
+一時IDは最後にまとめて確保し、status を省略したタスクは Open になります。
+--upsert を付けると、既存のタスク（id / permanent_id が一致）は更新します。
 
-# data = sys.stdin.read()
-data = """
-[
-  {
-    "title": "3/9 LT発表の資料作成",
-    "description": "3/9のLTに向けて発表資料を作成する。骨子→スライド→ブラッシュアップの順で週内に仕上げる。"
-  },
-  {
-    "title": "Plurality Tokyo Namerakaigiの動画編集・公開",
-    "description": "録画データを簡単に編集し、YouTube等で公開する。発表内容の鮮度を損なわないよう早めの作業が望ましい。"
-  },
-  {
-    "title": "Devinに研究をさせる仕組みを構築",
-    "description": "Devinを拡張し、論文調査や実験検証などを自動で行える環境を整備する。具体的な手法や運用方針を検討し、プロトタイプを作る。"
-  },
-  {
-    "title": "GmailをGeminiに読ませる",
-    "description": "Gmailの内容をGeminiに取り込んで要約や自動仕分けを行う方法を検討・実験する。認証やセキュリティ面の対応も含める。"
-  }
-]
+使用方法 / Usage:
+    cat new_tasks.jsonl | python append_tasks.py
+    python append_tasks.py new_tasks.json [--upsert] [--dry-run] [--quiet]
 """
 
-new_tasks = json.loads(data)
-# check
-for task in new_tasks:
-    assert "title" in task
-    assert "description" in task
+import bulk_upsert
 
-load_dotenv()
 
-tasks = load_tasks()
-ids = find_next_available_id(None, len(new_tasks))
-for id, task in zip(ids, new_tasks):
-    obj = {
-        "id": id,
-        "status": "Open",
-        "title": task["title"],
-        "description": task["description"],
-    }
-    tasks.append(obj)
+def main():
+    bulk_upsert.main(
+        default_mode="insert",
+        source="append_tasks",
+        description="Append new tasks to backlog.json from JSON Lines or a JSON array",
+    )
 
 
-save_tasks(tasks)
+if __name__ == "__main__":
+    main()
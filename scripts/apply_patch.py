@@ -1,48 +1,91 @@
+import argparse
 import os
 import json
-import jsonpatch
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+import sys
+from common_id_utils import get_backlog_path, is_backlog_path, load_backlog_file, save_backlog_file
+from patch_engine import PatchError, apply_patch
+import dependency_index
+import patch_log
 
 
 def apply_json_patch(original_data_path, patch_path, output_path):
     """Apply JSON patch to original data and save the result.
-    
+
+    Tasks can be addressed by position (/tasks/17/status) or by ID
+    (/tasks/@T0042/status). The whole patch is applied in one load/save
+    cycle; if any operation fails nothing is saved. When the backlog is
+    patched in place, the change is recorded in the patch log.
+
     Args:
         original_data_path (str): Path to original JSON file
         patch_path (str): Path to patch file
         output_path (str): Path to save patched result
+
+    Raises:
+        PatchError: If any operation cannot be applied
     """
     print(f"Reading original data from: {original_data_path}")
     print(f"Reading patch from: {patch_path}")
     print(f"Will save output to: {output_path}")
-    
+
     # Load original data
-    with open(original_data_path, "r", encoding="utf-8") as original_file:
-        original_data = json.load(original_file)
+    original_data = load_backlog_file(original_data_path)
 
     # Load patch
     with open(patch_path, "r", encoding="utf-8") as patch_file:
         patch = json.load(patch_file)
 
     # Apply patch
-    patched_data = jsonpatch.apply_patch(original_data, patch)
+    patched_data = apply_patch(original_data, patch)
+
+    # Load the dependency index against the backlog before it is saved
+    in_place = os.path.abspath(output_path) == os.path.abspath(original_data_path)
+    index = None
+    if in_place and is_backlog_path(output_path):
+        index = dependency_index.load_index(output_path, original_data["tasks"])
 
     # Save result
-    with open(output_path, "w", encoding="utf-8") as output_file:
-        json.dump(patched_data, output_file, ensure_ascii=False, indent=2)
-    print("Patch applied successfully")
+    save_backlog_file(output_path, patched_data)
+    if index is not None:
+        index.apply_changes(original_data["tasks"], patched_data["tasks"])
+        dependency_index.save_index(output_path, index)
+
+    # Record the change so it can be undone with patch_log.py
+    if in_place:
+        patch_log.record(
+            output_path,
+            "apply_patch",
+            original_data["tasks"],
+            patched_data["tasks"],
+            note=os.path.basename(patch_path),
+        )
+    print(f"Patch applied successfully ({len(patch)} operations)")
+
+
+def main():
+    from dotenv import load_dotenv
+
+    # Load environment variables
+    load_dotenv()
+
+    # Define default paths
+    backlog_path = get_backlog_path()
+    default_patch_path = os.path.join(os.path.dirname(backlog_path), "patch.json")
 
+    parser = argparse.ArgumentParser(description="Apply a JSON Patch to backlog.json")
+    parser.add_argument("patch", nargs="?", default=default_patch_path, help="Patch file (default: tasks/patch.json)")
+    parser.add_argument("--backlog", default=backlog_path, help="Backlog to patch (default: tasks/backlog.json)")
+    parser.add_argument("--output", help="Where to save the result (default: overwrite the backlog)")
+    args = parser.parse_args()
 
-# Get data root path from environment
-REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-data_root = os.getenv("DATA_ROOT", os.path.join(os.path.dirname(REPO_ROOT), "ai_project_manager_data"))
+    # Execute script
+    try:
+        apply_json_patch(args.backlog, args.patch, args.output or args.backlog)
+    except PatchError as e:
+        print(f"Error: {e}")
+        print("No changes were saved.")
+        sys.exit(1)
 
-# Define paths
-BACKLOG_PATH = os.path.join(data_root, "tasks", "backlog.json")
-PATCH_PATH = os.path.join(data_root, "tasks", "patch.json")
 
-# Execute script
-apply_json_patch(BACKLOG_PATH, PATCH_PATH, BACKLOG_PATH)
+if __name__ == "__main__":
+    main()
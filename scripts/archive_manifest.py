@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+アーカイブのIDマニフェスト / Incremental manifest of archived task IDs
+
+tasks/archive 内の各ファイル（日付別のJSON・セグメント・月別パック）について、
+更新時刻・サイズと、含まれるタスクの要約（ID・永続ID・タイトル・completion_time・
+ラベル・アーカイブ日）を tasks/.archive_manifest.json に記録します。
+更新時刻かサイズが変わったファイルだけを読み直すため、日次アーカイブが
+何年分たまってもIDの参照や archive_query.py の検索は速いままです。
+Records each archive file's (daily JSON, segment or monthly pack) mtime,
+size and task summaries (ID, permanent ID, title, completion_time, labels,
+archive date) in tasks/.archive_manifest.json. Only files whose stamp
+changed are re-read, so ID lookups and archive_query.py stay fast after
+years of daily archives. Monthly packs are summarized from their embedded
+index without decompressing any tasks.
+
+使用方法 / Usage:
+    python archive_manifest.py refresh   マニフェストを更新 / Refresh the manifest
+    python archive_manifest.py rebuild   全ファイルを読み直す / Re-read every file
+"""
+
+import json
+import os
+import sys
+import zipfile
+from typing import Dict, Iterator, List, Optional
+
+import archive_pack
+import archive_store
+
+MANIFEST_VERSION = 2
+
+
+def get_manifest_path(archive_dir: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(archive_dir)), ".archive_manifest.json")
+
+
+def load_manifest(manifest_path: str) -> Dict:
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except json.JSONDecodeError:
+            pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def save_manifest(manifest: Dict, manifest_path: str) -> None:
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, manifest_path)
+
+
+def summarize_task(task: Dict, date: str, position: int) -> Dict:
+    """
+    マニフェストに記録するタスクの要約
+    date: アーカイブ日、position: ファイル内の同じアーカイブ日のタスクの中での位置
+    """
+    labels = task.get("labels")
+    return {
+        "id": task.get("id"),
+        "permanent_id": task.get("permanent_id"),
+        "title": task.get("title", "Unknown (Archived)"),
+        "completion_time": task.get("completion_time"),
+        "labels": labels if isinstance(labels, list) else [],
+        "date": date,
+        "position": position,
+    }
+
+
+def summarize_file(path: str) -> List[Dict]:
+    """アーカイブファイルのタスクの要約（パックは索引だけを読む）"""
+    if archive_pack.is_pack(path):
+        members = archive_pack.read_index(path)["members"]
+        return [
+            summarize_task(task, name[: -len(".json")], position)
+            for name in sorted(members)
+            for position, task in enumerate(members[name]["tasks"])
+        ]
+    summaries = []
+    positions: Dict[str, int] = {}
+    for date, task in archive_store.iter_archive_file(path):
+        if not isinstance(task, dict):
+            continue
+        position = positions.get(date, 0)
+        positions[date] = position + 1
+        summaries.append(summarize_task(task, date, position))
+    return summaries
+
+
+def refresh_manifest(archive_dir: str, manifest_path: Optional[str] = None) -> Dict:
+    """
+    更新時刻・サイズが変わったアーカイブファイルだけを読み直してマニフェストを更新する
+    戻り値：更新後のマニフェスト
+    """
+    manifest_path = manifest_path or get_manifest_path(archive_dir)
+    manifest = load_manifest(manifest_path)
+    if not os.path.exists(archive_dir):
+        return manifest
+
+    files = manifest["files"]
+    seen = set()
+    changed = False
+
+    for entry in os.scandir(archive_dir):
+        if not entry.is_file() or not archive_store.is_archive_file(entry.name):
+            continue
+        seen.add(entry.name)
+        stat = entry.stat()
+        known = files.get(entry.name)
+        if (
+            known
+            and known["mtime_ns"] == stat.st_mtime_ns
+            and known["size"] == stat.st_size
+        ):
+            continue
+
+        try:
+            summaries = summarize_file(entry.path)
+        except (json.JSONDecodeError, FileNotFoundError, KeyError, zipfile.BadZipFile) as e:
+            print(f"Warning: Error reading archive file {entry.name}: {e}")
+            files.pop(entry.name, None)
+            changed = True
+            continue
+
+        files[entry.name] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "tasks": summaries,
+        }
+        changed = True
+
+    for name in list(files):
+        if name not in seen:
+            del files[name]
+            changed = True
+
+    if changed:
+        save_manifest(manifest, manifest_path)
+    return manifest
+
+
+def iter_manifest_tasks(manifest: Dict) -> Iterator[Dict]:
+    """マニフェストに記録されたタスクの要約を（ファイル名順に）返す"""
+    for name in sorted(manifest["files"]):
+        yield from manifest["files"][name]["tasks"]
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path
+
+    load_dotenv()
+
+    if len(sys.argv) != 2 or sys.argv[1] not in ["refresh", "rebuild"]:
+        print(__doc__)
+        sys.exit(1)
+
+    archive_dir = os.path.join(os.path.dirname(get_backlog_path()), "archive")
+    manifest_path = get_manifest_path(archive_dir)
+    if sys.argv[1] == "rebuild" and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    manifest = refresh_manifest(archive_dir, manifest_path)
+    count = sum(len(f["tasks"]) for f in manifest["files"].values())
+    print(f"{len(manifest['files'])} archive files, {count} tasks: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+月別アーカイブパック / Monthly compressed archive packs
+
+締まった月（今月より前）の日付別アーカイブ tasks/archive/YYYY-MM-DD.json を
+月ごとに1つのZIPファイル tasks/archive/pack-YYYY-MM.zip にまとめます。
+日付別のファイルはそれぞれLZMAで圧縮したメンバーになり、メンバー index.json に
+タスクごとのID・永続ID・タイトル・completion_time・ラベルと、日ごとの completion_time の範囲とラベルを記録します。
+Folds the daily archives of closed months (before the current month) into
+one ZIP file per month, tasks/archive/pack-YYYY-MM.zip. Each daily file
+becomes an LZMA-compressed member, and the index.json member records each
+task's ID, permanent ID, title, completion_time and labels, plus the
+completion_time range and labels of every day.
+
+- 索引は小さなメンバーなので、タスク本体を展開せずに読める
+  The index is a small member, readable without decompressing any tasks
+- 必要な日付のメンバーだけを展開できる（archive_store.iter_archive_tasks）
+  Only the members for the requested dates are decompressed
+- 既にパックがある月に日付別のファイルが増えた場合は、パックに統合する
+  Daily files that show up later for an already packed month are merged in
+- メンバーの更新時刻は固定なので、同じ内容からは同じパックができる
+  Member timestamps are fixed, so the same content always produces the same pack
+
+使用方法 / Usage:
+    python archive_pack.py compact [--before YYYY-MM] [--dry-run]   締まった月をまとめる / Pack closed months
+    python archive_pack.py list                                    パックの索引を表示 / Show pack indexes
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+PACK_PREFIX = "pack-"
+PACK_SUFFIX = ".zip"
+INDEX_MEMBER = "index.json"
+PACK_VERSION = 1
+
+_DAILY_NAME = re.compile(r"^(\d{4}-\d{2})-\d{2}\.json$")
+
+
+def is_pack(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.startswith(PACK_PREFIX) and name.endswith(PACK_SUFFIX)
+
+
+def get_pack_path(archive_dir: str, month: str) -> str:
+    return os.path.join(archive_dir, f"{PACK_PREFIX}{month}{PACK_SUFFIX}")
+
+
+def summarize_member(tasks: List[Dict]) -> Dict:
+    """1日分のタスクの索引"""
+    times = [
+        task["completion_time"]
+        for task in tasks
+        if isinstance(task, dict) and isinstance(task.get("completion_time"), str)
+    ]
+    labels = {
+        label
+        for task in tasks
+        if isinstance(task, dict) and isinstance(task.get("labels"), list)
+        for label in task["labels"]
+        if isinstance(label, str)
+    }
+    return {
+        "count": len(tasks),
+        "tasks": [
+            {
+                "id": task.get("id"),
+                "permanent_id": task.get("permanent_id"),
+                "title": task.get("title", "Unknown (Archived)"),
+                "completion_time": task.get("completion_time"),
+                "labels": task.get("labels", []),
+            }
+            for task in tasks
+            if isinstance(task, dict)
+        ],
+        "completion_time": [min(times), max(times)] if times else None,
+        "labels": sorted(labels),
+    }
+
+
+def build_index(month: str, members: Dict[str, List[Dict]]) -> Dict:
+    summaries = {name: summarize_member(tasks) for name, tasks in sorted(members.items())}
+    ranges = [s["completion_time"] for s in summaries.values() if s["completion_time"]]
+    return {
+        "version": PACK_VERSION,
+        "month": month,
+        "count": sum(s["count"] for s in summaries.values()),
+        "completion_time": (
+            [min(r[0] for r in ranges), max(r[1] for r in ranges)] if ranges else None
+        ),
+        "labels": sorted({label for s in summaries.values() for label in s["labels"]}),
+        "members": summaries,
+    }
+
+
+def read_index(path: str) -> Dict:
+    """パックの索引（タスク本体は展開しない）"""
+    with zipfile.ZipFile(path) as pack:
+        return json.loads(pack.read(INDEX_MEMBER))
+
+
+def read_member(pack: zipfile.ZipFile, name: str) -> List[Dict]:
+    data = json.loads(pack.read(name))
+    return data.get("tasks", []) if isinstance(data, dict) else []
+
+
+def iter_pack(
+    path: str, dates: Optional[Iterable[str]] = None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    パックのタスクを (アーカイブ日, タスク) で返す
+    dates を渡すとその日付のメンバーだけを展開する
+    """
+    wanted = None if dates is None else {f"{date}.json" for date in dates}
+    with zipfile.ZipFile(path) as pack:
+        for name in sorted(pack.namelist()):
+            if name == INDEX_MEMBER or (wanted is not None and name not in wanted):
+                continue
+            date = name[: -len(".json")]
+            for task in read_member(pack, name):
+                yield date, task
+
+
+def read_pack(path: str) -> Dict[str, List[Dict]]:
+    """パックの全メンバー（ファイル名 -> タスク）"""
+    with zipfile.ZipFile(path) as pack:
+        return {
+            name: read_member(pack, name)
+            for name in pack.namelist()
+            if name != INDEX_MEMBER
+        }
+
+
+def _member_info(name: str, month: str, compress_type: int) -> zipfile.ZipInfo:
+    year, mon = (int(part) for part in month.split("-"))
+    info = zipfile.ZipInfo(name, date_time=(year, mon, 1, 0, 0, 0))
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def write_pack(path: str, month: str, members: Dict[str, List[Dict]]) -> Dict:
+    """パックを一時ファイルに書いてから置き換える。戻り値：索引"""
+    index = build_index(month, members)
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w") as pack:
+        pack.writestr(
+            _member_info(INDEX_MEMBER, month, zipfile.ZIP_DEFLATED),
+            json.dumps(index, ensure_ascii=False, separators=(",", ":")),
+        )
+        for name in sorted(members):
+            pack.writestr(
+                _member_info(name, month, zipfile.ZIP_LZMA),
+                json.dumps({"tasks": members[name]}, ensure_ascii=False, separators=(",", ":")),
+            )
+    os.replace(tmp_path, path)
+    return index
+
+
+def list_packs(archive_dir: str) -> List[str]:
+    if not os.path.exists(archive_dir):
+        return []
+    return sorted(
+        entry.path
+        for entry in os.scandir(archive_dir)
+        if entry.is_file() and is_pack(entry.name)
+    )
+
+
+def find_closed_months(archive_dir: str, before: str) -> Dict[str, List[str]]:
+    """before（YYYY-MM）より前の月の日付別ファイル（月 -> パス）"""
+    months: Dict[str, List[str]] = {}
+    if not os.path.exists(archive_dir):
+        return months
+    for entry in os.scandir(archive_dir):
+        m = _DAILY_NAME.match(entry.name)
+        if entry.is_file() and m and m.group(1) < before:
+            months.setdefault(m.group(1), []).append(entry.path)
+    for paths in months.values():
+        paths.sort()
+    return dict(sorted(months.items()))
+
+
+def compact_month(archive_dir: str, month: str, paths: List[str]) -> Dict:
+    """
+    1か月分の日付別ファイルをパックにまとめ、元のファイルを削除する
+    既にパックがあれば、その内容に追加する（同じ日付のメンバーはタスクを後ろに足す）
+    戻り値：パックの索引
+    """
+    pack_path = get_pack_path(archive_dir, month)
+    members = read_pack(pack_path) if os.path.exists(pack_path) else {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        tasks = data.get("tasks", []) if isinstance(data, dict) else []
+        member = members.setdefault(os.path.basename(path), [])
+        # 前回の圧縮が元のファイルを消す前に中断された場合に、同じタスクを二重に入れない
+        packed = {json.dumps(task, sort_keys=True) for task in member}
+        member.extend(task for task in tasks if json.dumps(task, sort_keys=True) not in packed)
+
+    index = write_pack(pack_path, month, members)
+    # 書き込んだパックの全メンバーのCRCを確かめてから元のファイルを消す
+    with zipfile.ZipFile(pack_path) as pack:
+        if pack.testzip() is not None:
+            raise ValueError(f"Pack verification failed: {pack_path}")
+    for path in paths:
+        os.remove(path)
+    return index
+
+
+def compact_archive(
+    archive_dir: str, before: Optional[str] = None, dry_run: bool = False
+) -> List[Tuple[str, int, int]]:
+    """
+    締まった月をすべてパックにまとめる
+    before: この月（YYYY-MM）より前を対象にする（省略時は今月）
+    戻り値：[(月, まとめた日付別ファイルの数, パックのタスク数)]
+    """
+    before = before or datetime.date.today().strftime("%Y-%m")
+    results = []
+    for month, paths in find_closed_months(archive_dir, before).items():
+        if dry_run:
+            results.append((month, len(paths), 0))
+            continue
+        index = compact_month(archive_dir, month, paths)
+        results.append((month, len(paths), index["count"]))
+    return results
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Pack closed months of daily archives")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser("compact", help="Pack daily archives of closed months")
+    compact_parser.add_argument("--before", help="Pack months before this one (YYYY-MM, default: this month)")
+    compact_parser.add_argument("--dry-run", action="store_true", help="Only show what would be packed")
+    subparsers.add_parser("list", help="Show pack indexes")
+    args = parser.parse_args()
+
+    archive_dir = os.path.join(os.path.dirname(get_backlog_path()), "archive")
+
+    if args.command == "compact":
+        if args.before and not re.match(r"^\d{4}-\d{2}$", args.before):
+            parser.error(f"Invalid --before: {args.before} (must be YYYY-MM)")
+        results = compact_archive(archive_dir, args.before, args.dry_run)
+        for month, files, count in results:
+            if args.dry_run:
+                print(f"{month}: {files} daily files would be packed")
+            else:
+                print(f"{month}: packed {files} daily files ({count} tasks in {PACK_PREFIX}{month}{PACK_SUFFIX})")
+        if not results:
+            print("No closed months to pack.")
+        return
+
+    for path in list_packs(archive_dir):
+        index = read_index(path)
+        times = index["completion_time"] or ["-", "-"]
+        print(
+            f"{os.path.basename(path)}: {index['count']} tasks in {len(index['members'])} days, "
+            f"completed {times[0]} - {times[1]}, {os.path.getsize(path)} bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
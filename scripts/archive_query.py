@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+アーカイブの検索 / Query completed tasks in the archive
+
+「Xはいつ終わったか」「3月に何を終えたか」に答えるための検索です。
+archive_manifest.py のマニフェスト（変更されたアーカイブファイルだけを読み直す）から
+ID・ラベル・完了日時の索引をメモリ上に作り、ID・永続ID、完了日時の範囲、ラベル、
+タイトルのキーワードで絞り込みます。タスク本体が必要なときは、該当するファイル
+（パックなら該当する日付のメンバー）だけを読み込みます。
+Answers "when did I finish X" and "what got done in March". In-memory
+indexes by ID, label and completion time are built from the
+archive_manifest.py manifest (which re-reads only changed archive files),
+and tasks are filtered by id / permanent_id, completion_time range, label
+and title keyword. Full task bodies are read only from the matching files
+(only the matching day's member of a pack).
+
+- 完了日時は completion_time、なければアーカイブ日で比べる
+  The completion time is completion_time, or the archive date when missing
+- 日付の範囲は両端を含む / Date ranges are inclusive
+
+使用方法 / Usage:
+    python archive_query.py [--id ID ...] [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+                            [--label LABEL] [--title KEYWORD] [--limit N] [--full | --json]
+
+例 / Examples:
+    python archive_query.py --id T0026
+    python archive_query.py --from 2025-03-01 --to 2025-03-31 --label automation
+    python archive_query.py --title バックアップ --full
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sys
+from typing import Dict, Iterable, List, Optional
+
+import archive_store
+from archive_manifest import refresh_manifest
+
+
+def completion_key(record: Dict) -> str:
+    """並べ替えと範囲の比較に使う完了日時"""
+    completion_time = record.get("completion_time")
+    if isinstance(completion_time, str) and completion_time:
+        return completion_time
+    return record.get("date") or ""
+
+
+class ArchiveIndex:
+    """マニフェストのタスクの要約に対する索引（要約には file を加える）"""
+
+    def __init__(self, records: List[Dict]):
+        self.records = records
+        self.by_id: Dict[str, List[int]] = {}
+        self.by_label: Dict[str, List[int]] = {}
+        for position, record in enumerate(records):
+            for field in ("id", "permanent_id"):
+                value = record.get(field)
+                if isinstance(value, str) and value:
+                    self.by_id.setdefault(value, []).append(position)
+            for label in record.get("labels") or []:
+                if isinstance(label, str):
+                    self.by_label.setdefault(label, []).append(position)
+        order = sorted(range(len(records)), key=lambda p: completion_key(records[p]))
+        self.time_order = order
+        self.time_keys = [completion_key(records[p]) for p in order]
+
+    @classmethod
+    def load(cls, archive_dir: str) -> "ArchiveIndex":
+        """マニフェストを更新して索引を作る"""
+        manifest = refresh_manifest(archive_dir)
+        records = []
+        for name in sorted(manifest["files"]):
+            for summary in manifest["files"][name]["tasks"]:
+                records.append(dict(summary, file=name))
+        return cls(records)
+
+    def _time_range(self, date_from: Optional[str], date_to: Optional[str]) -> List[int]:
+        start = bisect.bisect_left(self.time_keys, date_from) if date_from else 0
+        # date_to の日付全体を含めるため、その日付で始まるどの文字列よりも大きい値で切る
+        end = (
+            bisect.bisect_right(self.time_keys, date_to + "\uffff")
+            if date_to
+            else len(self.time_keys)
+        )
+        return self.time_order[start:end]
+
+    def find(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        label: Optional[str] = None,
+        keyword: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        条件をすべて満たすタスクの要約を完了日時の順に返す
+        最も絞り込める索引で候補を作り、残りの条件は候補だけに適用する
+        """
+        if ids is not None:
+            candidates = sorted({p for i in ids for p in self.by_id.get(i, [])})
+        elif label is not None:
+            candidates = self.by_label.get(label, [])
+        else:
+            candidates = self._time_range(date_from, date_to)
+
+        keyword = keyword.lower() if keyword else None
+        results = []
+        for position in candidates:
+            record = self.records[position]
+            key = completion_key(record)
+            if date_from and key < date_from:
+                continue
+            if date_to and key[:10] > date_to:
+                continue
+            if label is not None and label not in (record.get("labels") or []):
+                continue
+            if keyword and keyword not in str(record.get("title", "")).lower():
+                continue
+            results.append(record)
+        results.sort(key=completion_key)
+        return results
+
+
+def load_tasks(archive_dir: str, records: List[Dict]) -> List[Optional[Dict]]:
+    """
+    要約に対応するタスク本体を読み込む（要約と同じ順）
+    該当するファイルの該当する日付だけを読む。見つからないタスク（索引の後にファイルが変わった）はNone
+    """
+    wanted: Dict[str, Dict[str, set]] = {}
+    for record in records:
+        wanted.setdefault(record["file"], {}).setdefault(record["date"], set()).add(
+            record["position"]
+        )
+
+    found = {}
+    for name, dates in wanted.items():
+        positions: Dict[str, int] = {}
+        path = os.path.join(archive_dir, name)
+        for date, task in archive_store.iter_archive_file(path, list(dates)):
+            if not isinstance(task, dict):
+                continue
+            position = positions.get(date, 0)
+            positions[date] = position + 1
+            if position in dates[date]:
+                found[(name, date, position)] = task
+    return [found.get((r["file"], r["date"], r["position"])) for r in records]
+
+
+def format_record(record: Dict) -> str:
+    labels = ", ".join(record.get("labels") or [])
+    return (
+        f"{completion_key(record):19}  {record.get('id') or '-':5}  {record.get('title')}"
+        + (f"  [{labels}]" if labels else "")
+        + f"  ({record['file']})"
+    )
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Query completed tasks in the archive")
+    parser.add_argument("--id", nargs="+", dest="ids", help="Temporary or permanent IDs")
+    parser.add_argument("--from", dest="date_from", help="Completed on or after (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="Completed on or before (YYYY-MM-DD)")
+    parser.add_argument("--label", help="Label")
+    parser.add_argument("--title", help="Keyword in the title (case-insensitive)")
+    parser.add_argument("--limit", type=int, help="Show at most N tasks (the most recent ones)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--full", action="store_true", help="Print the full archived tasks")
+    output.add_argument("--json", action="store_true", help="Print the matching summaries as JSON")
+    args = parser.parse_args()
+
+    archive_dir = os.path.join(os.path.dirname(get_backlog_path()), "archive")
+    index = ArchiveIndex.load(archive_dir)
+    records = index.find(args.ids, args.date_from, args.date_to, args.label, args.title)
+    if args.limit is not None:
+        records = records[-args.limit :] if args.limit > 0 else []
+
+    if args.full:
+        tasks = [task for task in load_tasks(archive_dir, records) if task is not None]
+        print(json.dumps(tasks, ensure_ascii=False, indent=2))
+    elif args.json:
+        print(json.dumps(records, ensure_ascii=False, indent=2))
+    else:
+        for record in records:
+            print(format_record(record))
+        print(f"{len(records)} tasks found.")
+    sys.exit(0 if records else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+追記型のアーカイブ / Append-only JSON Lines archive segments
+
+完了タスクを日付別のJSONファイルに書き直す代わりに、
+tasks/archive/segment-NNNNNN.jsonl に1行1タスクで追記します。
+1回のアーカイブ（バッチ）ごとに末尾へフッター行を書き、フッターには
+アーカイブ日・件数・ID・永続IDと、1つ前のフッターの位置を記録します。
+Instead of rewriting a daily JSON file, done tasks are appended one per line
+to tasks/archive/segment-NNNNNN.jsonl. Each archive run (batch) ends with a
+footer line holding the archive date, count, IDs, permanent IDs and the
+offset of the previous footer.
+
+    {...task...}
+    {...task...}
+    {"_footer": {"date": "2025-03-01", "count": 2, "ids": [...], "permanent_ids": [...], "prev": null}}
+
+- 追記のコストはアーカイブするタスク数に比例し、既存のアーカイブは読み直さない
+  Appending costs O(tasks moved); existing archive data is never re-read
+- セグメントの索引（日付の範囲・ID）はフッターを末尾からたどるだけで得られる
+  A segment's index (date range, IDs) is read by walking the footer chain
+- フッターのないバッチ（書き込み途中で中断されたもの）は読み飛ばし、同じセグメントへの次の追記で切り詰める
+  A batch without its footer (torn write) is ignored and truncated by the next append to that segment
+- セグメントが ARCHIVE_SEGMENT_MAX_BYTES（既定8MB）を超えると次のセグメントに移る
+  A new segment is started once the current one exceeds ARCHIVE_SEGMENT_MAX_BYTES (8MB)
+
+有効化 / Enable:
+    ARCHIVE_FORMAT=jsonl   （既定は json：日付別の YYYY-MM-DD.json / default: daily YYYY-MM-DD.json）
+
+使用方法 / Usage:
+    python archive_store.py status   セグメントの索引を表示 / Show segment indexes
+"""
+
+import json
+import os
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import archive_pack
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+FOOTER_KEY = "_footer"
+
+SEGMENT_MAX_BYTES = int(os.getenv("ARCHIVE_SEGMENT_MAX_BYTES", 8 * 1024 * 1024))
+
+# 末尾からフッターを探すときの読み込み単位
+_TAIL_BLOCK = 64 * 1024
+
+
+def get_archive_format() -> str:
+    """
+    アーカイブの保存形式を返す（環境変数 ARCHIVE_FORMAT）
+    - json: 日付別の YYYY-MM-DD.json を読み込んで全体を書き直す（デフォルト）
+    - jsonl: セグメントに追記する
+    """
+    return os.getenv("ARCHIVE_FORMAT", "json")
+
+
+def is_segment(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+
+
+def is_compact_file(path: str) -> bool:
+    """日付別のJSONではない形式（セグメントか月別パック）か"""
+    return is_segment(path) or archive_pack.is_pack(path)
+
+
+def is_archive_file(path: str) -> bool:
+    """日付別のJSONファイル・セグメント・月別パックのいずれかか"""
+    return path.endswith(".json") or is_compact_file(path)
+
+
+def list_segments(archive_dir: str) -> List[str]:
+    if not os.path.exists(archive_dir):
+        return []
+    return sorted(
+        entry.path
+        for entry in os.scandir(archive_dir)
+        if entry.is_file() and is_segment(entry.name)
+    )
+
+
+def list_archive_files(archive_dir: str) -> List[str]:
+    """日付別のJSONファイル・セグメント・月別パック（ファイル名順）"""
+    if not os.path.exists(archive_dir):
+        return []
+    return sorted(
+        entry.path
+        for entry in os.scandir(archive_dir)
+        if entry.is_file() and is_archive_file(entry.name)
+    )
+
+
+def _parse_footer(line: bytes) -> Optional[Dict]:
+    if not line.startswith(b'{"' + FOOTER_KEY.encode() + b'"'):
+        return None
+    try:
+        record = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    footer = record.get(FOOTER_KEY) if isinstance(record, dict) else None
+    return footer if isinstance(footer, dict) else None
+
+
+def find_last_footer(f) -> Tuple[Optional[int], Optional[Dict], int]:
+    """
+    バイナリモードで開いたセグメントの末尾から最後のフッターを探す
+    戻り値：(フッター行の位置, フッター, フッター行の終端)。フッターがなければ (None, None, 0)
+    """
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    buf = b""
+    block_start = end
+    while block_start > 0:
+        read_size = min(_TAIL_BLOCK, block_start)
+        block_start -= read_size
+        f.seek(block_start)
+        buf = f.read(read_size) + buf
+        # buf 内の完全な行を後ろから調べる（先頭の断片は次のブロックと合わせて読む）
+        line_end = len(buf)
+        if not buf.endswith(b"\n"):
+            # 途中で中断された最終行 / torn write at the tail
+            line_end = buf.rfind(b"\n") + 1
+        while line_end > 0:
+            line_start = buf.rfind(b"\n", 0, line_end - 1) + 1
+            if line_start == 0 and block_start > 0:
+                break
+            footer = _parse_footer(buf[line_start:line_end])
+            if footer is not None:
+                return block_start + line_start, footer, block_start + line_end
+            line_end = line_start
+        buf = buf[:line_end]
+    return None, None, 0
+
+
+def read_footers(path: str) -> List[Dict]:
+    """セグメントのフッターを古い順に返す（prev をたどるのでタスクの行は読まない）"""
+    footers = []
+    with open(path, "rb") as f:
+        offset, footer, _ = find_last_footer(f)
+        while footer is not None:
+            footers.append(footer)
+            offset = footer.get("prev")
+            if offset is None:
+                break
+            f.seek(offset)
+            footer = _parse_footer(f.readline())
+    footers.reverse()
+    return footers
+
+
+def read_segment_index(path: str) -> Dict:
+    """セグメントの索引：件数、アーカイブ日の範囲、ID、永続ID"""
+    footers = read_footers(path)
+    dates = [footer["date"] for footer in footers]
+    return {
+        "count": sum(footer["count"] for footer in footers),
+        "first_date": min(dates) if dates else None,
+        "last_date": max(dates) if dates else None,
+        "ids": [task_id for footer in footers for task_id in footer["ids"]],
+        "permanent_ids": [pid for footer in footers for pid in footer["permanent_ids"]],
+    }
+
+
+def iter_segment(path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    セグメントのタスクを (アーカイブ日, タスク) で順に返す
+    フッターまで書き終えたバッチだけを返すので、保持するのは1バッチ分だけ
+    """
+    batch: List[Dict] = []
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            footer = _parse_footer(line)
+            if footer is not None:
+                for task in batch:
+                    yield footer["date"], task
+                batch = []
+            elif line.strip():
+                batch.append(json.loads(line))
+
+
+def read_archive_file(path: str) -> List[Dict]:
+    """日付別のJSONファイル・セグメント・月別パックのタスクを返す"""
+    if is_segment(path):
+        return [task for _, task in iter_segment(path)]
+    if archive_pack.is_pack(path):
+        return [task for _, task in archive_pack.iter_pack(path)]
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("tasks", []) if isinstance(data, dict) else []
+
+
+def iter_archive_file(
+    path: str, dates: Optional[List[str]] = None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    1つのアーカイブファイルのタスクを (アーカイブ日, タスク) で返す
+    dates を渡すとその日付のタスクだけを返す（パックはその日付のメンバーだけを展開する）
+    """
+    if archive_pack.is_pack(path):
+        yield from archive_pack.iter_pack(path, dates)
+        return
+    if is_segment(path):
+        tasks = iter_segment(path)
+    else:
+        date = os.path.basename(path)[: -len(".json")]
+        if dates is not None and date not in dates:
+            return
+        tasks = ((date, task) for task in read_archive_file(path))
+    for date, task in tasks:
+        if dates is None or date in dates:
+            yield date, task
+
+
+def iter_archive_tasks(
+    archive_dir: str, date_from: Optional[str] = None, date_to: Optional[str] = None
+) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    アーカイブのタスクを (ファイル名, アーカイブ日, タスク) で返す
+    日付別のJSONファイルは1ファイルずつ、セグメントは1バッチずつ、パックは1日分ずつ読み込む
+    date_from / date_to（YYYY-MM-DD、両端を含む）を渡すと、範囲外のファイル・パック・メンバーは開かない
+    """
+
+    def in_range(first: Optional[str], last: Optional[str]) -> bool:
+        if first is None:
+            return False
+        return (date_from is None or last >= date_from) and (date_to is None or first <= date_to)
+
+    for path in list_archive_files(archive_dir):
+        name = os.path.basename(path)
+        if is_segment(path):
+            if date_from is not None or date_to is not None:
+                index = read_segment_index(path)
+                if not in_range(index["first_date"], index["last_date"]):
+                    continue
+            for date, task in iter_segment(path):
+                if in_range(date, date):
+                    yield name, date, task
+        elif archive_pack.is_pack(path):
+            month = name[len(archive_pack.PACK_PREFIX) : -len(archive_pack.PACK_SUFFIX)]
+            if not in_range(f"{month}-01", f"{month}-31"):
+                continue
+            dates = None
+            if date_from is not None or date_to is not None:
+                members = archive_pack.read_index(path)["members"]
+                dates = [m[: -len(".json")] for m in members if in_range(m[:10], m[:10])]
+            for date, task in archive_pack.iter_pack(path, dates):
+                yield name, date, task
+        else:
+            date = name[: -len(".json")]
+            if not in_range(date, date):
+                continue
+            for task in read_archive_file(path):
+                yield name, date, task
+
+
+def _serialize(record: Dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _segment_path(archive_dir: str, number: int) -> str:
+    return os.path.join(archive_dir, f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}")
+
+
+def append_tasks(archive_dir: str, tasks: List[Dict], date: str) -> Optional[str]:
+    """
+    タスクを最新のセグメントに1バッチとして追記する（満杯なら新しいセグメントを作る）
+    戻り値：書き込んだセグメントのパス（タスクがなければNone）
+    """
+    if not tasks:
+        return None
+    os.makedirs(archive_dir, exist_ok=True)
+
+    segments = list_segments(archive_dir)
+    if segments and os.path.getsize(segments[-1]) < SEGMENT_MAX_BYTES:
+        path = segments[-1]
+    elif segments:
+        name = os.path.basename(segments[-1])
+        number = int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+        path = _segment_path(archive_dir, number + 1)
+    else:
+        path = _segment_path(archive_dir, 1)
+
+    footer = {
+        "date": date,
+        "count": len(tasks),
+        "ids": [task.get("id") for task in tasks],
+        "permanent_ids": [task.get("permanent_id") for task in tasks],
+        "prev": None,
+    }
+    with open(path, "a+b") as f:
+        prev, _, committed = find_last_footer(f)
+        f.seek(0, os.SEEK_END)
+        if f.tell() != committed:
+            # フッターのない中断されたバッチを捨てる
+            f.truncate(committed)
+        footer["prev"] = prev
+        f.write(b"".join(_serialize(task) for task in tasks) + _serialize({FOOTER_KEY: footer}))
+        f.flush()
+        os.fsync(f.fileno())
+    return path
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path
+
+    load_dotenv()
+
+    if len(sys.argv) != 2 or sys.argv[1] != "status":
+        print(__doc__)
+        sys.exit(1)
+
+    archive_dir = os.path.join(os.path.dirname(get_backlog_path()), "archive")
+    segments = list_segments(archive_dir)
+    for path in segments:
+        index = read_segment_index(path)
+        print(
+            f"{os.path.basename(path)}: {index['count']} tasks, "
+            f"{index['first_date']} - {index['last_date']}, {os.path.getsize(path)} bytes"
+        )
+    print(f"{len(segments)} segments (ARCHIVE_FORMAT={get_archive_format()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@
 使用方法：
     手動実行: python scripts/archive_tasks.py [--date YYYY-MM-DD]
     GitHub Actions: 毎朝5時に自動実行（前日までの完了タスクを移動）
+保存形式：
+    ARCHIVE_FORMAT=json（デフォルト）: tasks/archive/YYYY-MM-DD.json を読み込んで書き直す
+    ARCHIVE_FORMAT=jsonl: tasks/archive/segment-NNNNNN.jsonl に追記する（archive_store.py）
 """
 
 import argparse
@@ -13,6 +16,9 @@ import sys
 import json
 from typing import Dict, List, Optional, Tuple
 
+import archive_store
+from common_id_utils import load_tasks, save_tasks
+
 # Load environment variables
 from dotenv import load_dotenv
 
@@ -94,7 +100,7 @@ def check_expired_tasks(
     valid = []
 
     for task in tasks:
-        if task.get("status").lower() == "done":
+        if (task.get("status") or "").lower() == "done":
             continue
         due_date = task.get("due_date")
         if due_date:
@@ -132,8 +138,8 @@ def move_done_tasks(target_date: Optional[str] = None) -> None:
     # backup_path = create_backup(BACKLOG_FILE, BACKUP_DIR)
     # print(f"Created backup: {backup_path}")
 
-    # タスクの読み込みと分類
-    tasks = load_json(BACKLOG_FILE)
+    # タスクの読み込みと分類（ジャーナルも反映される）
+    tasks = load_tasks() if os.path.exists(BACKLOG_FILE) else []
     done_tasks = []
     active_tasks = []
 
@@ -143,8 +149,8 @@ def move_done_tasks(target_date: Optional[str] = None) -> None:
         else:
             active_tasks.append(task)
 
-    # 期限切れタスクの確認
-    expired_tasks, valid_done_tasks = check_expired_tasks(done_tasks, archive_date)
+    # 期限切れタスクの確認（完了していないタスクが対象。バックログに残る）
+    expired_tasks, _ = check_expired_tasks(active_tasks, archive_date)
 
     if expired_tasks:
         print("\n期限切れタスクが見つかりました：")
@@ -156,18 +162,27 @@ def move_done_tasks(target_date: Optional[str] = None) -> None:
         print("期限切れタスクはアーカイブされません。")
 
     # アーカイブの更新
-    archive_tasks = load_json(archive_file)
-    archive_tasks.extend(valid_done_tasks)
-    save_json(archive_tasks, archive_file)
+    if archive_store.get_archive_format() == "jsonl":
+        # 移動するタスクだけを追記する（既存のアーカイブは読み込まない）
+        archive_file = (
+            archive_store.append_tasks(
+                ARCHIVE_DIR, done_tasks, archive_date.strftime("%Y-%m-%d")
+            )
+            or "（なし）"
+        )
+    else:
+        archive_tasks = load_json(archive_file)
+        archive_tasks.extend(done_tasks)
+        save_json(archive_tasks, archive_file)
 
-    # バックログの更新
-    active_tasks.extend(expired_tasks)  # 期限切れタスクはバックログに残す
-    save_json(active_tasks, BACKLOG_FILE)
+    # バックログの更新（移動したタスクがなければ書き込まない）
+    if done_tasks:
+        save_tasks(active_tasks)
 
     # 結果の表示
     print(f"\n処理結果:")
     print(f"- 完了タスク数: {len(done_tasks)}")
-    print(f"- アーカイブ済み: {len(valid_done_tasks)}")
+    print(f"- アーカイブ済み: {len(done_tasks)}")
     print(f"- 期限切れ: {len(expired_tasks)}")
     print(f"- アーカイブファイル: {archive_file}")
     # print(f"- バックアップファイル: {backup_path}")
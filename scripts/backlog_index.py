@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+バックログのバイトオフセット索引 / Byte-offset sidecar index for backlog.json
+
+各タスクの id と permanent_id から、backlog.json 内でそのタスクの
+オブジェクトが占めるバイト範囲への対応表を .backlog.json.index に保存します。
+1件だけ参照したいときは該当範囲だけを読み込んでパースするため、
+ファイル全体をパースする必要がありません。
+Maps each task's id and permanent_id to the byte range of its object in
+backlog.json, so single-task lookups seek and parse just that slice.
+
+- 索引はbacklog.jsonのmtimeとサイズが変わったときだけ再構築する
+  The index is rebuilt only when backlog.json's mtime or size changes
+- 未反映のジャーナル（backlog_journal）がある場合はその内容を優先する
+  Outstanding journal records take precedence over the indexed slices
+
+使用方法 / Usage:
+    python backlog_index.py rebuild      索引を再構築 / Rebuild the index
+    python backlog_index.py get ID...    タスクを表示 / Print tasks by ID
+"""
+
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+import backlog_journal
+
+INDEX_VERSION = 1
+
+# 文字列リテラルと括弧だけを拾うトークン
+# Only string literals and brackets matter for locating task objects
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}]', re.DOTALL)
+
+
+def get_index_path(backlog_path: str) -> str:
+    directory, name = os.path.split(backlog_path)
+    return os.path.join(directory, f".{name}.index")
+
+
+def scan_task_ranges(data: bytes) -> List[Tuple[int, int]]:
+    """
+    {"tasks": [...]} 形式のJSONバイト列から各タスクオブジェクトのバイト範囲を求める
+    戻り値：(開始, 終了) のリスト（終了は含まない）
+    """
+    ranges = []
+    depth = 0
+    in_tasks = False
+    last_key = None
+    start = 0
+
+    for m in _TOKEN.finditer(data):
+        token = m.group()
+        if token[0] == ord('"'):
+            if depth == 1:
+                # 深さ1で"["の直前にある文字列は必ずそのキー
+                last_key = token
+            continue
+        if token in (b"{", b"["):
+            depth += 1
+            if depth == 2 and token == b"[" and last_key == b'"tasks"':
+                in_tasks = True
+            elif depth == 3 and in_tasks and token == b"{":
+                start = m.start()
+        else:
+            if depth == 3 and in_tasks and token == b"}":
+                ranges.append((start, m.end()))
+            elif depth == 2 and in_tasks:
+                in_tasks = False
+            depth -= 1
+
+    return ranges
+
+
+def build_index(backlog_path: str) -> Dict:
+    """backlog.jsonを走査して索引を作成し保存する"""
+    stat = os.stat(backlog_path)
+    with open(backlog_path, "rb") as f:
+        data = f.read()
+
+    entries: Dict[str, List[List[int]]] = {}
+    for start, end in scan_task_ranges(data):
+        task = json.loads(data[start:end])
+        for key in ["id", "permanent_id"]:
+            value = task.get(key)
+            if value:
+                entries.setdefault(value, []).append([start, end])
+
+    index = {
+        "version": INDEX_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "entries": entries,
+    }
+    with open(get_index_path(backlog_path), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    return index
+
+
+def load_index(backlog_path: str) -> Dict:
+    """索引を読み込む。backlog.jsonが変更されていれば再構築する"""
+    stat = os.stat(backlog_path)
+    index_path = get_index_path(backlog_path)
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if (
+                index.get("version") == INDEX_VERSION
+                and index.get("mtime_ns") == stat.st_mtime_ns
+                and index.get("size") == stat.st_size
+            ):
+                return index
+        except json.JSONDecodeError:
+            pass
+    return build_index(backlog_path)
+
+
+def find_tasks(task_ids: Iterable[str], backlog_path: str) -> List[Dict]:
+    """
+    id または permanent_id が一致するタスクを返す（backlog.json内の順序）
+    該当するタスクがなければ空リスト
+    """
+    wanted = list(dict.fromkeys(task_ids))
+    index = load_index(backlog_path)
+
+    # ジャーナルで変更されたタスクは索引より優先する
+    journaled: Dict[str, Dict] = {}
+    deleted = set()
+    for record in backlog_journal.read_journal(backlog_path):
+        if record["op"] == "put":
+            journaled[record["id"]] = record["task"]
+            deleted.discard(record["id"])
+        else:
+            journaled.pop(record["id"], None)
+            deleted.add(record["id"])
+
+    ranges = set()
+    for task_id in wanted:
+        for start, end in index["entries"].get(task_id, []):
+            ranges.add((start, end))
+
+    found = []
+    with open(backlog_path, "rb") as f:
+        for start, end in sorted(ranges):
+            f.seek(start)
+            task = json.loads(f.read(end - start))
+            if task.get("id") in journaled or task.get("id") in deleted:
+                continue
+            found.append(task)
+
+    for task in journaled.values():
+        if task.get("id") in wanted or task.get("permanent_id") in wanted:
+            found.append(task)
+    return found
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path
+
+    load_dotenv()
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ["rebuild", "get"]:
+        print(__doc__)
+        sys.exit(1)
+
+    backlog_path = get_backlog_path()
+    if sys.argv[1] == "rebuild":
+        index = build_index(backlog_path)
+        print(f"Indexed {len(index['entries'])} IDs in {backlog_path}")
+    else:
+        for task in find_tasks(sys.argv[2:], backlog_path):
+            print(json.dumps(task, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+バックログ変更ジャーナル / Backlog change journal
+
+backlog.jsonを毎回全体で書き直す代わりに、変更されたタスクだけを
+追記型のログ（backlog.journal.jsonl）に1行1レコードで記録します。
+Instead of rewriting the whole backlog.json on every save, only changed
+tasks are appended to a log (backlog.journal.jsonl), one record per line.
+
+レコード形式 / Record format:
+    {"op": "put", "id": "T0042", "task": {...}}   タスクの追加・置換 / add or replace
+    {"op": "del", "id": "T0042"}                  タスクの削除 / delete
+
+- 既存IDへのputはその位置で置換、新規IDは末尾に追加
+  put on an existing ID replaces in place, a new ID is appended
+- common_id_utils.load_tasks は未反映のレコードを自動で再生する
+  common_id_utils.load_tasks replays outstanding records transparently
+- 圧縮（compact）でジャーナルをbacklog.jsonに畳み込み、ジャーナルを削除する
+  Compaction folds the journal back into backlog.json and removes it
+
+有効化 / Enable:
+    BACKLOG_STORAGE=journal
+
+使用方法 / Usage:
+    python backlog_journal.py status    ジャーナルの状態を表示 / Show journal status
+    python backlog_journal.py compact   ジャーナルをbacklog.jsonに畳み込む / Compact now
+"""
+
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# ジャーナルがこのサイズを超えたら次の保存時に圧縮する
+# Compact on the next save once the journal grows past this size
+JOURNAL_MAX_BYTES = int(os.getenv("BACKLOG_JOURNAL_MAX_BYTES", 1024 * 1024))
+
+# 読み込み時に取得したスナップショット（パス -> (IDの順序, ID -> シリアライズ済みタスク)）
+# Snapshots taken at load time: path -> (ID order, ID -> serialized task)
+_snapshots: Dict[str, Tuple[List[str], Dict[str, str]]] = {}
+
+
+def get_journal_path(backlog_path: str) -> str:
+    """backlog.json に対応するジャーナルファイルのパスを返す"""
+    return os.path.splitext(backlog_path)[0] + ".journal.jsonl"
+
+
+def serialize_task(task: Dict) -> str:
+    """タスクを比較用・記録用のコンパクトなJSON文字列に変換する"""
+    return json.dumps(task, ensure_ascii=False, separators=(",", ":"))
+
+
+def read_journal(backlog_path: str) -> List[Dict]:
+    """
+    未反映のジャーナルレコードを読み込む
+    書き込み途中で中断された最終行は無視する
+    """
+    journal_path = get_journal_path(backlog_path)
+    if not os.path.exists(journal_path):
+        return []
+
+    records = []
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                # 途中で中断された書き込み / torn write at the tail
+                break
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def replay(tasks: List[Dict], records: List[Dict]) -> List[Dict]:
+    """ジャーナルレコードをタスクリストに適用する"""
+    position = {task.get("id"): i for i, task in enumerate(tasks)}
+    result: List[Optional[Dict]] = list(tasks)
+
+    for record in records:
+        task_id = record["id"]
+        if record["op"] == "put":
+            if task_id in position:
+                result[position[task_id]] = record["task"]
+            else:
+                position[task_id] = len(result)
+                result.append(record["task"])
+        elif record["op"] == "del":
+            if task_id in position:
+                result[position[task_id]] = None
+                del position[task_id]
+        else:
+            raise ValueError(f"Unknown journal op: {record['op']}")
+
+    return [task for task in result if task is not None]
+
+
+def take_snapshot(backlog_path: str, tasks: List[Dict]) -> None:
+    """読み込んだ状態を記録し、保存時に差分を取れるようにする"""
+    order = [task.get("id") for task in tasks]
+    _snapshots[os.path.abspath(backlog_path)] = (
+        order,
+        {task.get("id"): serialize_task(task) for task in tasks},
+    )
+
+
+def diff_tasks(
+    backlog_path: str, tasks: List[Dict]
+) -> Optional[Tuple[List[Dict], Tuple[List[str], Dict[str, str]]]]:
+    """
+    スナップショットとの差分をジャーナルレコードとして求める
+    戻り値：(レコード, 新しいスナップショット)
+    差分で表現できない場合（スナップショットなし、ID重複・欠落、並び替え）はNone
+    """
+    snapshot = _snapshots.get(os.path.abspath(backlog_path))
+    if snapshot is None:
+        return None
+    old_order, old_serialized = snapshot
+    if len(set(old_order)) != len(old_order) or None in old_serialized:
+        return None
+
+    new_order = [task.get("id") for task in tasks]
+    if None in new_order or "" in new_order or len(set(new_order)) != len(new_order):
+        return None
+
+    # 残ったタスクは元の順序のまま先頭に、新規タスクは末尾に並んでいる必要がある
+    # Surviving tasks must keep their order and new tasks must come last
+    new_ids = set(new_order)
+    surviving = [task_id for task_id in old_order if task_id in new_ids]
+    if new_order[: len(surviving)] != surviving:
+        return None
+
+    records = []
+    new_serialized = {}
+    for task in tasks:
+        task_id = task["id"]
+        serialized = serialize_task(task)
+        new_serialized[task_id] = serialized
+        if old_serialized.get(task_id) != serialized:
+            records.append({"op": "put", "id": task_id, "task": task})
+    for task_id in old_order:
+        if task_id not in new_ids:
+            records.append({"op": "del", "id": task_id})
+
+    return records, (new_order, new_serialized)
+
+
+def append_records(
+    backlog_path: str,
+    records: List[Dict],
+    snapshot: Optional[Tuple[List[str], Dict[str, str]]] = None,
+) -> None:
+    """レコードをジャーナルに追記する"""
+    if records:
+        with open(get_journal_path(backlog_path), "a", encoding="utf-8") as f:
+            f.write("".join(serialize_task(r) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+    if snapshot is not None:
+        _snapshots[os.path.abspath(backlog_path)] = snapshot
+
+
+def needs_compaction(backlog_path: str) -> bool:
+    """ジャーナルが閾値を超えているか"""
+    journal_path = get_journal_path(backlog_path)
+    return (
+        os.path.exists(journal_path)
+        and os.path.getsize(journal_path) > JOURNAL_MAX_BYTES
+    )
+
+
+def drop_snapshot(backlog_path: str) -> None:
+    """スナップショットを破棄する（次の保存は全体書き込みになる）"""
+    _snapshots.pop(os.path.abspath(backlog_path), None)
+
+
+def clear(backlog_path: str) -> None:
+    """backlog.jsonへの全体書き込み後にジャーナルを削除する"""
+    journal_path = get_journal_path(backlog_path)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+    drop_snapshot(backlog_path)
+
+
+def main():
+    from dotenv import load_dotenv
+    import common_id_utils
+
+    load_dotenv()
+
+    if len(sys.argv) != 2 or sys.argv[1] not in ["status", "compact"]:
+        print(__doc__)
+        sys.exit(1)
+
+    backlog_path = common_id_utils.get_backlog_path()
+    journal_path = get_journal_path(backlog_path)
+
+    if sys.argv[1] == "status":
+        records = read_journal(backlog_path)
+        size = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+        print(f"Journal:  {journal_path}")
+        print(f"Records:  {len(records)}")
+        print(f"Size:     {size} bytes (compact at {JOURNAL_MAX_BYTES} bytes)")
+    else:
+        count = len(read_journal(backlog_path))
+        common_id_utils.compact_backlog()
+        print(f"Compacted {count} journal records into {backlog_path}")
+
+
+if __name__ == "__main__":
+    main()
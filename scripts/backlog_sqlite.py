@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+SQLiteバックエンド / SQLite storage backend
+
+common_id_utils の load_tasks / save_tasks / extract_ids などを
+backlog.json ではなくローカルのSQLiteデータベース（tasks/backlog.sqlite3）で
+動かすためのバックエンドです。
+Backend that lets the common_id_utils API run against a local SQLite
+database (tasks/backlog.sqlite3) instead of backlog.json.
+
+- id, permanent_id, status, due_date, labels に索引を張り、絞り込みを高速化
+  Indexed columns for id, permanent_id, status, due_date and labels
+- 保存は1トランザクションで、変更のあった行だけを書き換える
+  Saves run in one transaction and only rewrite rows that changed
+- タスク本体はキー順を保ったJSONで保持し、backlog.jsonと完全に往復できる
+  Task bodies keep their key order, so export/import round-trips exactly
+
+- 取り込み・書き出し時の backlog.json の更新時刻とサイズを記録し、
+  その後 backlog.json が外部で変更されていれば取り込み直す。
+  データベースにも書き出していない変更があれば、どちらも上書きせずにエラーにする
+  The mtime and size of backlog.json are recorded on import/export; if the
+  file changes afterwards it is re-imported, or refused when the database
+  also has unexported changes
+
+有効化 / Enable:
+    BACKLOG_STORAGE=sqlite
+    （初回の読み込み時に backlog.json から自動で取り込む）
+    (backlog.json is imported automatically on first load)
+
+使用方法 / Usage:
+    python backlog_sqlite.py import [backlog.json]   JSONから取り込む / Import
+    python backlog_sqlite.py export [backlog.json]   JSONに書き出す / Export
+    python backlog_sqlite.py query [--status S] [--label L] [--due-before YYYY-MM-DD]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    position INTEGER PRIMARY KEY,
+    id TEXT,
+    permanent_id TEXT,
+    status TEXT,
+    due_date TEXT,
+    labels TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_id ON tasks(id);
+CREATE INDEX IF NOT EXISTS idx_tasks_permanent_id ON tasks(permanent_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+CREATE TABLE IF NOT EXISTS task_labels (
+    position INTEGER NOT NULL,
+    label TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_labels_label ON task_labels(label, position);
+CREATE INDEX IF NOT EXISTS idx_task_labels_position ON task_labels(position);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def get_db_path(backlog_path: str) -> str:
+    """backlog.json に対応するデータベースのパスを返す"""
+    return os.path.splitext(backlog_path)[0] + ".sqlite3"
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_json_stamp(json_path: str) -> Optional[List[int]]:
+    """backlog.json の (更新時刻, サイズ)。ファイルがなければ None"""
+    try:
+        stat = os.stat(json_path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _mark_dirty(conn: sqlite3.Connection) -> None:
+    """backlog.json に書き出していない変更があることを記録する"""
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('dirty', '1')")
+
+
+def _mark_synced(conn: sqlite3.Connection, json_path: str) -> None:
+    """backlog.json と同じ内容になったことを、その時点の更新時刻・サイズとともに記録する"""
+    conn.execute(
+        "INSERT OR REPLACE INTO meta VALUES ('json_stamp', ?)",
+        (json.dumps(get_json_stamp(json_path)),),
+    )
+    conn.execute("DELETE FROM meta WHERE key = 'dirty'")
+
+
+def _text_or_none(value: Any) -> Optional[str]:
+    return value if isinstance(value, str) else None
+
+
+def _row(position: int, task: Dict) -> tuple:
+    labels = task.get("labels")
+    return (
+        position,
+        _text_or_none(task.get("id")),
+        _text_or_none(task.get("permanent_id")),
+        _text_or_none(task.get("status")),
+        _text_or_none(task.get("due_date")),
+        json.dumps(labels, ensure_ascii=False) if isinstance(labels, list) else None,
+        json.dumps(task, ensure_ascii=False),
+    )
+
+
+def _labels(task: Dict) -> List[str]:
+    labels = task.get("labels")
+    if not isinstance(labels, list):
+        return []
+    return [label for label in labels if isinstance(label, str)]
+
+
+def _write_rows(conn: sqlite3.Connection, rows: Iterable[tuple]) -> None:
+    for row in rows:
+        position = row[0]
+        conn.execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+        conn.execute("DELETE FROM task_labels WHERE position = ?", (position,))
+        conn.executemany(
+            "INSERT INTO task_labels VALUES (?, ?)",
+            [(position, label) for label in _labels(json.loads(row[6]))],
+        )
+
+
+def _save_skeleton(conn: sqlite3.Connection, skeleton: Dict) -> None:
+    """tasks 以外のトップレベルの値（キー順を含む）を保存する"""
+    conn.execute(
+        "INSERT OR REPLACE INTO meta VALUES ('document', ?)",
+        (json.dumps(skeleton, ensure_ascii=False),),
+    )
+
+
+def save_tasks(db_path: str, tasks: List[Dict], skeleton: Optional[Dict] = None) -> None:
+    """
+    タスクリストを保存する（変更のあった行だけを1トランザクションで更新）
+    skeleton: tasks 以外のトップレベルの値も置き換える場合に渡す（tasks は None）
+    """
+    conn = connect(db_path)
+    try:
+        with conn:
+            if skeleton is not None:
+                _save_skeleton(conn, skeleton)
+            existing = dict(conn.execute("SELECT position, body FROM tasks"))
+            rows = [_row(i, task) for i, task in enumerate(tasks)]
+            _write_rows(conn, (row for row in rows if existing.get(row[0]) != row[6]))
+            conn.execute("DELETE FROM tasks WHERE position >= ?", (len(tasks),))
+            conn.execute(
+                "DELETE FROM task_labels WHERE position >= ?", (len(tasks),)
+            )
+            _mark_dirty(conn)
+    finally:
+        conn.close()
+
+
+def load_backlog(db_path: str) -> Dict:
+    """backlog.json と同じ構造の辞書を返す"""
+    conn = connect(db_path)
+    try:
+        tasks = [
+            json.loads(body)
+            for (body,) in conn.execute("SELECT body FROM tasks ORDER BY position")
+        ]
+        meta = conn.execute(
+            "SELECT value FROM meta WHERE key = 'document'"
+        ).fetchone()
+    finally:
+        conn.close()
+
+    # tasks以外のトップレベルのキーもキー順ごと復元する
+    document = json.loads(meta[0]) if meta else {"tasks": None}
+    document["tasks"] = tasks
+    return document
+
+
+def extract_ids(db_path: str) -> List[str]:
+    """タスク本体をパースせずにIDだけを返す"""
+    conn = connect(db_path)
+    try:
+        return [
+            task_id
+            for (task_id,) in conn.execute(
+                "SELECT id FROM tasks WHERE id IS NOT NULL ORDER BY position"
+            )
+        ]
+    finally:
+        conn.close()
+
+
+def find_tasks(db_path: str, task_ids: Iterable[str]) -> List[Dict]:
+    """id または permanent_id が一致するタスクを返す"""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+    placeholders = ",".join("?" * len(task_ids))
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            f"SELECT body FROM tasks WHERE id IN ({placeholders}) "
+            f"OR permanent_id IN ({placeholders}) ORDER BY position",
+            task_ids + task_ids,
+        )
+        return [json.loads(body) for (body,) in rows]
+    finally:
+        conn.close()
+
+
+def put_tasks(db_path: str, updated_tasks: List[Dict]) -> None:
+    """IDが一致するタスクを置き換え、存在しないものは末尾に追加する"""
+    conn = connect(db_path)
+    try:
+        with conn:
+            (next_position,) = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM tasks"
+            ).fetchone()
+            rows = []
+            for task in updated_tasks:
+                found = conn.execute(
+                    "SELECT position FROM tasks WHERE id = ?", (task["id"],)
+                ).fetchone()
+                if found:
+                    rows.append(_row(found[0], task))
+                else:
+                    rows.append(_row(next_position, task))
+                    next_position += 1
+            _write_rows(conn, rows)
+            _mark_dirty(conn)
+    finally:
+        conn.close()
+
+
+def update_task(db_path: str, task_id: str, fields: Dict) -> bool:
+    """1件のタスクのフィールドだけを部分更新する。見つからなければFalse"""
+    conn = connect(db_path)
+    try:
+        with conn:
+            found = conn.execute(
+                "SELECT position, body FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+            if not found:
+                return False
+            task = json.loads(found[1])
+            task.update(fields)
+            _write_rows(conn, [_row(found[0], task)])
+            _mark_dirty(conn)
+            return True
+    finally:
+        conn.close()
+
+
+def query_tasks(
+    db_path: str,
+    status: Optional[str] = None,
+    label: Optional[str] = None,
+    due_before: Optional[str] = None,
+) -> List[Dict]:
+    """索引付きの列でタスクを絞り込む（due_beforeはその日付を含まない）"""
+    conditions = []
+    params: List[Any] = []
+    if status is not None:
+        conditions.append("status = ?")
+        params.append(status)
+    if label is not None:
+        conditions.append(
+            "position IN (SELECT position FROM task_labels WHERE label = ?)"
+        )
+        params.append(label)
+    if due_before is not None:
+        conditions.append("due_date < ?")
+        params.append(due_before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            f"SELECT body FROM tasks {where} ORDER BY position", params
+        )
+        return [json.loads(body) for (body,) in rows]
+    finally:
+        conn.close()
+
+
+def _is_source(db_path: str, json_path: str) -> bool:
+    return os.path.abspath(get_db_path(json_path)) == os.path.abspath(db_path)
+
+
+def import_json(db_path: str, json_path: str) -> int:
+    """
+    backlog.json をデータベースに取り込む（既存の内容は置き換える）
+    対応する backlog.json 以外から取り込んだ場合は、書き出していない変更として扱う
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    tasks = document["tasks"]
+    skeleton = dict(document)
+    skeleton["tasks"] = None
+
+    save_tasks(db_path, tasks, skeleton)
+    conn = connect(db_path)
+    try:
+        with conn:
+            if _is_source(db_path, json_path):
+                _mark_synced(conn, json_path)
+    finally:
+        conn.close()
+    return len(tasks)
+
+
+def export_json(db_path: str, json_path: str) -> int:
+    """データベースの内容を backlog.json と同じフォーマットで書き出す"""
+    document = load_backlog(db_path)
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, json_path)
+    if _is_source(db_path, json_path):
+        conn = connect(db_path)
+        try:
+            with conn:
+                _mark_synced(conn, json_path)
+        finally:
+            conn.close()
+    return len(document["tasks"])
+
+
+def sync_from_json(db_path: str, json_path: str) -> bool:
+    """
+    データベースを backlog.json に追従させる
+    - データベースがなければ取り込む
+    - 最後の取り込み・書き出しの後に backlog.json が変更されていれば取り込み直す
+    - データベースにも書き出していない変更があれば ValueError（どちらかの変更が失われるため）
+    戻り値：取り込んだらTrue
+    """
+    if not os.path.exists(db_path):
+        import_json(db_path, json_path)
+        return True
+    current = get_json_stamp(json_path)
+    if current is None:
+        return False
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            recorded = _get_meta(conn, "json_stamp")
+            dirty = _get_meta(conn, "dirty") is not None
+            if recorded is None:
+                # 記録のない既存のデータベース：変更が書き出し済みか分からないので、
+                # 現在の backlog.json を基準にし、データベースの変更は残す
+                _mark_synced(conn, json_path)
+                _mark_dirty(conn)
+                return False
+    finally:
+        conn.close()
+
+    if json.loads(recorded) == current:
+        return False
+    if dirty:
+        raise ValueError(
+            f"{json_path} was changed outside the database, which also has unexported changes. "
+            "Run 'backlog_sqlite.py export' to overwrite it with the database, "
+            "or 'backlog_sqlite.py import' to discard the database changes"
+        )
+    import_json(db_path, json_path)
+    return True
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="SQLite backend for backlog.json")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in ["import", "export"]:
+        sub = subparsers.add_parser(command)
+        sub.add_argument("json_path", nargs="?", default=None)
+    query = subparsers.add_parser("query")
+    query.add_argument("--status")
+    query.add_argument("--label")
+    query.add_argument("--due-before")
+    args = parser.parse_args()
+
+    backlog_path = get_backlog_path()
+    db_path = get_db_path(backlog_path)
+
+    if args.command == "import":
+        count = import_json(db_path, args.json_path or backlog_path)
+        print(f"Imported {count} tasks into {db_path}")
+    elif args.command == "export":
+        count = export_json(db_path, args.json_path or backlog_path)
+        print(f"Exported {count} tasks to {args.json_path or backlog_path}")
+    else:
+        for task in query_tasks(db_path, args.status, args.label, args.due_before):
+            print(f"{task.get('id')}: {task.get('title')} [{task.get('status')}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+規模別ベンチマーク / Scale benchmark suite for the task scripts
+
+synthetic_backlog.py で1,000・10,000・100,000件（既定）の合成データを作り、
+主要な処理の実行時間を測って結果をJSONに保存します。
+--compare に以前の結果を渡すと、規模と処理ごとに比較して遅くなったものを報告します。
+Builds synthetic data at 1,000 / 10,000 / 100,000 tasks (by default) with
+synthetic_backlog.py, times the hot paths and stores the results as JSON.
+With --compare, each (size, benchmark) is compared with an earlier result
+and slowdowns beyond --threshold are reported.
+
+測定する処理 / Benchmarks:
+    load_backlog        common_id_utils.load_tasks
+    save_backlog        common_id_utils.save_tasks
+    validate_backlog    validate_backlog.validate_tasks_json（キャッシュなし / uncached）
+    validate_cached     validate_backlog.validate_tasks_json（キャッシュあり / warm cache）
+    allocate_ids        extract_ids + IdAllocator.from_ids + reserve
+    archive_done_tasks  archive_tasks.move_done_tasks
+    apply_json_patch    apply_patch.apply_json_patch（タスクの1%を変更 / 1% of tasks changed）
+    create_task_graph   visualize_graph.create_task_graph（networkx）
+    check_dependencies  task_graph.check_dependencies
+    detect_similar      gather_tasks.detect_similar_tasks（先頭 SIMILARITY_SAMPLE 件 / first SIMILARITY_SAMPLE tasks）
+    find_similar        similarity.detect_similar_tasks（MinHash / LSH、全件 / all tasks）
+    find_similar_tfidf  tfidf_similarity.detect_similar_tasks（TF-IDF、全件 / all tasks、numpy・scipy）
+    refresh_similar     similarity_index.update_similar_tasks（索引の作成後に3件追加 / 3 tasks added to an indexed backlog）
+
+使用方法 / Usage:
+    python benchmark.py [--sizes 1000,10000,100000] [--repeat N] [--only NAME,...]
+                        [--output results.json] [--compare BASE.json] [--threshold 1.25]
+
+例 / Example:
+    python benchmark.py --sizes 1000,10000 --output before.json
+    python benchmark.py --sizes 1000,10000 --compare before.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import synthetic_backlog
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_VERSION = 1
+DEFAULT_SIZES = [1000, 10000, 100000]
+# 総当たりの類似検出は件数の2乗に比例するため、先頭の一部だけで測る
+SIMILARITY_SAMPLE = 100
+
+
+class Fixture:
+    """1つの規模の合成データ（DATA_ROOT）と読み込み済みのタスク"""
+
+    def __init__(self, data_root: str, count: int, seed: int):
+        self.data_root = data_root
+        self.count = count
+        self.seed = seed
+        paths = synthetic_backlog.write_data_root(data_root, count, seed=seed)
+        self.backlog_path = paths["backlog"]
+        self.archive_dir = paths["archive"]
+        with open(self.backlog_path, "r", encoding="utf-8") as f:
+            self.tasks = json.load(f)["tasks"]
+
+    def copy_backlog(self, name: str) -> str:
+        """破壊的な処理のためにバックログだけを別の DATA_ROOT に複製する"""
+        data_root = os.path.join(os.path.dirname(self.data_root), name)
+        shutil.rmtree(data_root, ignore_errors=True)
+        os.makedirs(os.path.join(data_root, "tasks"))
+        shutil.copy(self.backlog_path, os.path.join(data_root, "tasks", "backlog.json"))
+        return data_root
+
+
+@contextlib.contextmanager
+def data_root_env(data_root: str):
+    previous = os.environ.get("DATA_ROOT")
+    os.environ["DATA_ROOT"] = data_root
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ["DATA_ROOT"]
+        else:
+            os.environ["DATA_ROOT"] = previous
+
+
+def timed(function: Callable[[], object]) -> float:
+    """function の実行時間（出力は捨てる）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+
+
+def bench_load_backlog(fixture: Fixture) -> float:
+    from common_id_utils import load_tasks
+
+    with data_root_env(fixture.data_root):
+        return timed(load_tasks)
+
+
+def bench_save_backlog(fixture: Fixture) -> float:
+    from common_id_utils import save_tasks
+
+    with data_root_env(fixture.data_root):
+        return timed(lambda: save_tasks(fixture.tasks))
+
+
+def bench_validate_backlog(fixture: Fixture) -> float:
+    from validate_backlog import validate_tasks_json
+
+    with data_root_env(fixture.data_root):
+        return timed(lambda: validate_tasks_json(fixture.backlog_path, use_cache=False))
+
+
+def bench_validate_cached(fixture: Fixture) -> float:
+    from validate_backlog import validate_tasks_json
+
+    with data_root_env(fixture.data_root):
+        timed(lambda: validate_tasks_json(fixture.backlog_path))
+        return timed(lambda: validate_tasks_json(fixture.backlog_path))
+
+
+def bench_allocate_ids(fixture: Fixture) -> float:
+    from common_id_utils import extract_ids
+    from id_allocator import IdAllocator
+
+    def allocate():
+        allocator = IdAllocator.from_ids(extract_ids(fixture.tasks))
+        allocator.reserve(min(100, allocator.available_count()))
+
+    return timed(allocate)
+
+
+def bench_archive_done_tasks(fixture: Fixture) -> float:
+    import archive_tasks
+
+    data_root = fixture.copy_backlog("archive_run")
+    archive_tasks.BACKLOG_FILE = os.path.join(data_root, "tasks", "backlog.json")
+    archive_tasks.ARCHIVE_DIR = os.path.join(data_root, "tasks", "archive")
+    with data_root_env(data_root):
+        return timed(lambda: archive_tasks.move_done_tasks("2026-01-01"))
+
+
+def bench_apply_json_patch(fixture: Fixture) -> float:
+    from apply_patch import apply_json_patch
+
+    workdir = os.path.join(os.path.dirname(fixture.data_root), "patch_run")
+    os.makedirs(workdir, exist_ok=True)
+    patch = [
+        {"op": "replace", "path": f"/tasks/{i}/status", "value": "Done"}
+        for i in range(0, fixture.count, 100)
+    ]
+    patch.append({"op": "add", "path": "/tasks/-", "value": dict(fixture.tasks[0], id="")})
+    patch_path = os.path.join(workdir, "patch.json")
+    with open(patch_path, "w", encoding="utf-8") as f:
+        json.dump(patch, f, ensure_ascii=False)
+
+    with data_root_env(fixture.data_root):
+        return timed(
+            lambda: apply_json_patch(
+                fixture.backlog_path, patch_path, os.path.join(workdir, "patched.json")
+            )
+        )
+
+
+def bench_create_task_graph(fixture: Fixture) -> float:
+    from visualize_graph import create_task_graph
+
+    return timed(lambda: create_task_graph(fixture.tasks))
+
+
+def bench_check_dependencies(fixture: Fixture) -> float:
+    from task_graph import check_dependencies
+
+    return timed(lambda: check_dependencies(fixture.tasks))
+
+
+def load_gather_tasks():
+    """退役済みの gather_tasks.py を比較の基準として読み込む"""
+    path = os.path.join(SCRIPTS_DIR, "archive", "gather_tasks.py")
+    spec = importlib.util.spec_from_file_location("gather_tasks", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_detect_similar(fixture: Fixture) -> float:
+    gather_tasks = load_gather_tasks()
+    sample = fixture.tasks[:SIMILARITY_SAMPLE]
+    return timed(lambda: gather_tasks.detect_similar_tasks(sample))
+
+
+def bench_find_similar(fixture: Fixture) -> float:
+    from similarity import detect_similar_tasks
+
+    return timed(lambda: detect_similar_tasks(fixture.tasks))
+
+
+def bench_find_similar_tfidf(fixture: Fixture) -> float:
+    import numpy  # noqa: F401
+    import scipy  # noqa: F401
+    from tfidf_similarity import detect_similar_tasks
+
+    return timed(lambda: detect_similar_tasks(fixture.tasks))
+
+
+def bench_refresh_similar(fixture: Fixture) -> float:
+    from similarity_index import update_similar_tasks
+
+    data_root = fixture.copy_backlog("similarity_run")
+    backlog_path = os.path.join(data_root, "tasks", "backlog.json")
+    tasks = list(fixture.tasks)
+    update_similar_tasks(backlog_path, tasks)
+    for i in range(3):
+        tasks.append(dict(tasks[i * 7], id="", permanent_id=f"bench-{i}", title=f"{tasks[i * 7]['title']}（追加）"))
+    return timed(lambda: update_similar_tasks(backlog_path, tasks))
+
+
+BENCHMARKS: Dict[str, Callable[[Fixture], float]] = {
+    "load_backlog": bench_load_backlog,
+    "save_backlog": bench_save_backlog,
+    "validate_backlog": bench_validate_backlog,
+    "validate_cached": bench_validate_cached,
+    "allocate_ids": bench_allocate_ids,
+    "archive_done_tasks": bench_archive_done_tasks,
+    "apply_json_patch": bench_apply_json_patch,
+    "create_task_graph": bench_create_task_graph,
+    "check_dependencies": bench_check_dependencies,
+    "detect_similar": bench_detect_similar,
+    "find_similar": bench_find_similar,
+    "find_similar_tfidf": bench_find_similar_tfidf,
+    "refresh_similar": bench_refresh_similar,
+}
+
+# 件数が規模と異なる処理 / Benchmarks that do not process the whole backlog
+SAMPLED = {"detect_similar": SIMILARITY_SAMPLE}
+
+
+def run_benchmark(name: str, fixture: Fixture, repeat: int) -> Dict:
+    """repeat回測って最小値を結果とする。必要なモジュールがなければ skipped"""
+    runs = []
+    for _ in range(repeat):
+        try:
+            runs.append(BENCHMARKS[name](fixture))
+        except ImportError as e:
+            return {"skipped": str(e)}
+    return {
+        "seconds": min(runs),
+        "runs": [round(run, 6) for run in runs],
+        "tasks": min(fixture.count, SAMPLED.get(name, fixture.count)),
+    }
+
+
+def get_revision() -> Dict:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=SCRIPTS_DIR, capture_output=True, text=True
+        ).stdout.strip()
+
+    return {
+        "revision": git("rev-parse", "--short", "HEAD") or None,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def run_suite(sizes: List[int], names: List[str], repeat: int, seed: int) -> Dict:
+    results = {
+        "version": RESULTS_VERSION,
+        **get_revision(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "repeat": repeat,
+        "sizes": {},
+    }
+    # 各処理が保存方式に左右されないよう、既定の json 方式で測る
+    previous_storage = os.environ.get("BACKLOG_STORAGE")
+    os.environ["BACKLOG_STORAGE"] = "json"
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                start = time.perf_counter()
+                fixture = Fixture(os.path.join(tmpdir, "data"), size, seed)
+                print(f"{size} tasks (generated in {time.perf_counter() - start:.1f}s)")
+                size_results = {}
+                for name in names:
+                    result = run_benchmark(name, fixture, repeat)
+                    size_results[name] = result
+                    print(f"  {format_result(name, result)}")
+                results["sizes"][str(size)] = size_results
+    finally:
+        if previous_storage is None:
+            del os.environ["BACKLOG_STORAGE"]
+        else:
+            os.environ["BACKLOG_STORAGE"] = previous_storage
+    return results
+
+
+def format_result(name: str, result: Dict) -> str:
+    if "skipped" in result:
+        return f"{name:20} skipped ({result['skipped']})"
+    return f"{name:20} {result['seconds']:9.4f}s  ({result['tasks']} tasks)"
+
+
+def compare_results(base: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    規模と処理ごとに以前の結果と比べて表示する
+    戻り値：threshold倍より遅くなった (規模, 処理) の説明
+    """
+    regressions = []
+    print(f"\nComparison with {base.get('revision')} (threshold {threshold:.2f}x)")
+    for size, size_results in current["sizes"].items():
+        for name, result in size_results.items():
+            base_result = base.get("sizes", {}).get(size, {}).get(name)
+            if not base_result or "seconds" not in base_result or "seconds" not in result:
+                continue
+            if base_result.get("tasks") != result.get("tasks"):
+                continue
+            ratio = result["seconds"] / base_result["seconds"] if base_result["seconds"] else 1.0
+            mark = ""
+            if ratio > threshold:
+                mark = "  REGRESSION"
+                regressions.append(f"{name} at {size} tasks: {ratio:.2f}x slower")
+            print(
+                f"  {size:>7} {name:20} {base_result['seconds']:9.4f}s -> {result['seconds']:9.4f}s"
+                f"  ({ratio:.2f}x){mark}"
+            )
+    return regressions
+
+
+def parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the task scripts on synthetic backlogs")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated backlog sizes",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark (the fastest is kept)")
+    parser.add_argument("--only", help="Comma-separated benchmark names: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data")
+    parser.add_argument("--output", help="Results file (default: benchmark-<revision>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=1.25, help="Slowdown ratio reported as a regression"
+    )
+    args = parser.parse_args()
+
+    names = parse_list(args.only) if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+    try:
+        sizes = [int(size) for size in parse_list(args.sizes)]
+    except ValueError:
+        parser.error(f"Invalid --sizes: {args.sizes}")
+
+    base: Optional[Dict] = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+
+    results = run_suite(sizes, names, args.repeat, args.seed)
+
+    output = args.output or f"benchmark-{results['revision'] or 'unknown'}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if base is not None:
+        regressions = compare_results(base, results, args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+validate_backlog.py のベンチマーク / Benchmark for validate_backlog.py
+
+synthetic_backlog.py で合成したバックログ（既定50,000件）で validate_task（タスク単位）と
+validate_tasks_json（ファイル全体）の実行時間を測ります。
+--baseline にGitのリビジョンを指定すると、そのリビジョンの validate_backlog.py と
+比較し、結果が一致することも確認します。
+Times validate_task (per task) and validate_tasks_json (whole file) on a
+backlog generated by synthetic_backlog.py (50,000 tasks by default).
+With --baseline, the validate_backlog.py of that git revision is timed too
+and its output is checked against the current one.
+
+使用方法 / Usage:
+    python benchmark_validate.py [--tasks N] [--baseline REV] [--fix]
+
+例 / Example:
+    python benchmark_validate.py --tasks 50000 --baseline HEAD~1
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import validate_backlog
+from synthetic_backlog import generate_tasks
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_revision(revision: str):
+    """指定したGitリビジョンの validate_backlog.py をモジュールとして読み込む"""
+    source = subprocess.run(
+        ["git", "show", f"{revision}:scripts/validate_backlog.py"],
+        cwd=SCRIPTS_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    path = os.path.join(tempfile.mkdtemp(), "validate_backlog_baseline.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location("validate_backlog_baseline", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_tasks(module, tasks: List[Dict]) -> float:
+    start = time.perf_counter()
+    for task in tasks:
+        module.validate_task(task)
+    return time.perf_counter() - start
+
+
+def time_validation(module, tasks: List[Dict], fix: bool):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, "backlog.json")
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump({"tasks": tasks}, f, ensure_ascii=False, indent=2)
+
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            result = module.validate_tasks_json(filepath, fix=fix)
+        elapsed = time.perf_counter() - start
+    return elapsed, result
+
+
+def report(label: str, module, tasks: List[Dict], fix: bool):
+    per_task = time_tasks(module, tasks)
+    elapsed, result = time_validation(module, tasks, fix)
+    print(f"{label:9} validate_task: {per_task:.3f}s  validate_tasks_json: {elapsed:.3f}s (valid={result})")
+    return per_task, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark validate_backlog.py")
+    parser.add_argument("--tasks", type=int, default=50000, help="Number of tasks")
+    parser.add_argument("--baseline", help="Git revision to compare against")
+    parser.add_argument("--fix", action="store_true", help="Benchmark the --fix path")
+    args = parser.parse_args()
+
+    tasks = generate_tasks(args.tasks, invalid_rate=0.01)
+    if args.fix:
+        # 1%のタスクに不正な一時IDを入れる
+        for task in tasks[::100]:
+            task["id"] = "TASK-" + task["id"]
+    print(f"{args.tasks} synthetic tasks")
+
+    current = report("current", validate_backlog, tasks, args.fix)
+    if args.baseline:
+        baseline_module = load_revision(args.baseline)
+        baseline = report("baseline", baseline_module, tasks, args.fix)
+        print(
+            f"speedup   validate_task: {baseline[0] / current[0]:.2f}x"
+            f"  validate_tasks_json: {baseline[1] / current[1]:.2f}x"
+        )
+
+        # 同じタスクに対するエラーメッセージが一致することを確認する
+        for task in tasks:
+            if baseline_module.validate_task(task) != validate_backlog.validate_task(task):
+                print(f"Warning: results differ for {validate_backlog.format_task_identifier(task)}")
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
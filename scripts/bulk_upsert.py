@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+タスクの一括更新・追加 / Bulk update and insert of tasks from a stream
+
+標準入力かファイルから JSON Lines（1行1タスク）・JSON配列・{"tasks": [...]} を
+逐次読み込み、各レコードを id / permanent_id の対応表で既存のタスクに対応づけて
+更新または追加します。バックログの読み込みと保存は1回だけで、新しいタスクの
+一時IDは最後にまとめて確保します。
+Streams JSON Lines, a JSON array or {"tasks": [...]} from stdin or a file,
+resolves each record against an id / permanent_id index and updates or
+inserts it. The backlog is loaded and saved once, and temporary IDs for
+new tasks are reserved in one batch at the end.
+
+- update: id か permanent_id で既存のタスクを更新する（見つからなければエラー）
+  Update existing tasks found by id or permanent_id (missing tasks are errors)
+- insert: 新しいタスクとして追加する（既存のIDを指定するとエラー）
+  Insert new tasks (records naming an existing task are errors)
+- upsert: 見つかれば更新、見つからなければ追加
+  Update when found, insert otherwise
+- 更新はレコードの項目だけを書き換え、null の項目は削除する（id と permanent_id は書き換えない）
+  Updates replace only the fields in the record; null removes the field
+  (id and permanent_id are used for lookup only)
+- 検証エラーを新たに生むレコードはエラーとして報告し、他のレコードは反映する
+  Records that would introduce validation errors are reported and skipped;
+  the other records are still applied
+- 入力がJSONとして読めない場合は何も保存しない
+  Nothing is saved when the input is not valid JSON
+
+使用方法 / Usage:
+    cat tasks.jsonl | python update_tasks.py            更新 / update
+    python append_tasks.py new_tasks.json               追加 / insert
+    python update_tasks.py --upsert tasks.jsonl         更新または追加 / upsert
+"""
+
+import argparse
+import os
+import sys
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import dependency_index
+import patch_log
+from common_id_utils import get_backlog_path, load_tasks, save_tasks
+from id_resolver import IdResolver, normalize_id
+from manage_4digit_ids import IdRegistry, is_valid_id
+from task_stream import StreamError, iter_records
+from validate_backlog import format_task_identifier, validate_task
+
+MODES = ("update", "insert", "upsert")
+# 検索にだけ使い、更新では書き換えない項目
+KEY_FIELDS = ("id", "permanent_id")
+
+
+def merge_fields(task: Dict, record: Dict) -> Dict:
+    """レコードの項目で上書きしたタスクの複製を返す（null は削除）"""
+    merged = dict(task)
+    for key, value in record.items():
+        if key in KEY_FIELDS:
+            continue
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _errors(task: Dict) -> List[str]:
+    # メッセージ先頭のタスク名はタイトルの変更で変わるので外して比べる
+    prefix = format_task_identifier(task) + " - "
+    return [
+        message[len(prefix):] if message.startswith(prefix) else message
+        for message in validate_task(task)
+    ]
+
+
+def new_errors(before: Optional[Dict], after: Dict) -> List[str]:
+    """after の検証エラーのうち before になかったもの"""
+    existing = set(_errors(before)) if before is not None else set()
+    return [message for message in _errors(after) if message not in existing]
+
+
+class BulkUpsert:
+    """1回の読み込みに対してレコードを順に反映する"""
+
+    def __init__(self, tasks: List[Dict], mode: str, registry: Optional[IdRegistry] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.tasks = tasks
+        self.mode = mode
+        self.resolver = IdResolver(tasks, titles=False)
+        self.registry = registry
+        self.outcomes: List[Dict] = []
+        # 一時IDの確保を待っている追加タスクの位置
+        self.pending: List[int] = []
+        self.warnings: List[str] = []
+
+    def locate(self, record: Dict) -> Tuple[Optional[int], Optional[str]]:
+        """レコードが指すタスクの位置（なければNone）とエラー"""
+        matches = {}
+        for field in KEY_FIELDS:
+            value = record.get(field)
+            if value is None or value == "":
+                continue
+            if not isinstance(value, str):
+                return None, f"{field} must be a string"
+            if field == "id":
+                positions = self.resolver.by_id.get(normalize_id(value) or value, [])
+            else:
+                positions = self.resolver.by_permanent_id.get(value.lower(), [])
+            if len(positions) > 1:
+                return None, f"{field} {value} matches {len(positions)} tasks"
+            matches[field] = positions[0] if positions else None
+
+        found = set(matches.values())
+        if len(found) > 1:
+            described = ", ".join(f"{field} {record[field]}" for field in matches)
+            return None, f"{described} refer to different tasks"
+        return (found.pop() if found else None), None
+
+    def apply(self, index: int, line: int, record: Any) -> Dict:
+        """1件のレコードを反映し、結果を返す"""
+        outcome = {"index": index, "line": line, "status": "error", "position": None, "message": ""}
+        self.outcomes.append(outcome)
+        if not isinstance(record, dict):
+            outcome["message"] = "record must be an object"
+            return outcome
+
+        position, error = self.locate(record)
+        if error:
+            outcome["message"] = error
+            return outcome
+
+        if position is not None:
+            if self.mode == "insert":
+                outcome["position"] = position
+                outcome["message"] = "task already exists"
+                return outcome
+            return self._update(outcome, position, record)
+
+        if self.mode == "update":
+            keys = [f"{field} {record[field]}" for field in KEY_FIELDS if record.get(field)]
+            outcome["message"] = f"task not found: {', '.join(keys)}" if keys else "id or permanent_id is required"
+            return outcome
+        return self._insert(outcome, record)
+
+    def _update(self, outcome: Dict, position: int, record: Dict) -> Dict:
+        task = self.tasks[position]
+        outcome["position"] = position
+        updated = merge_fields(task, record)
+        if updated == task:
+            outcome["status"] = "unchanged"
+            return outcome
+        errors = new_errors(task, updated)
+        if errors:
+            outcome["message"] = "; ".join(errors)
+            return outcome
+        # 変更ログ用に元のタスクは書き換えず、複製で置き換える
+        self.tasks[position] = updated
+        outcome["status"] = "updated"
+        return outcome
+
+    def _insert(self, outcome: Dict, record: Dict) -> Dict:
+        task_id = record.get("id") or ""
+        if task_id:
+            task_id = normalize_id(task_id) or task_id
+            if not is_valid_id(task_id):
+                outcome["message"] = f"invalid id {record['id']} (must be T0001-T9999)"
+                return outcome
+            if self.registry is not None and task_id in self.registry.used_ids:
+                outcome["message"] = f"id {task_id} is already used (archived task)"
+                return outcome
+
+        task = {
+            "id": task_id,
+            "permanent_id": record.get("permanent_id") or str(uuid.uuid4()),
+            "status": "Open",
+        }
+        task.update(
+            (key, value) for key, value in record.items() if key not in KEY_FIELDS and value is not None
+        )
+        errors = new_errors(None, task)
+        if errors:
+            outcome["message"] = "; ".join(errors)
+            return outcome
+
+        self.tasks.append(task)
+        position = len(self.tasks) - 1
+        self.resolver.add(position)
+        if task_id:
+            if self.registry is not None:
+                self.registry.mark_used({task_id})
+        else:
+            self.pending.append(position)
+        outcome["status"] = "created"
+        outcome["position"] = position
+        return outcome
+
+    def finish(self) -> None:
+        """一時IDを必要な数だけまとめて確保し、追加したタスクに割り当てる"""
+        if not self.pending:
+            return
+        if self.registry is None:
+            self.registry = IdRegistry.snapshot()
+            self.registry.mark_used({task.get("id") for task in self.tasks if task.get("id")})
+        count = min(len(self.pending), self.registry.allocator.available_count())
+        for position, task_id in zip(self.pending, self.registry.reserve(count)):
+            self.tasks[position]["id"] = task_id
+        if count < len(self.pending):
+            self.warnings.append(
+                f"一時IDが足りないため、{len(self.pending) - count}件のタスクは永続IDだけで追加しました"
+            )
+        self.pending = []
+
+    def counts(self) -> Dict[str, int]:
+        result = {"created": 0, "updated": 0, "unchanged": 0, "error": 0}
+        for outcome in self.outcomes:
+            result[outcome["status"]] += 1
+        return result
+
+    def describe(self, outcome: Dict) -> str:
+        """結果1件の表示"""
+        label = f"#{outcome['index'] + 1} (line {outcome['line']})"
+        if outcome["position"] is not None:
+            task = self.tasks[outcome["position"]]
+            label += f" {task.get('id') or task.get('permanent_id')}: {task.get('title', 'NO_TITLE')}"
+        if outcome["status"] == "error":
+            return f"  error     {label} - {outcome['message']}"
+        return f"  {outcome['status']:<9} {label}"
+
+
+def upsert(records: Iterable[Tuple[int, int, int, Any]], tasks: List[Dict], mode: str) -> BulkUpsert:
+    """iter_records の出力を tasks に反映する（tasks は書き換えられる）"""
+    registry = None
+    if mode != "update":
+        # アーカイブ済みのIDを明示した追加を防ぐため、先にスナップショットを取る
+        registry = IdRegistry.snapshot()
+        registry.mark_used({task.get("id") for task in tasks if task.get("id")})
+    bulk = BulkUpsert(tasks, mode, registry)
+    for index, line, _column, record in records:
+        bulk.apply(index, line, record)
+    bulk.finish()
+    return bulk
+
+
+def main(default_mode: str = "upsert", source: str = "bulk_upsert", description: Optional[str] = None):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=description or "Bulk update or insert tasks from JSON")
+    parser.add_argument("input", nargs="?", default="-", help="JSON Lines or JSON array (default: stdin)")
+    parser.add_argument(
+        "--mode", choices=MODES, default=default_mode, help=f"How to apply records (default: {default_mode})"
+    )
+    parser.add_argument("--upsert", dest="mode", action="store_const", const="upsert", help="Same as --mode upsert")
+    parser.add_argument("--dry-run", action="store_true", help="Report outcomes without saving")
+    parser.add_argument("--quiet", action="store_true", help="Only report errors and the summary")
+    args = parser.parse_args()
+
+    tasks = load_tasks()
+    before = list(tasks)
+    try:
+        if args.input == "-":
+            bulk = upsert(iter_records(sys.stdin), tasks, args.mode)
+        else:
+            with open(args.input, "r", encoding="utf-8") as f:
+                bulk = upsert(iter_records(f), tasks, args.mode)
+    except StreamError as e:
+        print(f"エラー: 入力を読み込めません: {e}")
+        print("何も保存しませんでした。")
+        sys.exit(1)
+
+    for outcome in bulk.outcomes:
+        if not args.quiet or outcome["status"] == "error":
+            print(bulk.describe(outcome))
+    for warning in bulk.warnings:
+        print(f"警告: {warning}")
+
+    counts = bulk.counts()
+    print(
+        f"追加 {counts['created']}件・更新 {counts['updated']}件・"
+        f"変更なし {counts['unchanged']}件・エラー {counts['error']}件"
+    )
+    if args.dry_run:
+        print("--dry-run のため保存しませんでした。")
+    elif counts["created"] or counts["updated"]:
+        # 依存関係の索引は保存前のバックログに対して読み込み、変わったタスクの分だけ更新する
+        index = dependency_index.load_index(get_backlog_path(), before)
+        save_tasks(tasks)
+        index.apply_changes(before, tasks)
+        dependency_index.save_index(get_backlog_path(), index)
+        note = f"{counts['created']} created, {counts['updated']} updated"
+        if args.input != "-":
+            note += f" from {os.path.basename(args.input)}"
+        patch_log.record(get_backlog_path(), source, before, tasks, note=note)
+    if counts["error"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
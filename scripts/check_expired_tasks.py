@@ -12,6 +12,7 @@ import json
 import os
 from typing import Dict, List, Tuple
 from dotenv import load_dotenv
+from common_id_utils import is_backlog_path, load_tasks
 
 # Load environment variables
 load_dotenv()
@@ -30,6 +31,8 @@ def load_json(filepath: str) -> List[Dict]:
     Returns:
         読み込んだデータ（リスト形式）
     """
+    if is_backlog_path(filepath) and os.path.exists(filepath):
+        return load_tasks()
     if os.path.exists(filepath):
         with open(filepath, "r", encoding="utf-8") as f:
             data = json.load(f) or {}
@@ -1,7 +1,7 @@
 import json
 import os
 from dotenv import load_dotenv
-from common_id_utils import find_next_available_id, extract_ids
+from common_id_utils import find_next_available_id, extract_ids, load_backlog_file
 
 
 # Load environment variables
@@ -9,8 +9,7 @@ load_dotenv()
 
 
 def load_backlog(file_path):
-    with open(file_path, "r", encoding="utf-8") as file:
-        return json.load(file)
+    return load_backlog_file(file_path)
 
 
 def main():
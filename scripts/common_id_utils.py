@@ -2,6 +2,12 @@ import re
 import os
 import json
 
+import backlog_index
+import backlog_journal
+import backlog_sqlite
+import similarity_index
+from id_allocator import IdAllocator
+
 
 def get_backlog_path():
     REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -13,10 +19,98 @@ def get_backlog_path():
     return backlog_path
 
 
+def get_storage_mode():
+    """
+    バックログの保存方式を返す（環境変数 BACKLOG_STORAGE）
+    - json: 保存のたびにbacklog.jsonを全体で書き直す（デフォルト）
+    - journal: 変更をbacklog.journal.jsonlに追記し、閾値を超えたら圧縮する
+    - sqlite: backlog.sqlite3に保存する（backlog.jsonは書き出し用）
+    """
+    return os.getenv("BACKLOG_STORAGE", "json")
+
+
+def is_backlog_path(path):
+    return os.path.abspath(path) == os.path.abspath(get_backlog_path())
+
+
+def write_backlog_file(path, backlog):
+    """正規フォーマット（indent=2）でアトミックに書き込む"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as backlog_file:
+        json.dump(backlog, backlog_file, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# backlog.json の tasks 以外のトップレベルの値（{パス: (更新時刻・サイズ, 骨格)}）
+# 読み込み時に覚えておき、tasks だけを保存するときに書き戻す
+_skeletons = {}
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _remember_skeleton(path, backlog):
+    skeleton = dict(backlog)
+    skeleton["tasks"] = None
+    _skeletons[path] = (_file_stamp(path), skeleton)
+    return skeleton
+
+
+def get_skeleton(path):
+    """
+    backlog.json の tasks 以外のトップレベルの値（キー順を保ち、tasks は None）
+    読み込み時から変わっていなければファイルを読み直さない
+    """
+    cached = _skeletons.get(path)
+    if cached is not None and cached[0] == _file_stamp(path):
+        return cached[1]
+    if not os.path.exists(path):
+        return {"tasks": None}
+    with open(path, "r", encoding="utf-8") as file:
+        return _remember_skeleton(path, json.load(file))
+
+
+def _write_tasks(path, tasks, skeleton):
+    """骨格に tasks を入れた文書を書き込む"""
+    backlog = dict(skeleton)
+    backlog["tasks"] = tasks
+    write_backlog_file(path, backlog)
+    _remember_skeleton(path, backlog)
+
+
+def get_db_path():
+    """
+    sqlite方式のデータベースのパス
+    未作成、またはbacklog.jsonが外部で変更されていればbacklog.jsonから取り込む
+    """
+    backlog_path = get_backlog_path()
+    db_path = backlog_sqlite.get_db_path(backlog_path)
+    backlog_sqlite.sync_from_json(db_path, backlog_path)
+    return db_path
+
+
 def load_backlog():
+    if get_storage_mode() == "sqlite":
+        return backlog_sqlite.load_backlog(get_db_path())
+
     backlog_path = get_backlog_path()
     with open(backlog_path, "r", encoding="utf-8") as file:
-        return json.load(file)
+        backlog = json.load(file)
+    _remember_skeleton(backlog_path, backlog)
+
+    # 未反映のジャーナルを再生する
+    records = backlog_journal.read_journal(backlog_path)
+    if records:
+        backlog["tasks"] = backlog_journal.replay(backlog["tasks"], records)
+
+    if get_storage_mode() == "journal":
+        backlog_journal.take_snapshot(backlog_path, backlog["tasks"])
+    return backlog
 
 
 def load_tasks():
@@ -25,33 +119,144 @@ def load_tasks():
     return tasks
 
 
-def save_tasks(tasks):
+def save_tasks(tasks, skeleton=None):
+    """
+    タスクリストを保存方式に従って保存する
+    tasks 以外のトップレベルの値は保存済みのものを残す（skeleton を渡せばそれに置き換える）
+    """
+    # SIMILAR_TASKS=auto なら、変わったタスクの分だけ similar_tasks を更新してから保存する
+    if similarity_index.get_similar_tasks_mode() == "auto":
+        similarity_index.update_similar_tasks(get_backlog_path(), tasks)
+
+    if get_storage_mode() == "sqlite":
+        backlog_sqlite.save_tasks(get_db_path(), tasks, skeleton)
+        return
+
     backlog_path = get_backlog_path()
-    backlog = {"tasks": tasks}
-    with open(backlog_path, "w", encoding="utf-8") as backlog_file:
-        json.dump(backlog, backlog_file, ensure_ascii=False, indent=2)
+    current = get_skeleton(backlog_path)
+    if skeleton is None or skeleton == current:
+        skeleton = current
+    else:
+        # トップレベルの値が変わった場合はジャーナルに書けないので全体を書き直す
+        _write_tasks(backlog_path, tasks, skeleton)
+        backlog_journal.clear(backlog_path)
+        if get_storage_mode() == "journal":
+            backlog_journal.take_snapshot(backlog_path, tasks)
+        return
+
+    if get_storage_mode() == "journal" and not backlog_journal.needs_compaction(
+        backlog_path
+    ):
+        diff = backlog_journal.diff_tasks(backlog_path, tasks)
+        if diff is not None:
+            records, snapshot = diff
+            backlog_journal.append_records(backlog_path, records, snapshot)
+            return
+
+    _write_tasks(backlog_path, tasks, skeleton)
+    backlog_journal.clear(backlog_path)
+    if get_storage_mode() == "journal":
+        backlog_journal.take_snapshot(backlog_path, tasks)
+
+
+def put_tasks(updated_tasks):
+    """
+    IDで特定済みのタスクだけを書き戻す（IDは一意であること）
+    ジャーナル方式・sqlite方式ではバックログ全体を読み込まずに済む
+    """
+    if get_storage_mode() == "sqlite":
+        backlog_sqlite.put_tasks(get_db_path(), updated_tasks)
+        return
+
+    backlog_path = get_backlog_path()
+    if get_storage_mode() == "journal" and not backlog_journal.needs_compaction(
+        backlog_path
+    ):
+        records = [
+            {"op": "put", "id": task["id"], "task": task} for task in updated_tasks
+        ]
+        backlog_journal.append_records(backlog_path, records)
+        backlog_journal.drop_snapshot(backlog_path)
+        return
+
+    updated = {task["id"]: task for task in updated_tasks}
+    tasks = load_tasks()
+    for i, task in enumerate(tasks):
+        if task.get("id") in updated:
+            tasks[i] = updated.pop(task["id"])
+    tasks.extend(updated.values())
+    save_tasks(tasks)
+
+
+def find_tasks(task_ids):
+    """id または permanent_id が一致するタスクだけを読み込む"""
+    if get_storage_mode() == "sqlite":
+        return backlog_sqlite.find_tasks(get_db_path(), task_ids)
+    return backlog_index.find_tasks(task_ids, get_backlog_path())
+
+
+def compact_backlog():
+    """
+    ジャーナルをbacklog.jsonに畳み込む
+    sqlite方式ではデータベースの内容をbacklog.jsonに書き出す
+    """
+    backlog_path = get_backlog_path()
+    if get_storage_mode() == "sqlite":
+        backlog_sqlite.export_json(get_db_path(), backlog_path)
+        return
+    if not backlog_journal.read_journal(backlog_path):
+        backlog_journal.clear(backlog_path)
+        return
+    backlog = load_backlog()
+    write_backlog_file(backlog_path, backlog)
+    _remember_skeleton(backlog_path, backlog)
+    backlog_journal.clear(backlog_path)
+
+
+def load_backlog_file(path):
+    """
+    指定パスのバックログを読み込む
+    既定のbacklog.jsonであればジャーナルを反映したものを返す
+    """
+    if is_backlog_path(path):
+        return load_backlog()
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_backlog_file(path, backlog):
+    """
+    指定パスにバックログを保存する
+    既定のbacklog.jsonであれば保存方式に従う（tasks 以外のトップレベルの値も保存する）
+    """
+    if is_backlog_path(path):
+        skeleton = dict(backlog)
+        skeleton["tasks"] = None
+        save_tasks(backlog["tasks"], skeleton)
+    else:
+        write_backlog_file(path, backlog)
 
 
 def extract_ids(tasks=None):
     if tasks == None:
-        tasks = load_tasks()
+        if get_storage_mode() == "sqlite":
+            tasks = [{"id": id} for id in backlog_sqlite.extract_ids(get_db_path())]
+        else:
+            tasks = load_tasks()
 
     id_pattern = re.compile(r"^T\d{4}$")
     return [task["id"] for task in tasks if id_pattern.match(task["id"])]
 
 
 def find_next_available_id(used_ids=None, request=1):
+    """
+    未使用の一時IDを返す（request == 1 なら文字列、それ以外はリスト）
+    複数のIDを順に割り当てる場合は IdAllocator.from_ids() を1回だけ作って使うこと
+    """
     if used_ids == None:
         used_ids = extract_ids()
 
-    valid_ids = [id for id in used_ids if re.match(r"^T\d{4}$", id)]
-    used_numbers = sorted(int(id[1:]) for id in valid_ids)
-    result = []
-    for i in range(1, used_numbers[-1] + 2):
-        if i not in used_numbers:
-            if request == 1:
-                return f"T{i:04}"
-            result.append(f"T{i:04}")
-            if len(result) == request:
-                break
-    return result
+    allocator = IdAllocator.from_ids(used_ids)
+    if request == 1:
+        return allocator.next()
+    return allocator.reserve(request)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+依存関係の逆引き索引 / Reverse-dependency index with "newly unblocked" lookup
+
+各タスクの must 依存・ステータス・人的依存の待ち状態を要約した索引を
+tasks/.backlog.json.dependents に保存し、読み込み時に参照先から参照元
+（依存しているタスク）への逆引きを作ります。タスクを完了にしたときは
+そのタスクに依存しているタスクだけを調べるので、着手可能になったタスクを
+依存している数に比例する時間で求められます。
+Keeps a compact summary of every task's must dependencies, status and
+waiting human dependencies in tasks/.backlog.json.dependents, and derives
+the reverse adjacency (task -> dependents) on load. Completing a task only
+visits its dependents, so newly unblocked tasks are found in O(out-degree).
+
+- 索引は update(旧タスク, 新タスク) で依存関係の追加・削除に合わせて差分で更新する
+  update(old, new) adjusts the index incrementally as dependencies change
+- 保存時のバックログ（backlog.json・ジャーナル・sqlite）の更新時刻とサイズが
+  変わっていたら、バックログを1回読み込んで作り直す
+  The index is rebuilt from one full load when the backlog files changed
+  since it was saved
+- バックログにないタスク（アーカイブ済みなど）への依存は完了済みとみなす
+  Dependencies on tasks missing from the backlog (e.g. archived) count as done
+
+使用方法 / Usage:
+    python dependency_index.py rebuild          索引を再構築 / Rebuild the index
+    python dependency_index.py dependents ID... 依存しているタスクを表示 / List dependents
+"""
+
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import backlog_journal
+import backlog_sqlite
+
+INDEX_VERSION = 2
+DONE = "Done"
+
+
+def get_index_path(backlog_path: str) -> str:
+    directory, name = os.path.split(backlog_path)
+    return os.path.join(directory, f".{name}.dependents")
+
+
+def get_stamp(backlog_path: str) -> List[List]:
+    """バックログを構成するファイルの (名前, 更新時刻, サイズ)。存在するものだけ"""
+    db_path = backlog_sqlite.get_db_path(backlog_path)
+    stamp = []
+    for path in [
+        backlog_path,
+        backlog_journal.get_journal_path(backlog_path),
+        db_path,
+        db_path + "-wal",
+    ]:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stamp.append([os.path.basename(path), stat.st_mtime_ns, stat.st_size])
+    return stamp
+
+
+def task_key(task: Dict) -> str:
+    return task.get("id") or task.get("permanent_id") or ""
+
+
+def summarize(task: Dict) -> Dict:
+    """索引に保存するタスクの要約"""
+    deps = task.get("dependencies")
+    deps = deps if isinstance(deps, dict) else {}
+    must = deps.get("must") if isinstance(deps.get("must"), list) else []
+    human = deps.get("human") if isinstance(deps.get("human"), list) else []
+    return {
+        "id": task.get("id") or "",
+        "permanent_id": task.get("permanent_id") or "",
+        "title": task.get("title", "NO_TITLE"),
+        "status": task.get("status"),
+        "requires": list(
+            dict.fromkeys(
+                dep["task_id"]
+                for dep in must
+                if isinstance(dep, dict) and isinstance(dep.get("task_id"), str) and dep["task_id"]
+            )
+        ),
+        "waiting": any(isinstance(dep, dict) and dep.get("status") == "waiting" for dep in human),
+    }
+
+
+class DependencyIndex:
+    """
+    must 依存の順方向の要約と、参照先から依存しているタスクへの逆引き
+    要約はタスクごとに通し番号で持つ（id / permanent_id が重複するタスクも別々に扱う）
+    """
+
+    def __init__(self, entries: Optional[Iterable[Dict]] = None):
+        self.entries: Dict[int, Dict] = {}
+        # id と permanent_id -> その値を持つタスクの番号
+        self.aliases: Dict[str, List[int]] = {}
+        # 参照先（依存に書かれた task_id） -> 依存しているタスクの番号
+        self.dependents: Dict[str, Set[int]] = {}
+        self._next_key = 0
+        for entry in entries or ():
+            self._add_entry(entry)
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[Dict]) -> "DependencyIndex":
+        index = cls()
+        for task in tasks:
+            if isinstance(task, dict):
+                index.add(task)
+        return index
+
+    @staticmethod
+    def _aliases(entry: Dict) -> List[str]:
+        return list(dict.fromkeys(alias for alias in (entry["id"], entry["permanent_id"]) if alias))
+
+    def _add_entry(self, entry: Dict) -> None:
+        if not (entry["id"] or entry["permanent_id"]):
+            return
+        key = self._next_key
+        self._next_key += 1
+        self.entries[key] = entry
+        for alias in self._aliases(entry):
+            self.aliases.setdefault(alias, []).append(key)
+        for target in entry["requires"]:
+            self.dependents.setdefault(target, set()).add(key)
+
+    def _find(self, entry: Dict) -> Optional[int]:
+        """entry と同じタスクの番号（要約が一致するものを優先し、なければ同じIDのもの）"""
+        candidates = self.aliases.get(entry["id"] or entry["permanent_id"], [])
+        same_ids = None
+        for key in candidates:
+            current = self.entries[key]
+            if current == entry:
+                return key
+            if same_ids is None and (current["id"], current["permanent_id"]) == (
+                entry["id"],
+                entry["permanent_id"],
+            ):
+                same_ids = key
+        return same_ids
+
+    def add(self, task: Dict) -> None:
+        self._add_entry(summarize(task))
+
+    def remove(self, task: Dict) -> None:
+        entry = summarize(task)
+        if not (entry["id"] or entry["permanent_id"]):
+            return
+        key = self._find(entry)
+        if key is None:
+            return
+        entry = self.entries.pop(key)
+        for alias in self._aliases(entry):
+            keys = self.aliases[alias]
+            keys.remove(key)
+            if not keys:
+                del self.aliases[alias]
+        for target in entry["requires"]:
+            dependents = self.dependents.get(target)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self.dependents[target]
+
+    def update(self, old: Optional[Dict], new: Optional[Dict]) -> None:
+        """タスクの変更（追加は old=None、削除は new=None）を反映する"""
+        if old is not None:
+            self.remove(old)
+        if new is not None:
+            self.add(new)
+
+    def apply_changes(self, before: Iterable[Any], after: Iterable[Any]) -> None:
+        """
+        保存前後のタスクリストの差分を反映する
+        変更したタスクは別のオブジェクトであること（patch_log と同じく元のタスクは書き換えない）
+        """
+        before = [task for task in before if isinstance(task, dict)]
+        after = [task for task in after if isinstance(task, dict)]
+        before_ids = {id(task) for task in before}
+        after_ids = {id(task) for task in after}
+        for task in before:
+            if id(task) not in after_ids:
+                self.remove(task)
+        for task in after:
+            if id(task) not in before_ids:
+                self.add(task)
+
+    def is_done(self, reference: str) -> bool:
+        # バックログにないタスク（アーカイブ済みなど）は完了済みとみなす
+        # 同じIDのタスクが複数あれば、すべて完了していれば完了とみなす
+        return all(self.entries[key]["status"] == DONE for key in self.aliases.get(reference, ()))
+
+    def blockers(self, key: int) -> List[str]:
+        """タスクの着手を妨げている未完了の must 依存（人的依存の待ちは "human"）"""
+        entry = self.entries[key]
+        blocking = [target for target in entry["requires"] if not self.is_done(target)]
+        if entry["waiting"]:
+            blocking.append("human")
+        return blocking
+
+    def dependents_of(self, task: Dict) -> List[int]:
+        """task に must で依存しているタスクの番号（id と permanent_id のどちらでの参照も含む）"""
+        found: Set[int] = set()
+        for alias in (task.get("id"), task.get("permanent_id")):
+            if alias:
+                found.update(self.dependents.get(alias, ()))
+        return sorted(found)
+
+    def newly_unblocked(self, completed: Iterable[Dict]) -> List[Dict]:
+        """
+        completed（未完了から完了にしたタスク）に依存していて、ほかに妨げがなくなったタスク
+        update() で完了を反映した後に呼ぶこと。依存しているタスクだけを調べる
+        """
+        found = {}
+        for task in completed:
+            for key in self.dependents_of(task):
+                entry = self.entries[key]
+                if key not in found and entry["status"] != DONE and not self.blockers(key):
+                    found[key] = entry
+        return list(found.values())
+
+    def to_dict(self, stamp: List[List]) -> Dict:
+        return {"version": INDEX_VERSION, "stamp": stamp, "entries": list(self.entries.values())}
+
+
+def save_index(backlog_path: str, index: DependencyIndex) -> None:
+    """現在のバックログのファイルの状態とともに保存する（バックログの保存後に呼ぶ）"""
+    path = get_index_path(backlog_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(get_stamp(backlog_path)), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_index(backlog_path: str, tasks: Optional[List[Dict]] = None) -> DependencyIndex:
+    """
+    索引を読み込む。バックログが保存時から変わっていれば作り直して保存する
+    tasks: 読み込み済みのタスク（作り直しに使う。省略時は load_tasks で読み込む）
+    """
+    path = get_index_path(backlog_path)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION and data.get("stamp") == get_stamp(backlog_path):
+                return DependencyIndex(data["entries"])
+        except (json.JSONDecodeError, KeyError):
+            pass
+    if tasks is None:
+        from common_id_utils import load_tasks
+
+        tasks = load_tasks()
+    index = DependencyIndex.from_tasks(tasks)
+    save_index(backlog_path, index)
+    return index
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path, load_tasks
+
+    load_dotenv()
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ["rebuild", "dependents"]:
+        print(__doc__)
+        sys.exit(1)
+
+    backlog_path = get_backlog_path()
+    if sys.argv[1] == "rebuild":
+        index = DependencyIndex.from_tasks(load_tasks())
+        save_index(backlog_path, index)
+        edges = sum(len(keys) for keys in index.dependents.values())
+        print(f"Indexed {len(index.entries)} tasks and {edges} must dependencies")
+        return
+
+    index = load_index(backlog_path)
+    for reference in sys.argv[2:]:
+        # 永続IDで書かれた依存も含めるため、同じIDのタスクの別名でも引く
+        dependents = set(index.dependents_of({"id": reference}))
+        for key in index.aliases.get(reference, ()):
+            dependents.update(index.dependents_of(index.entries[key]))
+        print(f"{reference}:")
+        for dependent in sorted(dependents):
+            blocking = index.blockers(dependent)
+            state = f"blocked by {', '.join(blocking)}" if blocking else "ready"
+            entry = index.entries[dependent]
+            print(f"  - {task_key(entry)}: {entry['title']} ({state})")
+
+if __name__ == "__main__":
+    main()
@@ -20,7 +20,6 @@ import os
 import sys
 import json
 import re
-import subprocess
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
@@ -182,63 +181,48 @@ def extract_tasks_from_segment(segment: Dict[str, str]) -> List[Dict]:
 
 def get_used_task_ids() -> set:
     """Get all currently used task IDs from the system"""
-    manage_ids_path = os.path.join(REPO_ROOT, "scripts", "manage_4digit_ids.py")
-    try:
-        result = subprocess.run(
-            [sys.executable, manage_ids_path, "list"],
-            capture_output=True,
-            text=True,
-            cwd=REPO_ROOT,
-            check=True
-        )
-        return {line.split(":")[0].strip() for line in result.stdout.splitlines() if ":" in line}
-    except subprocess.CalledProcessError as e:
-        print(f"Warning: Could not get list of used IDs: {e}")
-        return set()
+    return manage_4digit_ids.IdRegistry.snapshot().used_ids
 
-def get_next_task_id(used_ids: set) -> str:
-    """Get next available task ID, ensuring it's not in used_ids"""
-    # Update with any new IDs from the system
-    current_used_ids = get_used_task_ids()
-    all_used_ids = used_ids.union(current_used_ids)
-    
-    # Convert IDs to integers for easier manipulation
-    used_nums = set()
-    for id_str in all_used_ids:
-        if id_str.startswith('T') and id_str[1:].isdigit():
-            used_nums.add(int(id_str[1:]))
-    
-    # Find first available number starting from 1
-    for i in range(1, 10000):  # 1 to 9999
-        if i not in used_nums:
-            new_id = f"T{i:04d}"
-            used_ids.add(new_id)  # Add to our tracking set
-            return new_id
-    
-    raise RuntimeError("No available IDs in the pool (all T0001-T9999 are used)")
+def is_placeholder_patch(patch: Dict) -> bool:
+    return (
+        patch.get("op") == "add"
+        and "value" in patch
+        and patch["value"].get("id") == "ID_PLACEHOLDER"
+    )
 
-def assign_task_ids(patches: List[Dict], used_ids: set) -> List[Dict]:
+def assign_task_ids(
+    patches: List[Dict],
+    used_ids: set,
+    registry: Optional[manage_4digit_ids.IdRegistry] = None,
+) -> List[Dict]:
     """
     Replace ID_PLACEHOLDER with actual task IDs.
     
     Args:
         patches (List[Dict]): List of JSONPatch operations
         used_ids (set): Set of already used task IDs
+        registry (IdRegistry): Snapshot of backlog and archive IDs
+            (taken here if omitted)
         
     Returns:
         List[Dict]: Updated patches with real task IDs
     """
     updated_patches = []
     assigned_ids = set()
+
+    # Reserve every ID this run needs from a single snapshot
+    if registry is None:
+        registry = manage_4digit_ids.IdRegistry.snapshot()
+    registry.mark_used(used_ids)
+    try:
+        new_ids = iter(registry.reserve(sum(map(is_placeholder_patch, patches))))
+    except ValueError as e:
+        raise RuntimeError(str(e))
     
     print("\nAssigning task IDs...")
     for i, patch in enumerate(patches, 1):
-        if (
-            patch.get("op") == "add" 
-            and "value" in patch 
-            and patch["value"].get("id") == "ID_PLACEHOLDER"
-        ):
-            new_id = get_next_task_id(used_ids)
+        if is_placeholder_patch(patch):
+            new_id = next(new_ids)
             patch["value"]["id"] = new_id
             assigned_ids.add(new_id)
             used_ids.add(new_id)
@@ -301,7 +285,8 @@ def main():
         
         # Get initial set of used IDs
         print("\nFetching current task IDs...")
-        used_ids = get_used_task_ids()
+        registry = manage_4digit_ids.IdRegistry.snapshot()
+        used_ids = set(registry.used_ids)
         print(f"Found {len(used_ids)} existing task IDs")
         
         # First collect all tasks without assigning IDs
@@ -348,7 +333,7 @@ def main():
         print("Assigning IDs to tasks...")
         
         # Now assign IDs to all tasks at once
-        all_patches = assign_task_ids(unassigned_patches, used_ids)
+        all_patches = assign_task_ids(unassigned_patches, used_ids, registry)
         
         # Save patches to file
         with open(PATCH_PATH, "w", encoding="utf-8") as f:
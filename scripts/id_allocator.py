@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+ビットマップによる一時ID割り当て / Bitmap-based temporary ID allocator
+
+T0000-T9999 の10,000個のIDを10,000ビット（1,250バイト）のビットマップで管理します。
+Tracks the 10,000 IDs T0000-T9999 in a 10,000-bit (1,250-byte) bitmap.
+
+- next(): 最小の未使用IDを返す（カーソルが後退しないため償却O(1)）
+  Returns the lowest free ID, amortized O(1) because the cursor only moves forward
+- reserve(n): n個の未使用IDをまとめて確保 / Reserves n free IDs at once
+- release(id): IDをプールに戻す / Returns an ID to the pool
+- save()/load(): ビットマップをファイルに保存・復元 / Persist and restore the bitmap
+
+使用方法 / Usage:
+    python id_allocator.py rebuild   バックログとアーカイブから再構築して保存 / Rebuild and persist
+    python id_allocator.py status    保存済みビットマップの状態を表示 / Show persisted bitmap status
+"""
+
+import os
+import re
+import sys
+from typing import Iterable, List
+
+ID_PREFIX = "T"
+ID_MIN = 1  # T0000は割り当てない / T0000 is never handed out
+ID_MAX = 9999
+BITMAP_BYTES = (ID_MAX + 1 + 7) // 8
+
+# 末尾の改行や全角数字を受け付けないよう fullmatch で使う
+_ID_PATTERN = re.compile(r"T([0-9]{4})")
+
+
+class IdAllocator:
+    def __init__(self, bitmap: bytes = b""):
+        self.bitmap = bytearray(bitmap[:BITMAP_BYTES].ljust(BITMAP_BYTES, b"\0"))
+        # これより小さい番号はすべて使用中 / every number below the cursor is used
+        self.cursor = ID_MIN
+
+    @classmethod
+    def from_ids(cls, used_ids: Iterable[str]) -> "IdAllocator":
+        """使用中のIDから作成する（TXXXX形式以外は無視）"""
+        allocator = cls()
+        for task_id in used_ids:
+            allocator.mark_used(task_id)
+        return allocator
+
+    @staticmethod
+    def parse(task_id: str) -> int:
+        """TXXXX形式のIDを番号に変換する。形式外なら-1"""
+        m = _ID_PATTERN.fullmatch(task_id) if isinstance(task_id, str) else None
+        return int(m.group(1)) if m else -1
+
+    def is_used(self, number: int) -> bool:
+        return bool(self.bitmap[number >> 3] & (1 << (number & 7)))
+
+    def mark_used(self, task_id: str) -> None:
+        number = self.parse(task_id)
+        if number >= 0:
+            self.bitmap[number >> 3] |= 1 << (number & 7)
+
+    def release(self, task_id: str) -> bool:
+        """IDをプールに戻す。使用中でなければFalse"""
+        number = self.parse(task_id)
+        if number < ID_MIN or not self.is_used(number):
+            return False
+        self.bitmap[number >> 3] &= ~(1 << (number & 7)) & 0xFF
+        self.cursor = min(self.cursor, number)
+        return True
+
+    def next(self) -> str:
+        """最小の未使用IDを確保して返す"""
+        number = self.cursor
+        while number <= ID_MAX:
+            byte = self.bitmap[number >> 3]
+            if byte == 0xFF:
+                # 8個すべて使用中のバイトは丸ごと飛ばす
+                number = (number | 7) + 1
+                continue
+            if not byte & (1 << (number & 7)):
+                self.bitmap[number >> 3] = byte | (1 << (number & 7))
+                self.cursor = number + 1
+                return f"{ID_PREFIX}{number:04d}"
+            number += 1
+        self.cursor = number
+        raise ValueError("No available IDs in the pool (all T0001-T9999 are used)")
+
+    def reserve(self, count: int) -> List[str]:
+        """count個の未使用IDをまとめて確保する。足りなければ何も確保せずValueError"""
+        if count > self.available_count():
+            raise ValueError(
+                f"Cannot reserve {count} IDs: only {self.available_count()} available"
+            )
+        return [self.next() for _ in range(count)]
+
+    def used_count(self) -> int:
+        used = sum(bin(byte).count("1") for byte in self.bitmap)
+        # T0000は割り当て対象外なので数えない
+        return used - (1 if self.is_used(0) else 0)
+
+    def available_count(self) -> int:
+        return (ID_MAX - ID_MIN + 1) - self.used_count()
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(bytes(self.bitmap))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IdAllocator":
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+
+def get_bitmap_path() -> str:
+    from common_id_utils import get_backlog_path
+
+    return os.path.join(os.path.dirname(get_backlog_path()), ".id_bitmap")
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    if len(sys.argv) != 2 or sys.argv[1] not in ["rebuild", "status"]:
+        print(__doc__)
+        sys.exit(1)
+
+    bitmap_path = get_bitmap_path()
+    if sys.argv[1] == "rebuild":
+        import manage_4digit_ids
+
+        used_ids, _ = manage_4digit_ids.get_used_ids()
+        allocator = IdAllocator.from_ids(used_ids)
+        allocator.save(bitmap_path)
+        print(f"Saved bitmap of {allocator.used_count()} used IDs to {bitmap_path}")
+    else:
+        allocator = IdAllocator.load(bitmap_path)
+        print(f"Used IDs:      {allocator.used_count()}")
+        print(f"Available IDs: {allocator.available_count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+人間が入力したタスクIDの解決 / Resolve user-typed task references
+
+T0014・t14・14・0014 のような一時ID、永続ID（UUID）、タイトルの先頭部分を
+タスクの位置に対応づけます。正規化した対応表をタスクの読み込みごとに1回だけ作り、
+複数の入力をそれぞれ辞書引き1回で解決します。
+Maps temporary IDs typed as T0014, t14, 14 or 0014, permanent IDs (UUIDs)
+and title prefixes to task positions. A normalized lookup table is built
+once per load, and each reference is then resolved with a dict lookup.
+
+- 一時IDの形の入力は一時IDとしてだけ、UUIDの形の入力は永続IDとしてだけ探す
+  ID-shaped input is looked up only as a temporary ID, UUID-shaped input only
+  as a permanent ID
+- それ以外はタイトルの先頭部分として探す（大文字小文字を区別しない、2文字以上）
+  Anything else is a case-insensitive title prefix (at least 2 characters)
+- 複数のタスクに一致した入力は曖昧として報告し、どれにも対応づけない
+  References matching several tasks are reported as ambiguous and not resolved
+
+使用方法 / Usage:
+    resolver = IdResolver(tasks)
+    result = resolver.resolve_all(["14", "T0015", "ブログ記事"])
+    result["resolved"]   # {入力: 位置}
+    result["ambiguous"]  # {入力: [位置, ...]}
+    result["missing"]    # [入力, ...]
+"""
+
+import bisect
+import re
+from typing import Dict, Iterable, List, Optional
+
+from id_allocator import ID_MAX
+
+MIN_TITLE_PREFIX = 2
+# 曖昧な入力について表示する候補の数
+MAX_LISTED = 10
+
+_TEMPORARY_ID = re.compile(r"^[Tt]?0*(\d+)$")
+_UUID = re.compile(r"^[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}$")
+
+
+def normalize_id(reference: str) -> Optional[str]:
+    """一時IDの形の入力を T0014 の形にする（一時IDの形でなければNone）"""
+    m = _TEMPORARY_ID.match(reference.strip())
+    if not m or int(m.group(1)) > ID_MAX:
+        return None
+    return f"T{int(m.group(1)):04d}"
+
+
+def normalize_permanent_id(reference: str) -> Optional[str]:
+    reference = reference.strip()
+    return reference.lower() if _UUID.match(reference) else None
+
+
+def lookup_keys(reference: str) -> List[str]:
+    """
+    backlog_index などの完全一致の索引で引くためのキー
+    タイトルの先頭部分による指定は索引では引けないので、一致がなければ全体を読み込むこと
+    """
+    keys = [reference]
+    for key in (normalize_id(reference), normalize_permanent_id(reference)):
+        if key is not None and key != reference:
+            keys.append(key)
+    return keys
+
+
+class IdResolver:
+    """タスクのリストに対する入力IDの対応表"""
+
+    def __init__(self, tasks: List[Dict], titles: bool = True):
+        self.tasks = tasks
+        self.titles = titles
+        self.by_id: Dict[str, List[int]] = {}
+        self.by_permanent_id: Dict[str, List[int]] = {}
+        for position in range(len(tasks)):
+            self._index(position)
+        self._title_keys: Optional[List[str]] = None
+        self._title_positions: List[int] = []
+
+    def _index(self, position: int) -> None:
+        task = self.tasks[position]
+        if not isinstance(task, dict):
+            return
+        task_id = task.get("id")
+        if isinstance(task_id, str) and task_id:
+            key = normalize_id(task_id) or task_id
+            self.by_id.setdefault(key, []).append(position)
+        permanent_id = task.get("permanent_id")
+        if isinstance(permanent_id, str) and permanent_id:
+            self.by_permanent_id.setdefault(permanent_id.lower(), []).append(position)
+
+    def add(self, position: int) -> None:
+        """作成後に tasks に追加したタスクを対応表に加える（IDの変更には追従しない）"""
+        self._index(position)
+        self._title_keys = None
+
+    def _build_titles(self) -> None:
+        entries = sorted(
+            (task["title"].casefold(), position)
+            for position, task in enumerate(self.tasks)
+            if isinstance(task, dict) and isinstance(task.get("title"), str)
+        )
+        self._title_keys = [title for title, _ in entries]
+        self._title_positions = [position for _, position in entries]
+
+    def _by_title_prefix(self, prefix: str) -> List[int]:
+        if self._title_keys is None:
+            self._build_titles()
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self._title_keys, prefix)
+        end = bisect.bisect_right(self._title_keys, prefix + "\uffff")
+        return sorted(self._title_positions[start:end])
+
+    def resolve(self, reference: str) -> List[int]:
+        """入力に一致するタスクの位置（一致しなければ空、曖昧なら複数）"""
+        task_id = normalize_id(reference)
+        if task_id is not None:
+            return self.by_id.get(task_id, [])
+        permanent_id = normalize_permanent_id(reference)
+        if permanent_id is not None:
+            return self.by_permanent_id.get(permanent_id, [])
+        reference = reference.strip()
+        # 決まった形でないID（古いデータなど）は完全一致で探す
+        if reference in self.by_id:
+            return self.by_id[reference]
+        if reference.lower() in self.by_permanent_id:
+            return self.by_permanent_id[reference.lower()]
+        if self.titles and len(reference) >= MIN_TITLE_PREFIX:
+            return self._by_title_prefix(reference)
+        return []
+
+    def resolve_all(self, references: Iterable[str]) -> Dict:
+        """
+        複数の入力をまとめて解決する
+        戻り値：{"resolved": {入力: 位置}, "ambiguous": {入力: [位置, ...]}, "missing": [入力, ...]}
+        """
+        result: Dict = {"resolved": {}, "ambiguous": {}, "missing": []}
+        for reference in references:
+            positions = self.resolve(reference)
+            if len(positions) == 1:
+                result["resolved"][reference] = positions[0]
+            elif positions:
+                result["ambiguous"][reference] = positions
+            else:
+                result["missing"].append(reference)
+        return result
+
+    def describe_problems(self, result: Dict) -> List[str]:
+        """resolve_all の結果のうち、曖昧な入力と見つからない入力の説明"""
+        lines = []
+        for reference, positions in result["ambiguous"].items():
+            lines.append(f"「{reference}」に一致するタスクが複数あります:")
+            for position in positions[:MAX_LISTED]:
+                task = self.tasks[position]
+                label = task.get("id") or task.get("permanent_id")
+                lines.append(f"  - {label}: {task.get('title', 'NO_TITLE')}")
+            if len(positions) > MAX_LISTED:
+                lines.append(f"  - ...ほか{len(positions) - MAX_LISTED}件")
+        for reference in result["missing"]:
+            lines.append(f"「{reference}」に一致するタスクは見つかりませんでした。")
+        return lines
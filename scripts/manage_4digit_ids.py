@@ -43,6 +43,8 @@ IDシステムの仕様 / ID System Specifications:
 注意事項 / Notes:
 - バックログとアーカイブの両方からIDを追跡
   Tracks IDs from both backlog and archives
+- アーカイブのIDは tasks/.archive_manifest.json に記録し、変更されたファイルだけを読み直す
+  Archive IDs are cached in tasks/.archive_manifest.json; only changed files are re-read
 - 永続ID(UUID)と併用可能
   Can be used alongside permanent IDs (UUIDs)
 - IDの重複を自動的に検出・防止
@@ -55,6 +57,10 @@ import os
 from typing import Set, Dict, List, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
+import archive_store
+from common_id_utils import load_backlog_file
+from id_allocator import IdAllocator
+from archive_manifest import iter_manifest_tasks, refresh_manifest
 
 # Load environment variables
 load_dotenv()
@@ -75,8 +81,7 @@ ARCHIVE_DIR = os.path.join(DATA_ROOT, "tasks", "archive")
 def load_backlog() -> Dict:
     """Load the current backlog.json file"""
     try:
-        with open(BACKLOG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_backlog_file(BACKLOG_PATH)
     except FileNotFoundError:
         print(f"Error: Backlog file not found at {BACKLOG_PATH}")
         sys.exit(1)
@@ -91,16 +96,12 @@ def load_archived_tasks() -> List[Dict]:
     if not os.path.exists(ARCHIVE_DIR):
         return []
 
-    for file in os.listdir(ARCHIVE_DIR):
-        if file.endswith(".json"):
-            try:
-                with open(os.path.join(ARCHIVE_DIR, file), "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if "tasks" in data:
-                        archived_tasks.extend(data["tasks"])
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                print(f"Warning: Error reading archive file {file}: {e}")
-                continue
+    for path in archive_store.list_archive_files(ARCHIVE_DIR):
+        try:
+            archived_tasks.extend(archive_store.read_archive_file(path))
+        except (json.JSONDecodeError, FileNotFoundError) as e:
+            print(f"Warning: Error reading archive file {os.path.basename(path)}: {e}")
+            continue
     return archived_tasks
 
 
@@ -120,9 +121,9 @@ def get_used_ids() -> Tuple[Set[str], Dict[str, str]]:
             used_ids.add(task["id"])
             id_to_title[task["id"]] = task.get("title", "Unknown")
 
-    # Check archives
-    archived_tasks = load_archived_tasks()
-    for task in archived_tasks:
+    # Check archives (only files changed since the last run are re-read)
+    manifest = refresh_manifest(ARCHIVE_DIR)
+    for task in iter_manifest_tasks(manifest):
         if "id" in task and task["id"]:
             used_ids.add(task["id"])
             id_to_title[task["id"]] = task.get("title", "Unknown (Archived)")
@@ -130,25 +131,45 @@ def get_used_ids() -> Tuple[Set[str], Dict[str, str]]:
     return used_ids, id_to_title
 
 
+class IdRegistry:
+    """
+    バックログとアーカイブの使用中IDのスナップショット
+    Snapshot of the IDs used by the backlog and archives.
+
+    他のスクリプトからインポートして使う。スナップショットは1回だけ作り、
+    reserve() でまとめてIDを確保する。
+    Import it from other scripts: take one snapshot per run and reserve
+    IDs in batches with reserve().
+    """
+
+    def __init__(self, used_ids: Set[str], id_to_title: Dict[str, str]):
+        self.used_ids = set(used_ids)
+        self.id_to_title = dict(id_to_title)
+        self.allocator = IdAllocator.from_ids(self.used_ids)
+
+    @classmethod
+    def snapshot(cls) -> "IdRegistry":
+        """現在のバックログとアーカイブからスナップショットを作成する"""
+        used_ids, id_to_title = get_used_ids()
+        return cls(used_ids, id_to_title)
+
+    def mark_used(self, task_ids: Set[str]) -> None:
+        """スナップショット外で使われたIDを追加する"""
+        for task_id in task_ids:
+            self.used_ids.add(task_id)
+            self.allocator.mark_used(task_id)
+
+    def reserve(self, count: int) -> List[str]:
+        """count個の未使用IDをまとめて確保する"""
+        reserved = self.allocator.reserve(count)
+        self.used_ids.update(reserved)
+        return reserved
+
+
 def get_next_available_id() -> str:
     """Get the next available ID from the pool"""
     used_ids, _ = get_used_ids()
-    
-    if not used_ids:
-        return f"{ID_PREFIX}0001"  # Start with T0001 if no IDs are used
-        
-    # Convert IDs to integers for easier manipulation
-    used_nums = set()
-    for id_str in used_ids:
-        if id_str.startswith(ID_PREFIX) and id_str[1:].isdigit():
-            used_nums.add(int(id_str[1:]))
-    
-    # Find first available number
-    for i in range(ID_MIN, ID_MAX + 1):
-        if i not in used_nums:
-            return f"{ID_PREFIX}{i:04d}"
-    
-    raise ValueError("No available IDs in the pool (all T0000-T9999 are used)")
+    return IdAllocator.from_ids(used_ids).next()
 
 
 def is_valid_id(task_id: str) -> bool:
@@ -1,45 +1,114 @@
+import copy
 import sys
-import json
-import os
 from datetime import datetime
-from util_human_id_match import human_id_match
+from common_id_utils import find_tasks, get_backlog_path, load_tasks, put_tasks, save_tasks
 from dotenv import load_dotenv
+from id_resolver import IdResolver, lookup_keys
+import dependency_index
+import patch_log
 
 # Load environment variables
 load_dotenv()
 
-# タスクファイルのパス
-REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-data_root = os.getenv("DATA_ROOT", os.path.join(os.path.dirname(REPO_ROOT), "ai_project_manager_data"))
-BACKLOG_FILE = os.path.join(data_root, "tasks", "backlog.json")
+
+def find_target_tasks(talk_ids):
+    """
+    索引を使って対象タスクだけを読み込む
+    一致しないID・曖昧なID・一時IDのないタスク・変更ログで指すIDが
+    他のタスクと重なるタスクがある場合は None（全体を読み込む）
+    """
+    found = find_tasks([key for talk_id in talk_ids for key in lookup_keys(talk_id)])
+    result = IdResolver(found, titles=False).resolve_all(talk_ids)
+    if result["missing"] or result["ambiguous"]:
+        return None
+    positions = sorted(set(result["resolved"].values()))
+    if not all(found[p].get("id") for p in positions):
+        return None
+    targets = [found[p] for p in positions]
+    # 変更ログの @ID はバックログ全体で一意でなければならない
+    keys = [patch_log.task_key(task) for task in targets]
+    sharing = find_tasks(keys)
+    if len(sharing) != len(targets):
+        return None
+    return targets
 
 
 def mark_done(talk_ids):
-    # backlog.jsonを読み込む
-    with open(BACKLOG_FILE, "r") as file:
-        data = json.load(file)
-
-    # 各タスクのステータスを更新
-    done_tasks = []
-    for task in data["tasks"]:
-        task_id = task["id"]
-        if any(human_id_match(task_id, talk_id) for talk_id in talk_ids):
+    backlog_path = get_backlog_path()
+
+    # 対象タスクを索引から読み込む
+    done_tasks = find_target_tasks(talk_ids)
+    if done_tasks is not None:
+        # 依存関係の索引は保存前のバックログに対して読み込む（古ければ作り直す）
+        index = dependency_index.load_index(backlog_path)
+        before = copy.deepcopy(done_tasks)
+        for task in done_tasks:
             task["status"] = "Done"
             task["completion_time"] = datetime.now().isoformat()
-            done_tasks.append(task)
+        if done_tasks:
+            put_tasks(done_tasks)
+        after, partial = done_tasks, True
+        previous = before
+        ambiguous = False
+    else:
+        # backlog.jsonを読み込み、IDを解決する（曖昧なIDは完了にしない）
+        tasks = load_tasks()
+        index = dependency_index.load_index(backlog_path, tasks)
+        before = list(tasks)
+        resolver = IdResolver(tasks, titles=False)
+        result = resolver.resolve_all(talk_ids)
+        for line in resolver.describe_problems(result):
+            print(line)
+        ambiguous = bool(result["ambiguous"])
+
+        # 各タスクのステータスを更新（変更ログ用に元のタスクは書き換えない）
+        done_tasks = []
+        previous = []
+        for i in sorted(set(result["resolved"].values())):
+            previous.append(tasks[i])
+            tasks[i] = dict(
+                tasks[i], status="Done", completion_time=datetime.now().isoformat()
+            )
+            done_tasks.append(tasks[i])
 
-    # 更新されたデータをbacklog.jsonに書き込む
-    with open(BACKLOG_FILE, "w") as file:
-        json.dump(data, file, indent=2, ensure_ascii=False)
+        # 更新されたデータをbacklog.jsonに書き込む
+        if done_tasks:
+            save_tasks(tasks)
+        after, partial = tasks, False
+
+    # 依存関係の索引に完了を反映し、着手可能になったタスクを求める
+    for old, new in zip(previous, done_tasks):
+        index.update(old, new)
+    unblocked = index.newly_unblocked(
+        old for old in previous if old.get("status") != dependency_index.DONE
+    )
+    if done_tasks:
+        dependency_index.save_index(backlog_path, index)
+
+        # 変更ログに記録する（patch_log.py undo で取り消せる）
+        patch_log.record(
+            backlog_path,
+            "mark_done",
+            before,
+            after,
+            note=" ".join(talk_ids),
+            partial=partial,
+        )
 
     # 完了したタスクを報告
     if done_tasks:
         print("以下のタスクが完了しました:")
         for task in done_tasks:
-            print(f"- {task['id']}: {task.get('title', 'NO_TITLE')}")
-    else:
+            print(f"- {task['id'] or task.get('permanent_id')}: {task.get('title', 'NO_TITLE')}")
+    elif not ambiguous:
+        # 曖昧なIDは describe_problems が候補を表示済み
         print("指定されたIDのタスクは見つかりませんでした。")
 
+    if unblocked:
+        print("以下のタスクが着手可能になりました:")
+        for entry in unblocked:
+            print(f"- {entry['id'] or entry['permanent_id']}: {entry['title']}")
+
 
 if __name__ == "__main__":
     # コマンドライン引数からTalk IDを取得
@@ -1,121 +1,188 @@
 #!/usr/bin/env python3
 
+import argparse
 import json
 import sys
-from scripts.check_used_ids import extract_ids, find_next_available_id
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
+from common_id_utils import is_backlog_path, load_backlog_file, save_backlog_file
+from id_resolver import IdResolver
+from manage_4digit_ids import IdRegistry
+import dependency_index
+import patch_log
+import task_graph
 
 
 def load_json(file_path: str) -> List[Dict]:
     """JSONファイルからタスクデータを読み込む"""
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        if not isinstance(data, dict) or "tasks" not in data:
-            raise ValueError(
-                f'Expected a dict with "tasks" key in {file_path}, got {type(data)}'
-            )
-        return data["tasks"]
+    data = load_backlog_file(file_path)
+    if not isinstance(data, dict) or "tasks" not in data:
+        raise ValueError(
+            f'Expected a dict with "tasks" key in {file_path}, got {type(data)}'
+        )
+    return data["tasks"]
 
 
 def save_json(tasks: List[Dict], file_path: str):
     """タスクデータをJSONファイルに保存"""
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_backlog_file(file_path)
     data["tasks"] = tasks
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    save_backlog_file(file_path, data)
 
 
-def merge_tasks(task1: Dict, task2: Dict, json_path: str) -> Dict:
-    """2つのタスクを1つに統合"""
-    used_ids = extract_ids(load_json(json_path))
-    new_id = find_next_available_id(used_ids)
+def _unique(values: Iterable) -> List:
+    # 順序を保って重複を除く（ラベルなどはハッシュできる値）
+    return list(dict.fromkeys(values))
+
+
+def _task_keys(tasks: List[Dict]) -> set:
+    return {task.get(field) for task in tasks for field in ("id", "permanent_id")} - {None, ""}
+
+
+def merge_tasks(tasks: List[Dict], new_id: str, title: str = "") -> Dict:
+    """
+    複数のタスクを1つに統合（ステータスとタイプは最初のタスクを採用）
+    統合するタスク同士の依存関係・類似タスクは削除し、同じ参照先への参照は1つにまとめる
+    """
+    first = tasks[0]
     merged = {
-        "id": new_id,  # check_used_idsを使用して適切なIDを生成
-        "title": f"{task1['title']} + {task2['title']}",
-        "status": task1["status"],  # 基本的に最初のタスクのステータスを採用
-        "type": task1["type"],  # 基本的に最初のタスクのタイプを採用
-        "description": f"{task1['description']}\n\n=== 統合されたタスクの説明 ===\n{task2['description']}",
-        "merge_history": {
-            "merged_at": datetime.now().isoformat(),
-            "original_tasks": [
-                {"id": task1["id"], "title": task1["title"]},
-                {"id": task2["id"], "title": task2["title"]},
-            ],
-        },
+        "id": new_id,
+        "title": title or " + ".join(task["title"] for task in tasks),
+        "status": first["status"],  # 基本的に最初のタスクのステータスを採用
+    }
+    if "type" in first:
+        merged["type"] = first["type"]  # 基本的に最初のタスクのタイプを採用
+    merged["description"] = "".join(
+        [first["description"]]
+        + [f"\n\n=== 統合されたタスクの説明 ===\n{task['description']}" for task in tasks[1:]]
+    )
+    merged["merge_history"] = {
+        "merged_at": datetime.now().isoformat(),
+        "original_tasks": [{"id": task["id"], "title": task["title"]} for task in tasks],
     }
 
     # ラベルの統合
-    labels = set(task1.get("labels", []) + task2.get("labels", []))
+    labels = _unique(label for task in tasks for label in task.get("labels", []))
     if labels:
-        merged["labels"] = list(labels)
+        merged["labels"] = labels
 
     # 実行者の統合
-    assignable = set(task1.get("assignable_to", []) + task2.get("assignable_to", []))
+    assignable = _unique(a for task in tasks for a in task.get("assignable_to", []))
     if assignable:
-        merged["assignable_to"] = list(assignable)
+        merged["assignable_to"] = assignable
 
-    # 依存関係の統合
-    deps1 = task1.get("dependencies", {})
-    deps2 = task2.get("dependencies", {})
-
-    merged_deps = {}
+    # 依存関係の統合（統合するタスク同士の参照は自己参照になるので除く）
+    own_keys = _task_keys(tasks)
     for dep_type in ["must", "nice_to_have", "human"]:
-        combined = deps1.get(dep_type, []) + deps2.get(dep_type, [])
+        combined = []
+        targets = set()
+        for task in tasks:
+            for dep in task.get("dependencies", {}).get(dep_type, []):
+                target = dep.get("task_id")
+                if target is not None and (target in own_keys or target in targets):
+                    continue
+                targets.add(target)
+                combined.append(dep)
         if combined:
-            if "dependencies" not in merged:
-                merged["dependencies"] = {}
-            merged["dependencies"][dep_type] = combined
+            merged.setdefault("dependencies", {})[dep_type] = combined
 
-    return merged
+    # 類似タスクの統合
+    similar = []
+    targets = set()
+    for task in tasks:
+        for entry in task.get("similar_tasks", []):
+            target = entry.get("task_id")
+            if target in own_keys or target in targets:
+                continue
+            targets.add(target)
+            similar.append(entry)
+    if similar:
+        merged["similar_tasks"] = similar
 
+    return merged
 
-def find_task_by_id(tasks: List[Dict], task_id: str) -> Optional[Dict]:
-    """タスクIDからタスクを検索"""
-    for task in tasks:
-        if task["id"] == task_id:
-            return task
-    return None
 
+def merge_into(
+    tasks: List[Dict], positions: List[int], title: str = "", registry: Optional[IdRegistry] = None
+) -> Dict:
+    """
+    positions のタスクを統合したタスクで置き換える（tasks は書き換えられる）
+    新しいIDはバックログとアーカイブの使用中IDを避けて確保する（registry 省略時はスナップショットを作る）
+    他のタスクから統合前のタスクへの参照は、逆引き索引で見つけて新しいIDに付け替える
+    戻り値：{"task": 統合したタスク, "rewired": 付け替えた参照の数}
+    """
+    group = [tasks[position] for position in positions]
+    if registry is None:
+        registry = IdRegistry.snapshot()
+    registry.mark_used({task.get("id") for task in tasks if task.get("id")})
+    (new_id,) = registry.reserve(1)
+    merged = merge_tasks(group, new_id, title)
+
+    renamed = {key: new_id for key in _task_keys(group)}
+    rewired = task_graph.rewire_references(tasks, renamed, task_graph.build_referrers(tasks))
 
-def remove_task(tasks: List[Dict], task_id: str) -> List[Dict]:
-    """指定されたIDのタスクを削除"""
-    return [task for task in tasks if task["id"] != task_id]
+    # 元のタスクを削除し、統合タスクを追加
+    removed = set(positions)
+    tasks[:] = [task for position, task in enumerate(tasks) if position not in removed]
+    tasks.append(merged)
+    return {"task": merged, "rewired": rewired}
 
 
 def main():
-    if len(sys.argv) != 4:
-        print("使用方法: python merge_tasks.py <backlog.json> <task_id1> <task_id2>")
+    parser = argparse.ArgumentParser(description="複数のタスクを1つに統合します")
+    parser.add_argument("backlog", help="backlog.json のパス")
+    parser.add_argument("task_ids", nargs="+", help="統合するタスク（2つ以上、先頭のタスクのステータスを採用）")
+    parser.add_argument("--title", default="", help="統合したタスクのタイトル（省略時は各タスクのタイトルを ' + ' でつなぐ）")
+    args = parser.parse_args()
+    if len(args.task_ids) < 2:
+        parser.error("統合するタスクを2つ以上指定してください")
+
+    json_path = args.backlog
+    task_ids = args.task_ids
+
+    # タスクデータの読み込み（1回だけ）
+    data = load_backlog_file(json_path)
+    if not isinstance(data, dict) or "tasks" not in data:
+        print(f'エラー: {json_path} に "tasks" がありません')
         sys.exit(1)
-
-    json_path = sys.argv[1]
-    task_id1 = sys.argv[2]
-    task_id2 = sys.argv[3]
-
-    # タスクデータの読み込み
-    tasks = load_json(json_path)
-
-    # タスクの検索
-    task1 = find_task_by_id(tasks, task_id1)
-    task2 = find_task_by_id(tasks, task_id2)
-
-    if not task1 or not task2:
-        print(f"エラー: タスク {task_id1 if not task1 else task_id2} が見つかりません")
+    tasks = data["tasks"]
+    before = list(tasks)
+
+    # タスクの検索（14・T0014・永続IDで指定できる。タスクを変更するのでタイトルでは探さない）
+    resolver = IdResolver(tasks, titles=False)
+    result = resolver.resolve_all(task_ids)
+    problems = resolver.describe_problems(result)
+    if problems:
+        for line in problems:
+            print(f"エラー: {line}")
         sys.exit(1)
+    positions = [result["resolved"][task_id] for task_id in task_ids]
+    given = {}
+    for task_id, position in zip(task_ids, positions):
+        if position in given:
+            print(f"エラー: {given[position]} と {task_id} は同じタスクです")
+            sys.exit(1)
+        given[position] = task_id
 
-    # タスクの統合
-    merged_task = merge_tasks(task1, task2, json_path)
+    # 依存関係の索引は保存前のバックログに対して読み込む
+    index = dependency_index.load_index(json_path, before) if is_backlog_path(json_path) else None
 
-    # 元のタスクを削除し、統合タスクを追加
-    tasks = remove_task(tasks, task_id1)
-    tasks = remove_task(tasks, task_id2)
-    tasks.append(merged_task)
+    # タスクの統合
+    merged = merge_into(tasks, positions, args.title)
+    merged_task = merged["task"]
 
     # 結果の保存
-    save_json(tasks, json_path)
-    print(f"タスク {task_id1} と {task_id2} を統合しました")
+    save_backlog_file(json_path, data)
+    if index is not None:
+        index.apply_changes(before, tasks)
+        dependency_index.save_index(json_path, index)
+    patch_log.record(
+        json_path, "merge_tasks", before, tasks, note=f"{' + '.join(task_ids)} -> {merged_task['id']}"
+    )
+    print(f"{len(task_ids)}個のタスク {', '.join(task_ids)} を統合しました")
     print(f"新しいタスクID: {merged_task['id']}")
+    if merged["rewired"]:
+        print(f"他のタスクからの参照 {merged['rewired']}件 を新しいIDに付け替えました")
 
 
 if __name__ == "__main__":
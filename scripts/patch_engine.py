@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+バックログ用のJSON Patch適用 / Batch JSON Patch engine for the backlog
+
+RFC 6902 の操作（add / remove / replace / move / copy / test）を
+{"tasks": [...]} 形式のバックログに一括で適用します。
+タスクは位置（/tasks/17/status）のほかに ID で指定できます。
+Applies RFC 6902 operations to a {"tasks": [...]} backlog in one batch.
+Tasks can be addressed by position (/tasks/17/status) or by ID:
+
+    {"op": "replace", "path": "/tasks/@T0042/status", "value": "Done"}
+    {"op": "remove", "path": "/tasks/@6f1c...-uuid"}
+    {"op": "add", "path": "/tasks/@T0042/labels/-", "value": "automation"}
+
+- @ID は id か permanent_id で引く（索引は最初に1回だけ作り、IDを変える操作や追加したタスクにも追従する）
+  @ID matches id or permanent_id through an index built once; ID changes and
+  added tasks are tracked, so later ops in the same batch can refer to them
+- 複数のタスクに一致する @ID はエラー（パッチ全体が失敗する）
+  An @ID that matches more than one task fails the whole patch
+- 最初に全操作の形式を検査し、適用は触れたタスクだけを複製した作業用の文書に行う。
+  どれか1つでも失敗すれば元の文書は変更されない（全体が適用されるか、何も適用されないか）
+  Every op is checked up front, then applied to a staged document that copies
+  only the tasks it touches; if any op fails the original is left untouched
+- @ID による削除は最後にまとめて詰めるので、数千件の削除でもリストの詰め直しは1回
+  Removals by @ID are compacted once at the end instead of shifting the list per op
+
+使用方法 / Usage:
+    from patch_engine import apply_patch
+    patched = apply_patch(backlog, patch)   # PatchError で失敗した操作を報告 / raises PatchError
+"""
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+OPERATIONS = ("add", "remove", "replace", "move", "copy", "test")
+ID_FIELDS = ("id", "permanent_id")
+
+# @ID で削除したタスクの跡（最後に詰める）
+_REMOVED = object()
+
+
+class PatchError(ValueError):
+    """適用できない操作（index は0始まりの操作の位置）"""
+
+    def __init__(self, message: str, index: int, operation: Any):
+        super().__init__(f"Operation {index}: {message}: {operation}")
+        self.message = message
+        self.index = index
+        self.operation = operation
+
+
+def parse_pointer(pointer: Any) -> List[str]:
+    """JSON Pointer（RFC 6901）をトークンに分ける"""
+    if not isinstance(pointer, str):
+        raise ValueError(f"Pointer must be a string: {pointer!r}")
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise ValueError(f"Pointer must start with '/': {pointer}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _check_target(tokens: List[str]) -> List[str]:
+    # 文書全体と tasks 配列そのものは置き換えられない（索引が作り直しになるため）
+    if tokens in ([], ["tasks"]):
+        raise ValueError("Only individual tasks, their fields and other top-level members can be patched")
+    return tokens
+
+
+def check_operation(operation: Any) -> Tuple[List[str], Optional[List[str]]]:
+    """
+    1つの操作の形式を検査する（文書は見ない）
+    戻り値：(path のトークン, from のトークン（move / copy 以外はNone）)
+    """
+    if not isinstance(operation, dict):
+        raise ValueError("Operation must be an object")
+    op = operation.get("op")
+    if op not in OPERATIONS:
+        raise ValueError(f"Unknown op: {op!r}")
+    path = _check_target(parse_pointer(operation.get("path")))
+    if op in ("add", "replace", "test") and "value" not in operation:
+        raise ValueError(f"'{op}' requires 'value'")
+    from_path = None
+    if op in ("move", "copy"):
+        from_path = _check_target(parse_pointer(operation.get("from")))
+        if op == "move" and path[: len(from_path)] == from_path and path != from_path:
+            raise ValueError("Cannot move a value into itself")
+    return path, from_path
+
+
+def _index(token: str, container: List, allow_end: bool) -> int:
+    """配列の位置のトークン（"-" は末尾の次）"""
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise ValueError(f"Invalid array index: {token}")
+    position = int(token)
+    if position > len(container) or (position == len(container) and not allow_end):
+        raise ValueError(f"Array index out of range: {token}")
+    return position
+
+
+def _walk(value: Any, tokens: List[str]) -> Any:
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise ValueError(f"Member not found: {token}")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_index(token, value, allow_end=False)]
+        else:
+            raise ValueError(f"Cannot descend into a {type(value).__name__}: {token}")
+    return value
+
+
+def _add(container: Any, token: str, value: Any) -> None:
+    if isinstance(container, dict):
+        container[token] = value
+    elif isinstance(container, list):
+        container.insert(_index(token, container, allow_end=True), value)
+    else:
+        raise ValueError(f"Cannot add to a {type(container).__name__}: {token}")
+
+
+def _replace(container: Any, token: str, value: Any) -> None:
+    # 置き換えではキーの順序を変えない
+    if isinstance(container, dict):
+        if token not in container:
+            raise ValueError(f"Member not found: {token}")
+        container[token] = value
+    elif isinstance(container, list):
+        container[_index(token, container, allow_end=False)] = value
+    else:
+        raise ValueError(f"Cannot replace in a {type(container).__name__}: {token}")
+
+
+def _remove(container: Any, token: str) -> Any:
+    if isinstance(container, dict):
+        if token not in container:
+            raise ValueError(f"Member not found: {token}")
+        return container.pop(token)
+    if isinstance(container, list):
+        return container.pop(_index(token, container, allow_end=False))
+    raise ValueError(f"Cannot remove from a {type(container).__name__}: {token}")
+
+
+class _StagedBacklog:
+    """
+    元の文書を変更せずに操作を適用するための作業用の文書
+    tasks のリストは浅く複製し、操作が触れたタスクと最上位の値だけを深く複製する
+    """
+
+    def __init__(self, document: Dict):
+        if not isinstance(document, dict) or not isinstance(document.get("tasks"), list):
+            raise ValueError('Document must be of the form {"tasks": [...]}')
+        self.document = dict(document)
+        self.tasks: List[Any] = list(document["tasks"])
+        self.document["tasks"] = self.tasks
+        self.copied_keys = set()
+        self.copied_tasks = set()
+        self.by_id: Dict[str, List[Any]] = {}
+        for task in self.tasks:
+            self._register(task)
+        self.positions: Optional[Dict[int, int]] = None
+        self.removed = 0
+
+    # 索引 / index
+    @staticmethod
+    def _keys(task: Any) -> List[str]:
+        if not isinstance(task, dict):
+            return []
+        values = (task.get(field) for field in ID_FIELDS)
+        return list(dict.fromkeys(v for v in values if isinstance(v, str) and v))
+
+    def _register(self, task: Any) -> None:
+        for value in self._keys(task):
+            self.by_id.setdefault(value, []).append(task)
+
+    def _unregister(self, task: Any) -> None:
+        for value in self._keys(task):
+            matches = self.by_id.get(value)
+            if matches is None:
+                continue
+            matches[:] = [t for t in matches if t is not task]
+            if not matches:
+                del self.by_id[value]
+
+    def _position_of(self, task: Any) -> int:
+        if self.positions is None:
+            self.positions = {
+                id(t): p for p, t in enumerate(self.tasks) if t is not _REMOVED
+            }
+        return self.positions[id(task)]
+
+    def _compact(self) -> None:
+        if self.removed:
+            self.tasks[:] = [task for task in self.tasks if task is not _REMOVED]
+            self.removed = 0
+            self.positions = None
+
+    def _resolve_task(self, token: str, allow_end: bool = False) -> int:
+        """/tasks/<token> のタスクの位置"""
+        if token.startswith("@"):
+            matches = self.by_id.get(token[1:])
+            if not matches:
+                raise ValueError(f"Task not found: {token[1:]}")
+            if len(matches) > 1:
+                raise ValueError(f"Ambiguous @ID: {token[1:]} matches {len(matches)} tasks")
+            return self._position_of(matches[0])
+        # 位置による指定は、それまでの削除を詰めた後のリストで解釈する
+        self._compact()
+        return _index(token, self.tasks, allow_end)
+
+    def _writable_task(self, position: int) -> Any:
+        """位置のタスクを（初めて触れるなら複製して）返す"""
+        task = self.tasks[position]
+        if id(task) in self.copied_tasks:
+            return task
+        staged = copy.deepcopy(task)
+        self._unregister(task)
+        self.tasks[position] = staged
+        self.copied_tasks.add(id(staged))
+        if self.positions is not None:
+            self.positions[id(staged)] = position
+        self._register(staged)
+        return staged
+
+    def _writable_key(self, key: str) -> Any:
+        if key not in self.document:
+            raise ValueError(f"Member not found: {key}")
+        if key not in self.copied_keys:
+            self.document[key] = copy.deepcopy(self.document[key])
+            self.copied_keys.add(key)
+        return self.document[key]
+
+    # 値の参照 / locating values
+    def _parent(self, tokens: List[str]) -> Tuple[Any, str, Optional[Any]]:
+        """
+        tokens の親のコンテナと最後のトークンを返す（変更できるよう複製済み）
+        3つ目の値は、親がタスク自身かその内側の場合のタスク
+        """
+        if tokens[0] != "tasks":
+            if len(tokens) == 1:
+                return self.document, tokens[0], None
+            return _walk(self._writable_key(tokens[0]), tokens[1:-1]), tokens[-1], None
+        task = self._writable_task(self._resolve_task(tokens[1]))
+        return _walk(task, tokens[2:-1]), tokens[-1], task
+
+    def get(self, tokens: List[str]) -> Any:
+        if tokens[0] != "tasks":
+            return _walk(self.document, tokens)
+        task = self.tasks[self._resolve_task(tokens[1])]
+        return _walk(task, tokens[2:])
+
+    def add(self, tokens: List[str], value: Any) -> None:
+        if tokens[0] == "tasks" and len(tokens) == 2:
+            position = self._resolve_task(tokens[1], allow_end=True)
+            if position == len(self.tasks):
+                if self.positions is not None:
+                    self.positions[id(value)] = position
+                self.tasks.append(value)
+            else:
+                self.tasks.insert(position, value)
+                self.positions = None
+            self._register(value)
+            return
+        self._set(tokens, value, replace=False)
+
+    def replace(self, tokens: List[str], value: Any) -> None:
+        if tokens[0] == "tasks" and len(tokens) == 2:
+            position = self._resolve_task(tokens[1])
+            self._unregister(self.tasks[position])
+            if self.positions is not None:
+                del self.positions[id(self.tasks[position])]
+                self.positions[id(value)] = position
+            self.tasks[position] = value
+            self._register(value)
+            return
+        self._set(tokens, value, replace=True)
+
+    def _set(self, tokens: List[str], value: Any, replace: bool) -> None:
+        container, token, task = self._parent(tokens)
+        renames_task = task is not None and len(tokens) == 3 and token in ID_FIELDS
+        if renames_task:
+            self._unregister(task)
+        try:
+            if replace:
+                _replace(container, token, value)
+            else:
+                _add(container, token, value)
+        finally:
+            if renames_task:
+                self._register(task)
+
+    def remove(self, tokens: List[str]) -> Any:
+        if tokens[0] == "tasks" and len(tokens) == 2:
+            position = self._resolve_task(tokens[1])
+            task = self.tasks[position]
+            self._unregister(task)
+            if tokens[1].startswith("@"):
+                self.tasks[position] = _REMOVED
+                self.removed += 1
+                if self.positions is not None:
+                    del self.positions[id(task)]
+            else:
+                del self.tasks[position]
+                self.positions = None
+            return task
+        container, token, task = self._parent(tokens)
+        renames_task = task is not None and len(tokens) == 3 and token in ID_FIELDS
+        if renames_task:
+            self._unregister(task)
+        try:
+            return _remove(container, token)
+        finally:
+            if renames_task:
+                self._register(task)
+
+    def result(self) -> Dict:
+        self._compact()
+        return self.document
+
+
+def apply_patch(document: Dict, patch: List[Dict]) -> Dict:
+    """
+    patch を document に適用した新しい文書を返す（document は変更しない）
+    変更されていないタスクのオブジェクトは document と共有する
+    失敗した場合は PatchError（最初に失敗した操作の位置を含む）
+    """
+    if not isinstance(patch, list):
+        raise PatchError("Patch must be a list of operations", 0, patch)
+
+    # 文書に触れる前に全操作の形式を検査する
+    parsed = []
+    for index, operation in enumerate(patch):
+        try:
+            parsed.append(check_operation(operation))
+        except ValueError as e:
+            raise PatchError(str(e), index, operation) from None
+
+    staged = _StagedBacklog(document)
+    for index, (operation, (path, from_path)) in enumerate(zip(patch, parsed)):
+        op = operation["op"]
+        try:
+            if op == "add":
+                staged.add(path, copy.deepcopy(operation["value"]))
+            elif op == "remove":
+                staged.remove(path)
+            elif op == "replace":
+                staged.replace(path, copy.deepcopy(operation["value"]))
+            elif op == "test":
+                if staged.get(path) != operation["value"]:
+                    raise ValueError("Test failed")
+            elif op == "copy":
+                staged.add(path, copy.deepcopy(staged.get(from_path)))
+            elif path != from_path:
+                staged.add(path, staged.remove(from_path))
+            else:
+                staged.get(from_path)
+        except (ValueError, KeyError, TypeError) as e:
+            raise PatchError(str(e), index, operation) from None
+    return staged.result()
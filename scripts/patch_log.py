@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+バックログの変更ログ / Transactional patch log with undo, redo and replay
+
+apply_patch.py・mark_done.py・merge_tasks.py・update_tasks.py・append_tasks.py が
+バックログに加えた変更を、変更前後の差分から作った順方向のパッチと逆パッチの組として
+backlog.patchlog.jsonl に1行1エントリで記録します。
+Every change set applied by apply_patch.py, mark_done.py, merge_tasks.py,
+update_tasks.py and append_tasks.py is recorded in backlog.patchlog.jsonl,
+one entry per line, as a forward patch plus its inverse computed from the
+before/after task lists.
+
+エントリ形式 / Entry format:
+    {"seq": 7, "time": "...", "source": "mark_done", "note": "T0042",
+     "forward": [...], "inverse": [...]}                       変更 / change
+    {"seq": 8, "time": "...", "source": "undo", "undo": 7}     取り消し / undo of 7
+    {"seq": 9, "time": "...", "source": "redo", "redo": 7}     やり直し / redo of 7
+
+- パッチはタスクのIDで指定した項目単位の操作（/tasks/@ID/status）なので、
+  他のタスクの追加や削除で位置がずれても適用できる
+  Patches are field-level operations addressed by task ID (/tasks/@ID/status),
+  so they still apply after unrelated tasks were added or removed
+- 取り消しは逆パッチを1回適用するだけで、バックログを git から取り出し直す必要はない
+  Undo applies the inverse patches in one load/save, without a git checkout
+- 取り消しとやり直しもログに追記するので、ログは追記専用
+  Undo and redo are appended too; the log is append-only
+- ある時点のバックログは、現在のバックログにそれ以降の逆パッチを新しい順に当てて作る
+  The backlog as of an earlier entry is rebuilt by applying the inverses of
+  all later entries, newest first
+- ログの記録後にバックログが別の方法で変更され、逆パッチが当てられない場合は何も変更しない
+  If the backlog was changed outside the log so an inverse no longer applies,
+  nothing is changed
+
+使用方法 / Usage:
+    python patch_log.py log [--limit N]                        変更の一覧 / List entries
+    python patch_log.py undo [N]                               直近N件を取り消す / Undo the last N changes
+    python patch_log.py redo [N]                               取り消したN件をやり直す / Redo N undone changes
+    python patch_log.py replay (--to SEQ | --at TIME) [--output PATH]
+                                                               ある時点のバックログを書き出す / Write the backlog as of SEQ or TIME
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from patch_engine import apply_patch
+
+
+def get_log_path(backlog_path: str) -> str:
+    base, _ = os.path.splitext(backlog_path)
+    return base + ".patchlog.jsonl"
+
+
+def task_key(task: Any) -> Optional[str]:
+    """パッチでタスクを指すID（permanent_id を優先）"""
+    if isinstance(task, dict):
+        for field in ("permanent_id", "id"):
+            value = task.get(field)
+            if isinstance(value, str) and value:
+                return value
+    return None
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _id_counts(tasks: List[Any]) -> Dict[str, int]:
+    """id / permanent_id の値ごとに、その値を持つタスクの数"""
+    counts: Dict[str, int] = {}
+    for task in tasks:
+        if not isinstance(task, dict):
+            continue
+        values = {task.get(field) for field in ("permanent_id", "id")}
+        for value in values:
+            if isinstance(value, str) and value:
+                counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def _unique_positions(tasks: List[Any]) -> Dict[str, int]:
+    """
+    一意なIDからタスクの位置への対応
+    パッチの @ID は全タスクの id と permanent_id から探されるので、
+    他のタスクの id / permanent_id と重なるIDのタスクは含めない（位置で扱う）
+    """
+    counts = _id_counts(tasks)
+    positions: Dict[str, int] = {}
+    for position, task in enumerate(tasks):
+        key = task_key(task)
+        if key is not None and counts[key] == 1:
+            positions[key] = position
+    return positions
+
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """(after の位置, before の位置) の列から before の位置が増加する最長の部分列"""
+    tails: List[int] = []
+    tail_indexes: List[int] = []
+    previous = [-1] * len(pairs)
+    for i, (_, before_position) in enumerate(pairs):
+        j = bisect.bisect_left(tails, before_position)
+        if j == len(tails):
+            tails.append(before_position)
+            tail_indexes.append(i)
+        else:
+            tails[j] = before_position
+            tail_indexes[j] = i
+        previous[i] = tail_indexes[j - 1] if j > 0 else -1
+    result = []
+    i = tail_indexes[-1] if tail_indexes else -1
+    while i >= 0:
+        result.append(pairs[i])
+        i = previous[i]
+    result.reverse()
+    return result
+
+
+def _equal_pairs(
+    before: List[Any], after: List[Any], keyed_pairs: List[Tuple[int, int]]
+) -> List[Tuple[int, int]]:
+    """
+    IDで対応がつかなかったタスク（IDが重複・空のタスクなど）を、内容が同じもの同士で前から順に対応づける
+    変更のないタスクが位置による削除・追加にならないようにする
+    """
+    paired_after = {a for a, _ in keyed_pairs}
+    paired_before = {b for _, b in keyed_pairs}
+    waiting: Dict[str, List[int]] = {}
+    for position in range(len(before) - 1, -1, -1):
+        if position not in paired_before:
+            text = json.dumps(before[position], ensure_ascii=False)
+            waiting.setdefault(text, []).append(position)
+    pairs = []
+    for position, task in enumerate(after):
+        if position in paired_after:
+            continue
+        positions = waiting.get(json.dumps(task, ensure_ascii=False))
+        if positions:
+            pairs.append((position, positions.pop()))
+    return pairs
+
+
+def _field_ops(key: str, old: Dict, new: Dict) -> List[Dict]:
+    base = f"/tasks/@{_escape(key)}/"
+    ops = [{"op": "remove", "path": base + _escape(field)} for field in old if field not in new]
+    for field, value in new.items():
+        if field not in old:
+            ops.append({"op": "add", "path": base + _escape(field), "value": value})
+        elif old[field] != value:
+            ops.append({"op": "replace", "path": base + _escape(field), "value": value})
+    return ops
+
+
+def make_patch(before: List[Any], after: List[Any], partial: bool = False) -> List[Dict]:
+    """
+    タスクのリスト before を after にするパッチ
+    同じIDのタスクは項目単位の変更にし、IDで対応がつかないタスクは内容が同じものと対応づけ、
+    それでも対応がつかないタスクは位置で削除・追加する
+    partial: before / after がバックログの一部（同じタスクの変更前後）の場合。
+             位置による操作は使えないので、対応がつかないタスクがあれば ValueError
+    """
+    before_positions = _unique_positions(before)
+    after_positions = _unique_positions(after)
+    candidates = [
+        (after_positions[key], before_positions[key])
+        for key in after_positions
+        if key in before_positions
+    ]
+    candidates.extend(_equal_pairs(before, after, candidates))
+    candidates.sort()
+    # 順序が入れ替わったタスクは削除と追加で表す
+    matched = _longest_increasing(candidates)
+    matched_before = {b for _, b in matched}
+    matched_after = {a for a, _ in matched}
+
+    if partial and (len(matched) != len(before) or len(matched) != len(after)):
+        raise ValueError("Every task must have a unique id or permanent_id")
+
+    ops: List[Dict] = []
+    removed = [p for p in range(len(before)) if p not in matched_before]
+    keyed = {task_key(before[p]) for p in removed} & before_positions.keys()
+    # 位置による削除を後ろから先に行い、その後でIDによる削除を行う
+    for position in reversed(removed):
+        if task_key(before[position]) not in keyed:
+            ops.append({"op": "remove", "path": f"/tasks/{position}"})
+    for position in removed:
+        key = task_key(before[position])
+        if key in keyed:
+            ops.append({"op": "remove", "path": f"/tasks/@{_escape(key)}"})
+
+    for after_position, before_position in matched:
+        old, new = before[before_position], after[after_position]
+        if old is not new and old != new:
+            ops.extend(_field_ops(task_key(new), old, new))
+
+    for position in range(len(after)):
+        if position not in matched_after:
+            ops.append({"op": "add", "path": f"/tasks/{position}", "value": after[position]})
+    return ops
+
+
+def diff_tasks(
+    before: List[Any], after: List[Any], partial: bool = False
+) -> Tuple[List[Dict], List[Dict]]:
+    """(順方向のパッチ, 逆パッチ)"""
+    return make_patch(before, after, partial), make_patch(after, before, partial)
+
+
+def read_log(backlog_path: str) -> List[Dict]:
+    log_path = get_log_path(backlog_path)
+    if not os.path.exists(log_path):
+        return []
+    entries = []
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.endswith("\n"):
+                entries.append(json.loads(line))
+    return entries
+
+
+def _truncate_torn_tail(f) -> None:
+    """書き込み途中で中断された最終行を捨てる"""
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    position = end
+    committed = 0
+    while position > 0:
+        start = max(0, position - 64 * 1024)
+        f.seek(start)
+        block = f.read(position - start)
+        newline = block.rfind(b"\n")
+        if newline >= 0:
+            committed = start + newline + 1
+            break
+        position = start
+    if committed != end:
+        f.truncate(committed)
+
+
+def _append(backlog_path: str, entries: List[Dict]) -> None:
+    data = "".join(
+        json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n" for entry in entries
+    )
+    with open(get_log_path(backlog_path), "a+b") as f:
+        _truncate_torn_tail(f)
+        f.write(data.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _next_seq(log: List[Dict]) -> int:
+    return log[-1]["seq"] + 1 if log else 1
+
+
+def record(
+    backlog_path: str,
+    source: str,
+    before: List[Any],
+    after: List[Any],
+    note: str = "",
+    partial: bool = False,
+) -> Optional[Dict]:
+    """
+    保存済みの変更（before -> after）を記録する。変更がなければ何もしない
+    戻り値：記録したエントリ
+    """
+    if before == after:
+        return None
+    forward, inverse = diff_tasks(before, after, partial)
+    if not forward:
+        return None
+    log = read_log(backlog_path)
+    entry = {
+        "seq": _next_seq(log),
+        "time": datetime.now().isoformat(),
+        "source": source,
+        "note": note,
+        "forward": forward,
+        "inverse": inverse,
+    }
+    _append(backlog_path, [entry])
+    return entry
+
+
+def get_stacks(log: List[Dict]) -> Tuple[List[int], List[int]]:
+    """(適用中の変更の seq, やり直せる変更の seq)。どちらも最後が次の対象"""
+    applied: List[int] = []
+    redoable: List[int] = []
+    for entry in log:
+        if "undo" in entry:
+            applied.remove(entry["undo"])
+            redoable.append(entry["undo"])
+        elif "redo" in entry:
+            redoable.remove(entry["redo"])
+            applied.append(entry["redo"])
+        else:
+            applied.append(entry["seq"])
+            redoable.clear()
+    return applied, redoable
+
+
+def effective_patches(entry: Dict, changes: Dict[int, Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """エントリがバックログに加えた (順方向のパッチ, 逆パッチ)"""
+    if "undo" in entry:
+        change = changes[entry["undo"]]
+        return change["inverse"], change["forward"]
+    if "redo" in entry:
+        change = changes[entry["redo"]]
+        return change["forward"], change["inverse"]
+    return entry["forward"], entry["inverse"]
+
+
+def _apply_to_backlog(backlog_path: str, patch: List[Dict]) -> None:
+    from common_id_utils import is_backlog_path, load_backlog_file, save_backlog_file
+    import dependency_index
+
+    backlog = load_backlog_file(backlog_path)
+    patched = apply_patch(backlog, patch)
+    # 依存関係の索引は保存前のバックログに対して読み込み、変わったタスクの分だけ更新する
+    index = None
+    if is_backlog_path(backlog_path):
+        index = dependency_index.load_index(backlog_path, backlog["tasks"])
+    save_backlog_file(backlog_path, patched)
+    if index is not None:
+        index.apply_changes(backlog["tasks"], patched["tasks"])
+        dependency_index.save_index(backlog_path, index)
+
+
+def _step(backlog_path: str, count: int, action: str) -> List[int]:
+    """undo / redo を count 件まとめて1回の読み込み・保存で行う。戻り値：対象の seq"""
+    log = read_log(backlog_path)
+    applied, redoable = get_stacks(log)
+    stack = applied if action == "undo" else redoable
+    if count < 1 or count > len(stack):
+        raise ValueError(f"Cannot {action} {count} changes ({len(stack)} available)")
+    targets = stack[-count:][::-1]
+    changes = {entry["seq"]: entry for entry in log if "forward" in entry}
+    side = "inverse" if action == "undo" else "forward"
+    _apply_to_backlog(
+        backlog_path, [op for seq in targets for op in changes[seq][side]]
+    )
+
+    seq = _next_seq(log)
+    now = datetime.now().isoformat()
+    _append(
+        backlog_path,
+        [
+            {"seq": seq + i, "time": now, "source": action, action: target}
+            for i, target in enumerate(targets)
+        ],
+    )
+    return targets
+
+
+def undo(backlog_path: str, count: int = 1) -> List[int]:
+    """直近の count 件の変更を取り消す（新しい順）"""
+    return _step(backlog_path, count, "undo")
+
+
+def redo(backlog_path: str, count: int = 1) -> List[int]:
+    """取り消した変更を count 件やり直す（最後に取り消したものから）"""
+    return _step(backlog_path, count, "redo")
+
+
+def state_at(backlog_path: str, seq: int) -> Dict:
+    """seq のエントリまでを適用した時点のバックログ（seq=0 は最初の記録の前）"""
+    from common_id_utils import load_backlog_file
+
+    log = read_log(backlog_path)
+    changes = {entry["seq"]: entry for entry in log if "forward" in entry}
+    patch = [
+        op
+        for entry in reversed(log)
+        if entry["seq"] > seq
+        for op in effective_patches(entry, changes)[1]
+    ]
+    return apply_patch(load_backlog_file(backlog_path), patch)
+
+
+def seq_at(log: List[Dict], time: str) -> int:
+    """time（ISO 8601）の時点で最後に記録されていたエントリの seq"""
+    seq = 0
+    for entry in log:
+        if entry["time"] <= time:
+            seq = entry["seq"]
+    return seq
+
+
+def describe(entry: Dict) -> str:
+    if "undo" in entry or "redo" in entry:
+        action = "undo" if "undo" in entry else "redo"
+        return f"{action} of #{entry[action]}"
+    note = f": {entry['note']}" if entry["note"] else ""
+    return f"{entry['source']}{note} ({len(entry['forward'])} ops)"
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path, write_backlog_file
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Undo, redo and replay backlog changes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    log_parser = subparsers.add_parser("log", help="List recorded changes")
+    log_parser.add_argument("--limit", type=int, default=20, help="Show the last N entries")
+    for action in ("undo", "redo"):
+        step_parser = subparsers.add_parser(action, help=f"{action.capitalize()} the last N changes")
+        step_parser.add_argument("count", nargs="?", type=int, default=1)
+    replay_parser = subparsers.add_parser("replay", help="Write the backlog as of an earlier entry")
+    target = replay_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--to", type=int, help="Sequence number (0: before the first entry)")
+    target.add_argument("--at", help="Time (ISO 8601)")
+    replay_parser.add_argument("--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    backlog_path = get_backlog_path()
+
+    if args.command == "log":
+        log = read_log(backlog_path)
+        applied, _ = get_stacks(log)
+        for entry in log[-args.limit :] if args.limit > 0 else []:
+            undone = "forward" in entry and entry["seq"] not in applied
+            mark = " (undone)" if undone else ""
+            print(f"#{entry['seq']}  {entry['time'][:19]}  {describe(entry)}{mark}")
+        print(f"{len(log)} entries: {get_log_path(backlog_path)}")
+        return
+
+    try:
+        if args.command in ("undo", "redo"):
+            targets = _step(backlog_path, args.count, args.command)
+            done = "Undid" if args.command == "undo" else "Redid"
+            print(f"{done} {', '.join(f'#{seq}' for seq in targets)}")
+            return
+
+        seq = args.to if args.to is not None else seq_at(read_log(backlog_path), args.at)
+        backlog = state_at(backlog_path, seq)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("No changes were saved.")
+        sys.exit(1)
+
+    if args.output:
+        write_backlog_file(args.output, backlog)
+        print(f"Backlog as of #{seq}: {args.output}")
+    else:
+        print(json.dumps(backlog, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
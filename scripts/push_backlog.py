@@ -8,6 +8,7 @@
 import os
 import subprocess
 from dotenv import load_dotenv
+from common_id_utils import compact_backlog
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +17,8 @@ load_dotenv()
 def update_or_clone_repo():
     # Get data repository path from environment variable
     repo_path = os.getenv("DATA_ROOT", "../ai_project_manager_data")
+    # ジャーナルはコミット対象外なのでbacklog.jsonに畳み込んでおく
+    compact_backlog()
     os.chdir(repo_path)
     subprocess.run(["git", "status"], check=True)
     subprocess.run(["git", "add", "-u"], check=True)
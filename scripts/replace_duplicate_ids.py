@@ -2,24 +2,19 @@ import json
 import uuid
 import os
 from dotenv import load_dotenv
-from common_id_utils import find_next_available_id
+from common_id_utils import load_backlog_file, save_backlog_file
+from id_allocator import IdAllocator
 
 # Load environment variables
 load_dotenv()
 
 
 def load_tasks(filepath):
-    with open(filepath, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_backlog_file(filepath)
 
 
 def save_tasks(filepath, data):
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
-def generate_unique_id(existing_ids):
-    return find_next_available_id(existing_ids)
+    save_backlog_file(filepath, data)
 
 
 def replace_duplicate_ids(filepath):
@@ -40,14 +35,15 @@ def replace_duplicate_ids(filepath):
         if _pid:
             existing_ids.add(_pid)
 
-    # 次に、重複IDを修正
+    # 次に、重複IDを修正（割り当て状態は1回だけ作る）
+    allocator = IdAllocator.from_ids(existing_ids)
     for task in tasks:
         _tid = task.get("id", None)
         _pid = task.get("permanent_id", None)
 
         if _tid:
             if _tid in temp_ids:
-                new_id = generate_unique_id(existing_ids)
+                new_id = allocator.next()
                 print(
                     f"Replacing duplicate temporary ID {_tid} with {new_id} for task '{task.get('title', 'UNKNOWN')}'"
                 )
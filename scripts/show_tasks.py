@@ -1,7 +1,8 @@
 import argparse
 import json
 import os
-from util_human_id_match import human_id_match
+from common_id_utils import find_tasks, get_backlog_path, load_backlog_file
+from id_resolver import IdResolver, lookup_keys
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,13 +10,19 @@ load_dotenv()
 
 
 def load_tasks(file_path):
-    with open(file_path, "r", encoding="utf-8") as file:
-        data = json.load(file)
+    data = load_backlog_file(file_path)
     return data["tasks"]
 
 
-def filter_tasks_by_ids(tasks, ids):
-    return [task for task in tasks if any(human_id_match(task["id"], id) for id in ids)]
+def filter_tasks_by_ids(tasks, ids, titles=True):
+    """
+    IDに一致するタスク（指定した順、重複なし）と、曖昧・未発見のIDの説明を返す
+    titles: タイトルの先頭部分による指定も受け付ける
+    """
+    resolver = IdResolver(tasks, titles=titles)
+    result = resolver.resolve_all(ids)
+    positions = dict.fromkeys(result["resolved"][id] for id in ids if id in result["resolved"])
+    return [tasks[p] for p in positions], resolver.describe_problems(result)
 
 
 def format_task(task, format_type):
@@ -42,11 +49,15 @@ def main():
     )
     args = parser.parse_args()
 
-    REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_root = os.getenv("DATA_ROOT", os.path.join(os.path.dirname(REPO_ROOT), "ai_project_manager_data"))
-    tasks = load_tasks(os.path.join(data_root, "tasks", "backlog.json"))
-    selected_tasks = filter_tasks_by_ids(tasks, args.ids)
+    # 索引で候補のタスクだけを読み込み、解決できないIDがあれば全体から探す
+    tasks = find_tasks([key for id in args.ids for key in lookup_keys(id)])
+    selected_tasks, problems = filter_tasks_by_ids(tasks, args.ids, titles=False)
+    if problems:
+        tasks = load_tasks(get_backlog_path())
+        selected_tasks, problems = filter_tasks_by_ids(tasks, args.ids)
 
+    for line in problems:
+        print(line)
     for task in selected_tasks:
         print(format_task(task, args.format))
 
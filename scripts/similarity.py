@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+類似タスクの検出 / Near-duplicate task detection with MinHash and LSH
+
+タイトルと説明を文字n-gram（既定は3文字）の集合にし、MinHash の署名を
+LSH のバンドで分けて、同じバケツに入ったタスクの組だけを候補にします。
+候補はn-gram集合のJaccard係数で正確に確かめ、閾値以上のものを
+similar_tasks（task_id・similarity_score・note）の形で返します。
+分かち書きを使わないので、日本語の文章でもそのまま使えます。
+Titles and descriptions become sets of character n-grams (3 by default).
+MinHash signatures are split into LSH bands and only tasks sharing a
+bucket become candidate pairs; candidates are verified with the exact
+Jaccard similarity of their n-gram sets and returned in the similar_tasks
+schema (task_id, similarity_score, note). No tokenizer is needed, so
+Japanese text works as is.
+
+- 署名は1回のハッシュで作る（one permutation hashing。空のビンは隣のビンから補う）
+  Signatures use one permutation hashing: each n-gram is hashed once, and
+  empty bins are filled from the next non-empty bin (rotation densification)
+- n-gram集合が同じタスクはまとめて1回だけ比べる
+  Tasks with identical n-gram sets are compared once as a group
+- 同じバケツのタスクが多いときは、署名の順に並べて近いタスクとだけ比べる
+  In oversized buckets tasks are sorted by signature and only compared
+  with their neighbours, so templated text does not turn quadratic
+- 各タスクに残す類似タスクは類似度の高い順に TOP_K 件まで
+  At most TOP_K similar tasks are kept per task, highest score first
+- 結果はタスクの位置ごとに返す。IDが重複するタスクにも別々の結果を返し、
+  自分と同じIDのタスクは類似タスクに含めない
+  Results are keyed by task position, so tasks sharing an ID get their own
+  lists, and a task never lists its own ID
+
+使用方法 / Usage:
+    python similarity.py [--method minhash|tfidf] [--threshold 0.5] [--top-k 5] [--dry-run]
+
+--method tfidf は文字2-gramの TF-IDF のコサイン類似度で全件を比べる（tfidf_similarity.py）
+--method tfidf compares all tasks by TF-IDF cosine similarity (tfidf_similarity.py)
+"""
+
+import argparse
+import sys
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SHINGLE_SIZE = 3
+# 署名の長さ = バンド数 × 1バンドの行数（ビン数は2のべき乗）
+BANDS = 16
+ROWS = 4
+NUM_BINS = BANDS * ROWS
+DEFAULT_THRESHOLD = 0.5
+TOP_K = 5
+# 大きいバケツで比べる前後のタスクの数
+WINDOW = 2
+
+# n-gramのハッシュは64ビット。上位ビットでビンを選び、残りのビットの最小値をとる
+_MASK = (1 << 64) - 1
+_MULTIPLIER = 0x9E3779B97F4A7C15
+_BIN_BITS = NUM_BINS.bit_length() - 1
+_VALUE_BITS = 64 - _BIN_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_ROTATION = 1 << _VALUE_BITS
+_EMPTY = 1 << 64
+
+
+def normalize_text(text: str) -> str:
+    """全角・半角と大文字小文字をそろえ、空白をまとめる"""
+    text = text or ""
+    # ほとんどの文字列はすでに NFKC なので、確かめるだけで済ませる（正規化の1/20程度の時間）
+    if not unicodedata.is_normalized("NFKC", text):
+        text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split()).lower()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> frozenset:
+    """
+    正規化した文字列の文字n-gramのハッシュの集合（size文字未満なら文字列全体）
+    ハッシュはプロセスをまたいで同じ値になる（保存した署名と比べられる）
+    """
+    # UTF-32 にすると1文字が4バイトになり、n-gramをバイト列の切り出しで作れる
+    data = normalize_text(text).encode("utf-32-le")
+    width = 4 * size
+    if len(data) <= width:
+        return frozenset([(zlib.crc32(data) * _MULTIPLIER) & _MASK]) if data else frozenset()
+    return frozenset(
+        [(zlib.crc32(data[i : i + width]) * _MULTIPLIER) & _MASK for i in range(0, len(data) - width + 4, 4)]
+    )
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def signature(items: Iterable[int]) -> Optional[Tuple[int, ...]]:
+    """
+    n-gramのハッシュの集合の MinHash 署名（要素がなければNone）
+    1回のハッシュをビンに振り分けて各ビンの最小値をとり（one permutation hashing）、
+    空のビンは右隣（循環）の最初の空でないビンの値を距離ごとにずらして使う
+    """
+    mins = [_EMPTY] * NUM_BINS
+    for h in items:
+        b = h >> _VALUE_BITS
+        value = h & _VALUE_MASK
+        if value < mins[b]:
+            mins[b] = value
+    if _EMPTY in mins:
+        filled = [b for b in range(NUM_BINS) if mins[b] != _EMPTY]
+        if not filled:
+            return None
+        result = list(mins)
+        for b in range(NUM_BINS):
+            if result[b] == _EMPTY:
+                distance = 1
+                while mins[(b + distance) % NUM_BINS] == _EMPTY:
+                    distance += 1
+                result[b] = mins[(b + distance) % NUM_BINS] + distance * _ROTATION
+        mins = result
+    return tuple(mins)
+
+
+def candidate_pairs(signatures: List[Optional[Tuple[int, ...]]]) -> set:
+    """LSH のバンドで同じバケツに入った (i, j)（i < j）の組"""
+    pairs = set()
+    for band in range(BANDS):
+        start = band * ROWS
+        keys = [
+            hash(signature[start : start + ROWS]) if signature is not None else None
+            for signature in signatures
+        ]
+        # ほとんどのバケツは1件だけなので、2件以上のキーだけリストを作る
+        shared = {key for key, count in Counter(keys).items() if count > 1 and key is not None}
+        buckets: Dict[int, List[int]] = {}
+        for position, key in enumerate(keys):
+            if key in shared:
+                buckets.setdefault(key, []).append(position)
+        for members in buckets.values():
+            if len(members) > 2 * WINDOW + 1:
+                # 似た署名が隣り合うように並べ、前後 WINDOW 件とだけ組にする
+                members.sort(key=signatures.__getitem__)
+                for k, i in enumerate(members):
+                    for j in members[k + 1 : k + 1 + WINDOW]:
+                        pairs.add((i, j) if i < j else (j, i))
+            else:
+                for k, i in enumerate(members):
+                    for j in members[k + 1 :]:
+                        pairs.add((i, j) if i < j else (j, i))
+    return pairs
+
+
+def task_reference(task: Dict) -> str:
+    """similar_tasks から指すときのID（一時IDがなければ永続ID）"""
+    return task.get("id") or task.get("permanent_id") or ""
+
+
+def make_entry(task_id: str, score: float, title_score: float, description_score: float) -> Dict:
+    return {
+        "task_id": task_id,
+        "similarity_score": round(score, 3),
+        "note": f"タイトル類似度: {title_score:.2f}, 説明類似度: {description_score:.2f}",
+    }
+
+
+class ShingleCache:
+    """同じ文字列のn-gram集合と署名は1回だけ作る（テンプレートから作ったタスクが多いとき速い）"""
+
+    def __init__(self):
+        self._shingles: Dict[str, frozenset] = {}
+        self._signatures: Dict[frozenset, Optional[Tuple[int, ...]]] = {}
+
+    def shingles(self, text: str) -> frozenset:
+        result = self._shingles.get(text)
+        if result is None:
+            result = self._shingles[text] = shingles(text)
+        return result
+
+    def signature(self, items: frozenset) -> Optional[Tuple[int, ...]]:
+        if items not in self._signatures:
+            self._signatures[items] = signature(items)
+        return self._signatures[items]
+
+
+def nearest(
+    pairs: Iterable[Tuple[int, int]], sets: List[frozenset], threshold: float, top_k: int
+) -> Dict[int, List[Tuple[float, int]]]:
+    """候補の組を正確な類似度で確かめ、各集合について (類似度, 相手の位置) を高い順に top_k 件"""
+    scored: Dict[int, List[Tuple[float, int]]] = {}
+    for i, j in pairs:
+        score = jaccard(sets[i], sets[j])
+        if score >= threshold:
+            scored.setdefault(i, []).append((score, j))
+            scored.setdefault(j, []).append((score, i))
+    return {
+        position: sorted(items, key=lambda item: (-item[0], item[1]))[:top_k]
+        for position, items in scored.items()
+    }
+
+
+def similar_positions(
+    tasks: List[Dict],
+    threshold: float = DEFAULT_THRESHOLD,
+    top_k: int = TOP_K,
+    cache: Optional[ShingleCache] = None,
+) -> Dict[int, List[Tuple[float, int]]]:
+    """
+    各タスクの位置 -> (類似度, 相手の位置) を類似度の高い順に top_k 件
+    IDが重複するタスクも位置で区別する。自分と同じIDのタスクは含めず、同じIDの相手は1件だけにする
+    類似度はタイトルと説明をあわせたn-gram集合のJaccard係数
+    """
+    cache = cache if cache is not None else ShingleCache()
+    references = [task_reference(task) for task in tasks]
+
+    # n-gram集合が同じタスクはまとめて、集合ごとに1回だけ比べる
+    groups: Dict[frozenset, List[int]] = {}
+    for position, task in enumerate(tasks):
+        items = cache.shingles(task.get("title") or "") | cache.shingles(task.get("description") or "")
+        if items and references[position]:
+            groups.setdefault(items, []).append(position)
+    keys = list(groups)
+    signatures = [cache.signature(items) for items in keys]
+    neighbors = nearest(candidate_pairs(signatures), keys, threshold, top_k)
+
+    result = {}
+    for index, members in enumerate(groups.values()):
+        # 同じ集合のタスク（類似度1）、類似度の高い集合のタスクの順に top_k 件
+        ranked = [(1.0, other) for other in members[: top_k + 1]]
+        for score, other_index in neighbors.get(index, []):
+            ranked.extend((score, other) for other in groups[keys[other_index]][:top_k])
+        for position in members:
+            seen = {references[position]}
+            picked = []
+            for score, other in ranked:
+                if references[other] in seen:
+                    continue
+                seen.add(references[other])
+                picked.append((score, other))
+                if len(picked) == top_k:
+                    break
+            if picked:
+                result[position] = picked
+    return result
+
+
+def detect_similar_tasks(
+    tasks: List[Dict],
+    threshold: float = DEFAULT_THRESHOLD,
+    top_k: int = TOP_K,
+    cache: Optional[ShingleCache] = None,
+) -> Dict[int, List[Dict]]:
+    """
+    タスク間の類似性を検出する
+    戻り値：タスクの位置をキーとし、類似タスクのリストを値とする辞書（similar_positions を参照）
+    cache: 作ったn-gram集合と署名を呼び出し元でも使うときに渡す
+    """
+    cache = cache if cache is not None else ShingleCache()
+    titles = [cache.shingles(task.get("title") or "") for task in tasks]
+    descriptions = [cache.shingles(task.get("description") or "") for task in tasks]
+
+    # 注記のためのタイトル・説明ごとの類似度（同じ文字列のn-gram集合は共有されるので組ごとに覚える）
+    pair_scores: Dict[Tuple[int, int], float] = {}
+
+    def part_score(a: frozenset, b: frozenset) -> float:
+        key = (id(a), id(b)) if id(a) < id(b) else (id(b), id(a))
+        if key not in pair_scores:
+            pair_scores[key] = jaccard(a, b)
+        return pair_scores[key]
+
+    similar = {}
+    for position, picked in similar_positions(tasks, threshold, top_k, cache).items():
+        # タイトル・説明ごとの類似度は、残った組についてだけ計算する
+        similar[position] = [
+            make_entry(
+                task_reference(tasks[other]),
+                score,
+                part_score(titles[position], titles[other]),
+                part_score(descriptions[position], descriptions[other]),
+            )
+            for score, other in picked
+        ]
+    return similar
+
+
+def apply_similar_tasks(
+    tasks: List[Dict], similar: Dict[int, List[Dict]], positions: Optional[Iterable[int]] = None
+) -> int:
+    """
+    検出結果（タスクの位置 -> 類似タスクのリスト）で各タスクの similar_tasks を置き換える
+    （類似タスクがなければ項目を削除）。positions を指定したときは、その位置のタスクだけを置き換える
+    変更ログ用に元のタスクは書き換えず、変わるタスクだけ複製する
+    戻り値：変更したタスクの数
+    """
+    targets = range(len(tasks)) if positions is None else sorted(set(positions))
+    changed = 0
+    for position in targets:
+        task = tasks[position]
+        if not isinstance(task, dict):
+            continue
+        entries = similar.get(position)
+        if entries == task.get("similar_tasks"):
+            continue
+        if not entries and "similar_tasks" not in task:
+            continue
+        task = dict(task)
+        if entries:
+            task["similar_tasks"] = entries
+        else:
+            task.pop("similar_tasks", None)
+        tasks[position] = task
+        changed += 1
+    return changed
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path, load_tasks, save_tasks
+    import patch_log
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Detect near-duplicate tasks and update similar_tasks")
+    parser.add_argument(
+        "--method",
+        choices=["minhash", "tfidf"],
+        default="minhash",
+        help="minhash: Jaccard of character 3-grams via LSH; tfidf: cosine of character 2-gram TF-IDF (needs numpy/scipy)",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=None, help=f"Minimum similarity (default: {DEFAULT_THRESHOLD})"
+    )
+    parser.add_argument("--top-k", type=int, default=TOP_K, help=f"Similar tasks kept per task (default: {TOP_K})")
+    parser.add_argument("--dry-run", action="store_true", help="Report without saving")
+    args = parser.parse_args()
+
+    detect = detect_similar_tasks
+    threshold = DEFAULT_THRESHOLD
+    if args.method == "tfidf":
+        try:
+            import numpy  # noqa: F401
+            import scipy  # noqa: F401
+        except ImportError as e:
+            print(f"エラー: --method tfidf には numpy と scipy が必要です（pip install numpy scipy）: {e}")
+            sys.exit(1)
+        import tfidf_similarity
+
+        detect = tfidf_similarity.detect_similar_tasks
+        threshold = tfidf_similarity.DEFAULT_THRESHOLD
+    if args.threshold is not None:
+        threshold = args.threshold
+
+    tasks = load_tasks()
+    before = list(tasks)
+    similar = detect(tasks, threshold, args.top_k)
+    pairs = sum(len(entries) for entries in similar.values()) // 2
+    print(f"{len(tasks)}件のタスクから、類似タスクのあるタスクを{len(similar)}件（約{pairs}組）検出しました")
+
+    changed = apply_similar_tasks(tasks, similar)
+    if args.dry_run:
+        print(f"--dry-run のため保存しませんでした（similar_tasks が変わるタスク: {changed}件）")
+        return
+    if changed:
+        save_tasks(tasks)
+        patch_log.record(get_backlog_path(), "similarity", before, tasks, note=f"{args.method} threshold {threshold}")
+    print(f"similar_tasks を{changed}件のタスクで更新しました")
+
+
+if __name__ == "__main__":
+    main()
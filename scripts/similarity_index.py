@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+類似タスクの差分更新 / Incremental similar_tasks maintenance keyed by content hash
+
+各タスクのタイトルと説明の正規化後のハッシュ、MinHash 署名の LSH のバンドのキー、
+類似タスク（相手のIDと類似度）を tasks/.backlog.json.similarity に保存します。
+保存のたびに内容のハッシュを比べ、追加・変更・削除（アーカイブを含む）された
+タスクだけについて、同じバケツのタスクと比べて類似タスクを求め直し、
+相手のタスクの similar_tasks も必要な分だけ直します。
+Stores, per task, a hash of the normalized title and description, the LSH
+band keys of its MinHash signature and its neighbour list (task and score)
+in tasks/.backlog.json.similarity. On every save only tasks whose content
+hash changed, appeared or disappeared (including archived ones) are
+re-queried against their LSH buckets, and the reciprocal similar_tasks
+entries on other tasks are patched.
+
+- SIMILAR_TASKS=auto のとき common_id_utils.save_tasks から呼ばれる
+  Runs from common_id_utils.save_tasks when SIMILAR_TASKS=auto
+- 索引は列ごとに持ち（バンドのキーはバンドごとの配列、類似タスクの一覧は文字列）、
+  変わったタスクの分だけ解釈するので、数万件でも保存のたびの処理は小さい
+  The index is kept column-wise (one uint32 array per band, neighbour lists
+  as encoded strings) and only the touched rows are decoded
+- n-gram・署名・類似度・注記は similarity.py と同じ（全体の検出とは同順位の扱いが異なることがある）
+  Shingles, signatures, scores and notes are those of similarity.py; ties
+  may be ordered differently than a full run
+- 類似タスクの一覧から外れたタスクがあり、一覧が埋まっていたタスクは求め直して補う
+  A task that loses a neighbour from a full list is re-queried to refill it
+- IDが重複するタスクも別の行で持つ（2件目以降の行のキーは "ID\\0番号"）。
+  自分と同じIDのタスクは類似タスクに含めない
+  Tasks sharing an ID get separate rows (keyed "ID\\0n" after the first),
+  and a task never lists its own ID
+- 索引がない・設定が違う・変わったタスクが多いときは、全体を検出し直す
+  Falls back to a full detection when the index is missing or stale, or
+  when too many tasks changed at once
+
+使用方法 / Usage:
+    python similarity_index.py rebuild   全体を検出し直して索引を作る / Full detection and rebuild
+    python similarity_index.py refresh   変わったタスクの分だけ更新 / Incremental update
+"""
+
+import base64
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from similarity import (
+    BANDS,
+    DEFAULT_THRESHOLD,
+    ROWS,
+    SHINGLE_SIZE,
+    TOP_K,
+    ShingleCache,
+    apply_similar_tasks,
+    jaccard,
+    make_entry,
+    normalize_text,
+    similar_positions,
+    task_reference,
+)
+
+INDEX_VERSION = 2
+# 1回の問い合わせで正確な類似度を確かめる候補の上限（バンドを多く共有する順）
+MAX_CANDIDATES = 64
+# 変わったタスクがこの割合を超えたら全体を検出し直す
+REBUILD_RATIO = 0.1
+# 消えたタスクがこの件数までなら、参照しているタスクを1件ずつ文字列検索で探す
+REFERRER_SEARCH_LIMIT = 16
+# バケツのタスクがこの件数を超えたら、バンドのキー -> 行の辞書を作って数える
+LARGE_BUCKET = 256
+# 署名の値は64ビットに収まる
+_BAND = struct.Struct(f"<{ROWS}Q")
+# 署名のないタスクのバンドのキー（検索しない）
+_NO_BAND = 0
+
+
+def get_similar_tasks_mode() -> str:
+    """
+    similar_tasks の更新方法を返す（環境変数 SIMILAR_TASKS）
+    - manual: similarity.py を実行したときだけ更新する（デフォルト）
+    - auto: バックログを保存するたびに、変わったタスクの分だけ更新する
+    """
+    return os.getenv("SIMILAR_TASKS", "manual")
+
+
+def get_index_path(backlog_path: str) -> str:
+    directory, name = os.path.split(backlog_path)
+    return os.path.join(directory, f".{name}.similarity")
+
+
+def content_hash(task: Dict) -> str:
+    """正規化したタイトルと説明のハッシュ（類似度に影響する内容が同じなら同じ値）"""
+    text = normalize_text(task.get("title") or "") + "\0" + normalize_text(task.get("description") or "")
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def band_keys(signature: Optional[Tuple[int, ...]]) -> Optional[List[int]]:
+    """署名の各バンドのキー（32ビット。プロセスをまたいで同じ値になる）"""
+    if signature is None:
+        return None
+    return [zlib.crc32(_BAND.pack(*signature[start : start + ROWS])) for start in range(0, BANDS * ROWS, ROWS)]
+
+
+def task_rows(tasks: List[Dict]) -> Dict[str, int]:
+    """
+    索引の行のキー -> タスクの位置
+    キーは similar_tasks から指すときのID。同じIDの2件目以降は "ID\\0番号" で区別する
+    """
+    rows: Dict[str, int] = {}
+    counts: Counter = Counter()
+    for position, task in enumerate(tasks):
+        if isinstance(task, dict):
+            reference = task_reference(task)
+            if reference:
+                occurrence = counts[reference]
+                counts[reference] += 1
+                rows[f"{reference}\0{occurrence}" if occurrence else reference] = position
+    return rows
+
+
+def reference_of(key: str) -> str:
+    """行のキーが指すタスクのID"""
+    return key.split("\0", 1)[0]
+
+
+class _Parts:
+    """行のキー -> (タイトル, 説明, 両方をあわせた集合) のn-gram集合（必要になった行だけ作る）"""
+
+    def __init__(self, tasks: List[Dict], rows: Dict[str, int], cache: ShingleCache):
+        self.tasks = tasks
+        self.rows = rows
+        self.cache = cache
+        self.parts: Dict[str, Tuple[frozenset, frozenset, frozenset]] = {}
+
+    def __getitem__(self, key: str) -> Tuple[frozenset, frozenset, frozenset]:
+        if key not in self.parts:
+            task = self.tasks[self.rows[key]]
+            title = self.cache.shingles(task.get("title") or "")
+            description = self.cache.shingles(task.get("description") or "")
+            self.parts[key] = (title, description, title | description)
+        return self.parts[key]
+
+
+# 類似タスクの一覧は "\tキー\t類似度" を並べた文字列で持つ（キーは前後がタブなので文字列検索で探せる）
+def encode_neighbors(neighbors: List[Tuple[str, float]]) -> str:
+    return "".join(f"\t{other}\t{score}" for other, score in neighbors)
+
+
+def decode_neighbors(text: str) -> List[Tuple[str, float]]:
+    fields = text.split("\t")
+    return [(fields[i], float(fields[i + 1])) for i in range(1, len(fields), 2)]
+
+
+def _rank(item: Tuple[str, float]) -> Tuple[float, str]:
+    # 類似度の高い順、同じならIDの順
+    return (-item[1], item[0])
+
+
+def _encode_band(values: array) -> str:
+    if sys.byteorder == "big":
+        values = array("I", values)
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _decode_band(text: str) -> array:
+    values = array("I")
+    values.frombytes(base64.b64decode(text))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class SimilarityIndex:
+    """
+    タスクごとの内容のハッシュ・バンドのキー・類似タスクを列ごとに持つ索引
+    行を削除するときは最後の行をその位置に移す（保存するときに詰め直さなくてよい）
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, top_k: int = TOP_K):
+        self.threshold = threshold
+        self.top_k = top_k
+        self.keys: List[str] = []
+        self.hashes: List[str] = []
+        self.bands: List[array] = [array("I") for _ in range(BANDS)]
+        self.neighbors: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.modified = False
+        # バンドごとのキーのバイト列（検索用。行を追加・削除したら作り直す）
+        self._band_bytes: List[Optional[bytes]] = [None] * BANDS
+        # 大きなバケツのあるバンドの バンドのキー -> 行（作ったら行の追加・削除に合わせて直す）
+        self._buckets: List[Optional[Dict[int, List[int]]]] = [None] * BANDS
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SimilarityIndex":
+        index = cls(data["settings"]["threshold"], data["settings"]["top_k"])
+        index.keys = list(data["keys"])
+        index.hashes = list(data["hashes"])
+        index.neighbors = list(data["neighbors"])
+        index.bands = [_decode_band(text) for text in data["bands"]]
+        rows = len(index.keys)
+        if len(index.bands) != BANDS or any(len(column) != rows for column in [index.hashes, index.neighbors, *index.bands]):
+            raise ValueError("similarity index columns have different lengths")
+        index.positions = {key: position for position, key in enumerate(index.keys)}
+        return index
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": INDEX_VERSION,
+            "settings": settings(self.threshold, self.top_k),
+            "keys": self.keys,
+            "hashes": self.hashes,
+            "bands": [_encode_band(column) for column in self.bands],
+            "neighbors": self.neighbors,
+        }
+
+    def add(self, key: str, value: str, keys: Optional[List[int]], neighbors: List[Tuple[str, float]]) -> None:
+        """タスクの行を追加する（value は content_hash、keys は band_keys）"""
+        self.positions[key] = len(self.keys)
+        self.keys.append(key)
+        self.hashes.append(value)
+        for band, column in enumerate(self.bands):
+            column.append(keys[band] if keys else _NO_BAND)
+            if self._buckets[band] is not None:
+                self._buckets[band].setdefault(column[-1], []).append(len(self.keys) - 1)
+        self.neighbors.append(encode_neighbors(neighbors))
+        self._band_bytes = [None] * BANDS
+        self.modified = True
+
+    def remove(self, key: str) -> None:
+        position = self.positions.pop(key)
+        last = len(self.keys) - 1
+        for band, column in enumerate(self.bands):
+            buckets = self._buckets[band]
+            if buckets is not None:
+                if column[position] != _NO_BAND:
+                    buckets[column[position]].remove(position)
+                if last != position and column[last] != _NO_BAND:
+                    members = buckets[column[last]]
+                    members[members.index(last)] = position
+            column[position] = column[last]
+            column.pop()
+        if last != position:
+            moved = self.keys[last]
+            self.keys[position] = moved
+            self.positions[moved] = position
+            self.hashes[position] = self.hashes[last]
+            self.neighbors[position] = self.neighbors[last]
+        self.keys.pop()
+        self.hashes.pop()
+        self.neighbors.pop()
+        self._band_bytes = [None] * BANDS
+        self.modified = True
+
+    def get_neighbors(self, key: str) -> List[Tuple[str, float]]:
+        return decode_neighbors(self.neighbors[self.positions[key]])
+
+    def similar_tasks(self, keys: Iterable[str], parts: _Parts) -> Dict[int, List[Dict]]:
+        """keys の行の similar_tasks（タスクの位置 -> 類似タスクのリスト。同じIDの相手は1件だけ）"""
+        similar = {}
+        for key in keys:
+            title, description, _ = parts[key]
+            seen = {reference_of(key)}
+            entries = []
+            for other, score in self.get_neighbors(key):
+                if reference_of(other) in seen:
+                    continue
+                seen.add(reference_of(other))
+                entries.append(
+                    make_entry(
+                        reference_of(other), score, jaccard(title, parts[other][0]), jaccard(description, parts[other][1])
+                    )
+                )
+            similar[parts.rows[key]] = entries
+        return similar
+
+    def set_neighbors(self, key: str, neighbors: List[Tuple[str, float]]) -> None:
+        self.neighbors[self.positions[key]] = encode_neighbors(neighbors)
+        self.modified = True
+
+    def referrers(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """keys の各タスクを類似タスクに挙げているタスクのキー"""
+        keys = set(keys)
+        found: Dict[str, List[str]] = {key: [] for key in keys}
+        if len(keys) <= REFERRER_SEARCH_LIMIT:
+            for key in keys:
+                needle = f"\t{key}\t"
+                found[key] = [self.keys[position] for position, text in enumerate(self.neighbors) if needle in text]
+            return found
+        for position, text in enumerate(self.neighbors):
+            for other in text.split("\t")[1::2]:
+                if other in keys:
+                    found[other].append(self.keys[position])
+        return found
+
+    def candidates(self, key: str) -> List[str]:
+        """key とバンドを共有するタスク（共有するバンドの多い順に MAX_CANDIDATES 件）"""
+        position = self.positions[key]
+        counts: Counter = Counter()
+        for band, column in enumerate(self.bands):
+            if column[position] == _NO_BAND:
+                continue
+            if self._band_bytes[band] is None:
+                self._band_bytes[band] = column.tobytes()
+            data = self._band_bytes[band]
+            pattern = column[position : position + 1].tobytes()
+            if data.count(pattern) > LARGE_BUCKET:
+                counts.update(self._bucket(band)[column[position]])
+                continue
+            found = data.find(pattern)
+            while found != -1:
+                # 4バイトの境目に合うものだけがバンドのキー
+                if found % 4 == 0:
+                    counts[found // 4] += 1
+                found = data.find(pattern, found + 1)
+        counts.pop(position, None)
+        return [self.keys[other] for other, _ in counts.most_common(MAX_CANDIDATES)]
+
+    def _bucket(self, band: int) -> Dict[int, List[int]]:
+        if self._buckets[band] is None:
+            buckets: Dict[int, List[int]] = {}
+            for position, value in enumerate(self.bands[band]):
+                if value != _NO_BAND:
+                    buckets.setdefault(value, []).append(position)
+            self._buckets[band] = buckets
+        return self._buckets[band]
+
+    def offer(self, key: str, other: str, score: float) -> bool:
+        """other の類似タスクの一覧に key を入れる（上位 top_k 件に入るときだけ）。入れたら True"""
+        ranked = sorted(self.get_neighbors(other) + [(key, score)], key=_rank)[: self.top_k]
+        if all(item[0] != key for item in ranked):
+            return False
+        self.set_neighbors(other, ranked)
+        return True
+
+    def fresh_keys(self, hashes: Dict[str, str]) -> List[str]:
+        """索引に入れるタスク（追加・変更）のキー"""
+        return [
+            key
+            for key, value in hashes.items()
+            if key not in self.positions or self.hashes[self.positions[key]] != value
+        ]
+
+    def refresh(
+        self, tasks: List[Dict], rows: Optional[Dict[str, int]] = None, hashes: Optional[Dict[str, str]] = None
+    ) -> int:
+        """
+        内容が変わったタスクだけ類似タスクを求め直し、tasks の similar_tasks に反映する
+        変更ログ用に元のタスクは書き換えず、変わるタスクだけ複製して tasks の中で置き換える
+        rows, hashes: 計算済みの task_rows(tasks) と {キー: content_hash}
+        戻り値：similar_tasks を変更したタスクの数
+        """
+        if rows is None:
+            rows = task_rows(tasks)
+        if hashes is None:
+            hashes = {key: content_hash(tasks[position]) for key, position in rows.items()}
+        stale = [key for key, position in self.positions.items() if hashes.get(key) != self.hashes[position]]
+        fresh = self.fresh_keys(hashes)
+        if not stale and not fresh:
+            return 0
+
+        cache = ShingleCache()
+        parts = _Parts(tasks, rows, cache)
+
+        def query(key: str) -> List[Tuple[str, float]]:
+            items = parts[key][2]
+            reference = reference_of(key)
+            scored = []
+            for other in self.candidates(key):
+                # 同じIDのタスク（重複）は類似タスクにしない
+                if reference_of(other) == reference:
+                    continue
+                score = jaccard(items, parts[other][2])
+                if score >= self.threshold:
+                    scored.append((other, round(score, 3)))
+            return sorted(scored, key=_rank)
+
+        # 変わったタスク・消えたタスクを各一覧から除く。一覧が埋まっていたタスクは求め直して補う
+        dirty: Set[str] = set()
+        requery: Set[str] = set()
+        stale_keys = set(stale)
+        for key, listed_by in self.referrers(stale).items():
+            for other in listed_by:
+                if other in stale_keys:
+                    continue
+                neighbors = self.get_neighbors(other)
+                if len(neighbors) >= self.top_k:
+                    requery.add(other)
+                self.set_neighbors(other, [item for item in neighbors if item[0] != key])
+                dirty.add(other)
+        for key in stale:
+            self.remove(key)
+
+        # 先に全部入れてから問い合わせる（追加したタスク同士も見つかるように）
+        for key in fresh:
+            items = parts[key][2]
+            self.add(key, hashes[key], band_keys(cache.signature(items)) if items else None, [])
+        fresh_set = set(fresh)
+        requeried = sorted(requery - fresh_set)
+        listed_by = self.referrers(requeried) if requeried else {}
+        for key in fresh + requeried:
+            # 求め直すタスクは、残っている類似タスク（ほかのタスクから入れられたものを含む）と
+            # このタスクを類似タスクに挙げているタスク（候補の上限で漏れることがある）に足す
+            scored = query(key)
+            merged = dict(self.get_neighbors(key))
+            for other in listed_by.get(key, ()):
+                for listed, score in self.get_neighbors(other):
+                    if listed == key:
+                        merged.setdefault(other, score)
+            merged.update(scored)
+            self.set_neighbors(key, sorted(merged.items(), key=_rank)[: self.top_k])
+            dirty.add(key)
+            # 相手の一覧にも入れる（相手の一覧に入るのは上位 top_k 件に入るときだけ）
+            for other, score in scored:
+                if other not in fresh_set and self.offer(key, other, score):
+                    dirty.add(other)
+
+        similar = self.similar_tasks(dirty, parts)
+        return apply_similar_tasks(tasks, similar, similar.keys())
+
+
+def settings(threshold: float, top_k: int) -> Dict:
+    """索引を作ったときの設定（違えば作り直す）"""
+    return {"threshold": threshold, "top_k": top_k, "shingle_size": SHINGLE_SIZE, "bands": BANDS, "rows": ROWS}
+
+
+def rebuild(tasks: List[Dict], threshold: float = DEFAULT_THRESHOLD, top_k: int = TOP_K) -> Tuple[SimilarityIndex, int]:
+    """
+    全体を検出し直して索引を作り、tasks の similar_tasks に反映する
+    戻り値：(索引, similar_tasks を変更したタスクの数)
+    """
+    cache = ShingleCache()
+    picked = similar_positions(tasks, threshold, top_k, cache)
+    rows = task_rows(tasks)
+    keys = {position: key for key, position in rows.items()}
+    parts = _Parts(tasks, rows, cache)
+    index = SimilarityIndex(threshold, top_k)
+    for key, position in rows.items():
+        items = parts[key][2]
+        index.add(
+            key,
+            content_hash(tasks[position]),
+            band_keys(cache.signature(items)) if items else None,
+            [(keys[other], round(score, 3)) for score, other in picked.get(position, [])],
+        )
+    return index, apply_similar_tasks(tasks, index.similar_tasks(rows, parts))
+
+
+def save_index(backlog_path: str, index: SimilarityIndex) -> None:
+    path = get_index_path(backlog_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    index.modified = False
+
+
+def read_index(backlog_path: str, threshold: float = DEFAULT_THRESHOLD, top_k: int = TOP_K) -> Optional[Dict]:
+    """索引のファイルの内容（ない・壊れている・設定が違うときは None）"""
+    path = get_index_path(backlog_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return None
+    if data.get("settings") != settings(threshold, top_k):
+        return None
+    return data
+
+
+def _decode(data: Optional[Dict]) -> Optional[SimilarityIndex]:
+    if data is None:
+        return None
+    try:
+        return SimilarityIndex.from_dict(data)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def load_index(
+    backlog_path: str, threshold: float = DEFAULT_THRESHOLD, top_k: int = TOP_K
+) -> Optional[SimilarityIndex]:
+    """索引を読み込む（ない・壊れている・設定が違うときは None）"""
+    return _decode(read_index(backlog_path, threshold, top_k))
+
+
+def update_similar_tasks(backlog_path: str, tasks: List[Dict]) -> int:
+    """
+    保存する前のタスクの similar_tasks を索引で更新する（common_id_utils.save_tasks から呼ぶ）
+    tasks の中の変わるタスクは複製して置き換える
+    戻り値：similar_tasks を変更したタスクの数
+    """
+    rows = task_rows(tasks)
+    hashes = {key: content_hash(tasks[position]) for key, position in rows.items()}
+    data = read_index(backlog_path)
+    # 内容が変わったタスクがなければ、索引を組み立てずに済ませる
+    if data is not None and dict(zip(data.get("keys", []), data.get("hashes", []))) == hashes:
+        return 0
+
+    index = _decode(data)
+    if index is None or len(index.fresh_keys(hashes)) > max(1, len(tasks) * REBUILD_RATIO):
+        index, changed = rebuild(tasks)
+    else:
+        changed = index.refresh(tasks, rows, hashes)
+    if index.modified:
+        save_index(backlog_path, index)
+    return changed
+
+
+def main():
+    from dotenv import load_dotenv
+    from common_id_utils import get_backlog_path, load_tasks, save_tasks
+    import patch_log
+
+    load_dotenv()
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ["rebuild", "refresh"]:
+        print(__doc__)
+        sys.exit(1)
+
+    backlog_path = get_backlog_path()
+    tasks = load_tasks()
+    before = list(tasks)
+    if sys.argv[1] == "rebuild":
+        index, changed = rebuild(tasks)
+        save_index(backlog_path, index)
+    else:
+        changed = update_similar_tasks(backlog_path, tasks)
+    if changed:
+        # SIMILAR_TASKS=auto でも、索引はもう最新なので保存時の更新は何もしない
+        save_tasks(tasks)
+        patch_log.record(backlog_path, "similarity_index", before, tasks, note=sys.argv[1])
+    print(f"similar_tasks を{changed}件のタスクで更新しました")
+
+
+if __name__ == "__main__":
+    main()
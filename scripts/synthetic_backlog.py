@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+合成バックログの生成 / Synthetic backlog generator for benchmarks
+
+docs/task_format.md の形式に沿ったタスクを乱数の種から再現可能に生成します。
+日本語のタイトルと説明、ラベル、must / nice_to_have / human の依存関係、
+プロジェクトのサブタスク、類似タスク、日付別のアーカイブを含みます。
+Generates reproducible tasks in the docs/task_format.md format: Japanese
+titles and descriptions, labels, must / nice_to_have / human dependencies,
+project subtasks, similar tasks and daily archive files.
+
+- 一時IDは T0001 から順に割り当て、プール（T9999）を使い切った後のタスクは空文字列
+  Temporary IDs are assigned from T0001; once the pool (T9999) is used up
+  the remaining tasks get an empty ID
+- 依存関係は前に生成したタスクだけを指すので循環しない
+  Dependencies only point at earlier tasks, so the graph is acyclic
+- 一部のタスクは前のタスクのタイトルと説明を少し変えた重複候補にする
+  Some tasks are slightly altered copies of earlier ones (near-duplicates)
+
+使用方法 / Usage:
+    python synthetic_backlog.py DATA_ROOT [--tasks N] [--archive-tasks N] [--archive-days D] [--seed S]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from id_allocator import ID_MAX
+
+LABELS = [
+    "prototype",
+    "human-required",
+    "integration",
+    "enhancement",
+    "feature",
+    "documentation",
+    "automation",
+    "performance",
+    "security",
+]
+ASSIGNEES = ["nishio", "tanaka", "suzuki"]
+
+_SUBJECTS = [
+    "ウェブサイト", "タスク管理スクリプト", "バックログ", "アーカイブ", "議事録",
+    "請求書", "発表資料", "ブログ記事", "データベース", "Scrapboxページ",
+    "GitHub Actions", "APIクライアント", "ユーザーマニュアル", "見積書", "依存関係グラフ",
+    "テストデータ", "バックアップ", "ミーティング", "検索機能", "通知設定",
+]
+_ACTIONS = [
+    "の改善", "の作成", "の見直し", "の整理", "のレビュー", "の自動化", "の移行",
+    "の更新", "の調査", "の修正", "の高速化", "のドキュメント化",
+]
+_QUALIFIERS = ["", "", "", "（第2版）", "（来週分）", "の残り", "の準備", "の確認"]
+_DESCRIPTIONS = [
+    "{subject}について現状の問題点を洗い出し、改善案をまとめる。",
+    "{subject}の手順を確認して、必要な変更を反映する。",
+    "関係者に{subject}の内容を共有し、フィードバックを集める。",
+    "{subject}に関する過去の経緯を調べて記録に残す。",
+    "{subject}の作業を小さく分けて、今週中に終わる範囲から着手する。",
+    "前回の{subject}で見つかった課題を解決する。",
+]
+_REASONS = ["前提となる作業", "結果を利用する", "同じ資料を使う", "先に方針を決める必要がある"]
+_HUMAN_ACTIONS = ["内容の承認", "データのレビュー", "外部への連絡", "予算の確認"]
+
+
+def _make_id(number: int) -> str:
+    return f"T{number:04d}" if number <= ID_MAX else ""
+
+
+def _reference(task: Dict) -> str:
+    """依存関係から指すときのID（一時IDがなければ永続ID）"""
+    return task["id"] or task["permanent_id"]
+
+
+def _make_text(rng: random.Random) -> Tuple[str, str]:
+    subject = rng.choice(_SUBJECTS)
+    title = subject + rng.choice(_ACTIONS) + rng.choice(_QUALIFIERS)
+    sentences = rng.sample(_DESCRIPTIONS, rng.randint(1, 3))
+    description = "".join(s.format(subject=subject) for s in sentences)
+    return title, description
+
+
+def _make_near_duplicate(rng: random.Random, original: Dict) -> Tuple[str, str]:
+    title = original["title"]
+    if "の" in title and rng.random() < 0.5:
+        # 対象だけを差し替える
+        title = rng.choice(_SUBJECTS) + title[title.index("の") :]
+    else:
+        title += rng.choice(["（再）", "の続き", "を再確認", ""])
+    description = original["description"]
+    if rng.random() < 0.5:
+        description += "期限に注意する。"
+    return title, description
+
+
+def _make_date(rng: random.Random, start: datetime.date, span_days: int) -> str:
+    return (start + datetime.timedelta(days=rng.randrange(span_days))).isoformat()
+
+
+def generate_tasks(
+    count: int,
+    seed: int = 0,
+    first_id: int = 1,
+    invalid_rate: float = 0.0,
+    duplicate_rate: float = 0.05,
+    start_date: datetime.date = datetime.date(2025, 1, 1),
+) -> List[Dict]:
+    """
+    count件のタスクを生成する（同じ引数なら同じ結果）
+    first_id: 最初のタスクの一時IDの番号
+    invalid_rate: 検証ルールに違反する値を1つ入れるタスクの割合
+    duplicate_rate: 前のタスクに似せたタスクの割合（similar_tasks で相互に参照する）
+    """
+    rng = random.Random(seed)
+    tasks: List[Dict] = []
+    for i in range(count):
+        task: Dict = {
+            "id": _make_id(first_id + i),
+            "permanent_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        }
+
+        similar_to: Optional[Dict] = None
+        if tasks and rng.random() < duplicate_rate:
+            similar_to = tasks[rng.randrange(max(0, len(tasks) - 1000), len(tasks))]
+            title, description = _make_near_duplicate(rng, similar_to)
+        else:
+            title, description = _make_text(rng)
+
+        is_project = rng.random() < 0.05
+        status = rng.choices(["Open", "Done", "Closed"], weights=[70, 25, 5])[0]
+        task.update(
+            {
+                "title": title,
+                "status": status,
+                "type": "project" if is_project else "task",
+                "description": description,
+                "labels": rng.sample(LABELS, rng.randint(0, 3)),
+                "assignable_to": rng.choice([["human"], ["ai"], ["human", "ai"]]),
+            }
+        )
+        if is_project:
+            task["subtasks"] = []
+            for _ in range(rng.randint(1, 4)):
+                sub_title, sub_description = _make_text(rng)
+                task["subtasks"].append(
+                    {
+                        "title": sub_title,
+                        "type": "task",
+                        "status": rng.choice(["Open", "Done"]),
+                        "description": sub_description,
+                    }
+                )
+
+        dependencies: Dict[str, List[Dict]] = {}
+        if tasks:
+            window = tasks[max(0, len(tasks) - 2000) :]
+            must = rng.sample(window, min(len(window), rng.choices([0, 1, 2], [50, 35, 15])[0]))
+            if must:
+                dependencies["must"] = [
+                    {"task_id": _reference(dep), "reason": rng.choice(_REASONS)} for dep in must
+                ]
+            if rng.random() < 0.2:
+                dependencies["nice_to_have"] = [
+                    {"task_id": _reference(rng.choice(window)), "reason": rng.choice(_REASONS)}
+                ]
+        if rng.random() < 0.1:
+            dependencies["human"] = [
+                {
+                    "action": rng.choice(_HUMAN_ACTIONS),
+                    "assignee": rng.choice(ASSIGNEES),
+                    "status": rng.choice(["waiting", "approved"]),
+                    "reason": "人間による確認が必要",
+                }
+            ]
+        if dependencies:
+            task["dependencies"] = dependencies
+
+        if similar_to is not None:
+            score = round(rng.uniform(0.7, 0.95), 2)
+            task["similar_tasks"] = [
+                {"task_id": _reference(similar_to), "similarity_score": score, "note": "タイトルが類似"}
+            ]
+            similar_to.setdefault("similar_tasks", []).append(
+                {"task_id": _reference(task), "similarity_score": score, "note": "タイトルが類似"}
+            )
+
+        if rng.random() < 0.3:
+            task["due_date"] = _make_date(rng, start_date, 365)
+        if rng.random() < 0.05:
+            task["appointment_date"] = _make_date(rng, start_date, 365)
+        if status == "Done":
+            completed = _make_date(rng, start_date, 365)
+            task["completion_time"] = f"{completed}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+        if rng.random() < 0.1:
+            task["visibility"] = "public"
+        if rng.random() < 0.05:
+            task["security_level"] = rng.choice(["sensitive", "confidential"])
+
+        if rng.random() < invalid_rate:
+            task[rng.choice(["status", "due_date", "visibility", "permanent_id"])] = "bad"
+        tasks.append(task)
+    return tasks
+
+
+def generate_archive(
+    count: int,
+    days: int,
+    seed: int = 0,
+    first_id: int = 1,
+    end_date: datetime.date = datetime.date(2025, 12, 31),
+) -> Dict[str, List[Dict]]:
+    """
+    完了済みタスクcount件を、end_date までのdays日分の日付別アーカイブに振り分ける
+    戻り値：{"YYYY-MM-DD": [タスク, ...]}
+    """
+    tasks = generate_tasks(count, seed=seed + 1, first_id=first_id, duplicate_rate=0.0)
+    archive: Dict[str, List[Dict]] = {}
+    for i, task in enumerate(tasks):
+        date = end_date - datetime.timedelta(days=days - 1 - i * days // max(count, 1))
+        task["status"] = "Done"
+        task["completion_time"] = f"{date.isoformat()}T18:00:00"
+        # アーカイブ済みのタスクからバックログへの依存は張らない
+        task.pop("dependencies", None)
+        task.pop("similar_tasks", None)
+        archive.setdefault(date.isoformat(), []).append(task)
+    return archive
+
+
+def write_data_root(
+    data_root: str,
+    count: int,
+    archive_count: Optional[int] = None,
+    archive_days: int = 30,
+    seed: int = 0,
+) -> Dict[str, str]:
+    """
+    DATA_ROOT の形（tasks/backlog.json と tasks/archive/YYYY-MM-DD.json）で書き出す
+    archive_count: アーカイブするタスク数（省略時は count の半分）
+    アーカイブ済みタスクの一時IDはバックログと重ならない番号から割り当てる
+    戻り値：{"backlog": バックログのパス, "archive": アーカイブディレクトリ}
+    """
+    if archive_count is None:
+        archive_count = count // 2
+    tasks_dir = os.path.join(data_root, "tasks")
+    archive_dir = os.path.join(tasks_dir, "archive")
+    os.makedirs(archive_dir, exist_ok=True)
+
+    backlog_path = os.path.join(tasks_dir, "backlog.json")
+    with open(backlog_path, "w", encoding="utf-8") as f:
+        json.dump({"tasks": generate_tasks(count, seed=seed)}, f, ensure_ascii=False, indent=2)
+
+    archive = generate_archive(archive_count, archive_days, seed=seed, first_id=count + 1)
+    for date, tasks in archive.items():
+        with open(os.path.join(archive_dir, f"{date}.json"), "w", encoding="utf-8") as f:
+            json.dump({"tasks": tasks}, f, ensure_ascii=False, indent=2)
+
+    return {"backlog": backlog_path, "archive": archive_dir}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic backlog")
+    parser.add_argument("data_root", help="Output directory (used as DATA_ROOT)")
+    parser.add_argument("--tasks", type=int, default=1000, help="Number of backlog tasks")
+    parser.add_argument("--archive-tasks", type=int, help="Number of archived tasks (default: half of --tasks)")
+    parser.add_argument("--archive-days", type=int, default=30, help="Number of daily archive files")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    paths = write_data_root(
+        args.data_root, args.tasks, args.archive_tasks, args.archive_days, args.seed
+    )
+    print(f"Backlog: {paths['backlog']}")
+    print(f"Archive: {paths['archive']}")
+
+
+if __name__ == "__main__":
+    main()
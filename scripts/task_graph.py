@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+依存関係の参照整合性と循環の検査 / Referential-integrity and cycle checks for dependencies
+
+dependencies の must / nice_to_have が指す task_id を、バックログとアーカイブの
+IDの索引（id と permanent_id）で引き、存在しないタスクへの参照・自己参照・循環依存を
+線形時間で検出します。循環は反復版のTarjanのアルゴリズムで強連結成分を求め、
+成分ごとに最短の循環を1つ示します。
+Resolves every must / nice_to_have task_id through a hash index of backlog
+and archive IDs (id and permanent_id), and reports dangling references,
+self-loops and dependency cycles in linear time. Cycles are found as
+strongly connected components with an iterative Tarjan, and one shortest
+cycle is shown per component.
+
+使用方法 / Usage:
+    python task_graph.py [backlog.json path]
+"""
+
+import os
+import sys
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+DEPENDENCY_TYPES = ("must", "nice_to_have")
+
+
+def build_id_index(tasks: List[Dict]) -> Dict[str, int]:
+    """id と permanent_id からタスクの位置への索引（重複時は最初のタスク）"""
+    index = {}
+    for position, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            continue
+        for field in ("id", "permanent_id"):
+            value = task.get(field)
+            if isinstance(value, str) and value:
+                index.setdefault(value, position)
+    return index
+
+
+def task_label(task: Dict) -> str:
+    return str(task.get("id") or task.get("permanent_id") or "UNKNOWN")
+
+
+def iter_dependencies(task: Dict) -> Iterator[Tuple[str, str]]:
+    """タスクが参照する (依存の種類, task_id) を返す（形式の誤りは validate_task に任せる）"""
+    deps = task.get("dependencies")
+    if not isinstance(deps, dict):
+        return
+    for dep_type in DEPENDENCY_TYPES:
+        dep_list = deps.get(dep_type)
+        if not isinstance(dep_list, list):
+            continue
+        for dep in dep_list:
+            if isinstance(dep, dict) and isinstance(dep.get("task_id"), str):
+                yield dep_type, dep["task_id"]
+
+
+def _reference_lists(task: Dict) -> List[List]:
+    """task_id で他のタスクを指すエントリのリスト（must / nice_to_have / similar_tasks）"""
+    entry_lists = []
+    deps = task.get("dependencies")
+    if isinstance(deps, dict):
+        entry_lists.extend(deps.get(dep_type) for dep_type in DEPENDENCY_TYPES)
+    entry_lists.append(task.get("similar_tasks"))
+    return [entries for entries in entry_lists if isinstance(entries, list)]
+
+
+def rewrite_references(tasks: List[Dict], renamed: Dict[str, str]) -> int:
+    """
+    dependencies（must / nice_to_have）と similar_tasks の task_id を renamed に従って書き換える
+    戻り値：書き換えた参照の数
+    """
+    if not renamed:
+        return 0
+    count = 0
+    for task in tasks:
+        if not isinstance(task, dict):
+            continue
+        for entries in _reference_lists(task):
+            for entry in entries:
+                if isinstance(entry, dict) and entry.get("task_id") in renamed:
+                    entry["task_id"] = renamed[entry["task_id"]]
+                    count += 1
+    return count
+
+
+def build_referrers(tasks: List[Dict]) -> Dict[str, List[int]]:
+    """
+    参照されている task_id から、それを参照しているタスクの位置への逆引き索引
+    （dependencies と similar_tasks。1つのタスクは1回だけ数える）
+    """
+    referrers: Dict[str, List[int]] = {}
+    for position, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            continue
+        seen = set()
+        for entries in _reference_lists(task):
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                task_id = entry.get("task_id")
+                if isinstance(task_id, str) and task_id not in seen:
+                    seen.add(task_id)
+                    referrers.setdefault(task_id, []).append(position)
+    return referrers
+
+
+def rewire_references(
+    tasks: List[Dict], renamed: Dict[str, str], referrers: Dict[str, List[int]]
+) -> int:
+    """
+    renamed の旧IDを参照しているタスクだけを逆引き索引で見つけ、複製して参照を書き換える
+    （元のタスクの辞書は変更しないので、変更ログの差分に使える）
+    書き換えで同じリストに同じ参照先が重なったら既存の参照を残し、自分自身への参照は削除する
+    戻り値：書き換えた参照の数
+    """
+    positions = sorted({position for old_id in renamed for position in referrers.get(old_id, [])})
+    count = 0
+    for position in positions:
+        task = dict(tasks[position])
+        own_ids = {task.get("id"), task.get("permanent_id")} - {None, ""}
+        deps = task.get("dependencies")
+        if isinstance(deps, dict):
+            task["dependencies"] = deps = dict(deps)
+        for container, key in [(deps, dep_type) for dep_type in DEPENDENCY_TYPES] + [
+            (task, "similar_tasks")
+        ]:
+            if not isinstance(container, dict) or not isinstance(container.get(key), list):
+                continue
+            entries = container[key]
+            targets = {
+                entry.get("task_id")
+                for entry in entries
+                if isinstance(entry, dict) and entry.get("task_id") not in renamed
+            }
+            rewired = []
+            for entry in entries:
+                if isinstance(entry, dict) and entry.get("task_id") in renamed:
+                    new_id = renamed[entry["task_id"]]
+                    count += 1
+                    if new_id in own_ids or new_id in targets:
+                        continue
+                    targets.add(new_id)
+                    entry = dict(entry, task_id=new_id)
+                rewired.append(entry)
+            container[key] = rewired
+        tasks[position] = task
+    return count
+
+
+def build_graph(
+    tasks: List[Dict], known_ids: Iterable[str] = ()
+) -> Tuple[List[List[int]], List[Tuple[int, str, str]], List[Tuple[int, str]]]:
+    """
+    タスクの位置を頂点、依存先への参照を辺とするグラフを作る
+    known_ids: バックログ以外で存在するID（アーカイブ済みタスクなど）。辺は張らない
+    戻り値：(隣接リスト, 存在しない参照 [(位置, 種類, task_id)], 自己参照 [(位置, 種類)])
+    """
+    index = build_id_index(tasks)
+    known = set(known_ids)
+    adjacency: List[List[int]] = [[] for _ in tasks]
+    dangling = []
+    self_loops = []
+
+    for position, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            continue
+        for dep_type, dep_id in iter_dependencies(task):
+            target = index.get(dep_id)
+            if target is None:
+                if dep_id not in known:
+                    dangling.append((position, dep_type, dep_id))
+            elif target == position:
+                self_loops.append((position, dep_type))
+            else:
+                adjacency[position].append(target)
+
+    return adjacency, dangling, self_loops
+
+
+def strongly_connected_components(adjacency: List[List[int]]) -> List[List[int]]:
+    """反復版のTarjanのアルゴリズム（再帰しないので深い依存でもスタックが溢れない）"""
+    count = len(adjacency)
+    order = [-1] * count
+    low = [0] * count
+    on_stack = [False] * count
+    stack: List[int] = []
+    components = []
+    counter = 0
+
+    for root in range(count):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+
+        while work:
+            node, i = work[-1]
+            edges = adjacency[node]
+            if i < len(edges):
+                work[-1] = (node, i + 1)
+                target = edges[i]
+                if order[target] == -1:
+                    order[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, 0))
+                elif on_stack[target] and order[target] < low[node]:
+                    low[node] = order[target]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+
+    return components
+
+
+def shortest_cycle(
+    start: int, members: Iterable[int], adjacency: List[List[int]]
+) -> List[int]:
+    """強連結成分の中で start を通る最短の循環を幅優先探索で求める"""
+    members = set(members)
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for target in adjacency[node]:
+            if target == start:
+                cycle = []
+                while node is not None:
+                    cycle.append(node)
+                    node = parent[node]
+                return cycle[::-1]
+            if target in members and target not in parent:
+                parent[target] = node
+                queue.append(target)
+    return [start]
+
+
+def find_cycle_groups(adjacency: List[List[int]]) -> List[Tuple[List[int], List[int]]]:
+    """
+    循環依存を強連結成分ごとに返す
+    戻り値：[(成分に含まれるタスクの位置, 成分内の最短の循環)]（タスク順）
+    """
+    groups = []
+    for component in strongly_connected_components(adjacency):
+        if len(component) < 2:
+            continue
+        component.sort()
+        groups.append((component, shortest_cycle(component[0], component, adjacency)))
+    groups.sort()
+    return groups
+
+
+def check_dependencies(tasks: List[Dict], known_ids: Iterable[str] = ()) -> Dict:
+    """
+    参照整合性と循環をまとめて検査する
+    戻り値：{"dangling": [...], "self_loops": [...], "cycles": [...]}（いずれもタスクの位置で表す）
+    """
+    adjacency, dangling, self_loops = build_graph(tasks, known_ids)
+    return {
+        "dangling": dangling,
+        "self_loops": self_loops,
+        "cycles": find_cycle_groups(adjacency),
+    }
+
+
+def find_cycles(tasks: List[Dict]) -> List[List[str]]:
+    """循環依存をIDのリストで返す（自己参照を含む、成分ごとに最短の循環を1つ）"""
+    adjacency, _, self_loops = build_graph(tasks)
+    cycles = [[task_label(tasks[position])] for position, _ in self_loops]
+    for _, cycle in find_cycle_groups(adjacency):
+        cycles.append([task_label(tasks[position]) for position in cycle])
+    return cycles
+
+
+def main():
+    from dotenv import load_dotenv
+    from archive_manifest import iter_manifest_tasks, refresh_manifest
+    from common_id_utils import get_backlog_path, load_backlog_file
+
+    load_dotenv()
+
+    backlog_path = sys.argv[1] if len(sys.argv) > 1 else get_backlog_path()
+    tasks = load_backlog_file(backlog_path)["tasks"]
+    archive_dir = os.path.join(os.path.dirname(os.path.abspath(backlog_path)), "archive")
+    archived_ids = [
+        task_id
+        for task in iter_manifest_tasks(refresh_manifest(archive_dir))
+        for task_id in (task["id"], task["permanent_id"])
+        if task_id
+    ]
+
+    report = check_dependencies(tasks, archived_ids)
+    for position, dep_type, dep_id in report["dangling"]:
+        print(f"{task_label(tasks[position])}: {dep_type} -> {dep_id} (not found)")
+    for position, dep_type in report["self_loops"]:
+        print(f"{task_label(tasks[position])}: {dep_type} -> itself")
+    for members, cycle in report["cycles"]:
+        path = " -> ".join(task_label(tasks[p]) for p in cycle + cycle[:1])
+        print(f"Cycle of {len(members)} tasks: {path}")
+
+    if not any(report.values()):
+        print(f"No dependency problems in {len(tasks)} tasks.")
+    sys.exit(1 if any(report.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+タスクの逐次読み込み / Incremental reader for the tasks array of huge JSON files
+
+{"tasks": [...]} 形式のファイルを少しずつ読み込み、tasks 配列の要素を
+1件読み終えるたびに返します。ファイル全体を json.load しないため、
+メモリ使用量は読み込み単位と最大のタスク1件分に収まり、
+先頭付近の問題はファイルの末尾まで読まずに見つかります。
+Reads a {"tasks": [...]} file in chunks and yields each element of the tasks
+array as soon as it is complete, together with its line and column. Memory
+stays bounded by the chunk size plus the largest single task.
+
+- 値の解析は json.JSONDecoder.raw_decode（C実装）に任せる
+  Values are decoded with json.JSONDecoder.raw_decode (C implementation)
+- 解析に失敗したときだけ括弧を数え、読み込み途中なのか構文エラーなのかを判定する
+  Brackets are counted only after a failed decode, to tell a value cut at a
+  chunk boundary from a real syntax error
+"""
+
+import json
+import re
+from typing import Any, Iterator, TextIO, Tuple
+
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# 閉じていない文字列は単独の " として拾う
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|"|[\[\]{}]', re.DOTALL)
+_LITERAL = re.compile(r"[^\s,\]}]*")
+
+_decoder = json.JSONDecoder()
+
+
+class StreamError(ValueError):
+    """読み込み中に見つかった問題（行と列は1始まり）"""
+
+    def __init__(self, message: str, line: int, column: int):
+        super().__init__(f"{message}: line {line} column {column}")
+        self.message = message
+        self.line = line
+        self.column = column
+
+
+class StreamSyntaxError(StreamError):
+    """JSONとしての構文エラー"""
+
+
+class StreamFormatError(StreamError):
+    """JSONとしては正しいが {"tasks": [...]} の形でない"""
+
+
+def _value_end(buf: str, pos: int) -> int:
+    """pos から始まる値が buf の中で閉じていればその終端、途中で切れていれば-1"""
+    if buf[pos] in "{[":
+        depth = 0
+        for m in _TOKEN.finditer(buf, pos):
+            token = m.group()
+            if token == '"':
+                return -1
+            if token[0] == '"':
+                continue
+            depth += 1 if token in "{[" else -1
+            if depth == 0:
+                return m.end()
+        return -1
+    m = _TOKEN.match(buf, pos) if buf[pos] == '"' else _LITERAL.match(buf, pos)
+    if m.group() == '"' or m.end() == len(buf):
+        return -1
+    return m.end()
+
+
+class _Reader:
+    def __init__(self, f: TextIO, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        # 直前に位置を求めた箇所。行番号はそこから数え進める
+        # mark_line_start はその行の先頭の buf 上の位置（前のチャンクにあれば負）
+        self.mark = 0
+        self.mark_line = 1
+        self.mark_line_start = 0
+        self.first_line_start = 0
+
+    def fill(self) -> None:
+        """読み終えた部分を捨てて次のチャンクを読み込む"""
+        line, column = self.location(self.pos)
+        chunk = self.f.read(self.chunk_size)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        self.mark = 0
+        self.mark_line = line
+        self.mark_line_start = self.first_line_start = 1 - column
+
+    def location(self, pos: int) -> Tuple[int, int]:
+        """buf 上の位置の行と列（1始まり）"""
+        if pos < self.mark:
+            # 後戻りするのはエラー表示のときだけ
+            newlines = self.buf.count("\n", pos, self.mark)
+            if newlines:
+                self.mark_line -= newlines
+                start = self.buf.rfind("\n", 0, pos) + 1
+                self.mark_line_start = start if start > 0 else self.first_line_start
+            self.mark = pos
+        newlines = self.buf.count("\n", self.mark, pos)
+        if newlines:
+            self.mark_line += newlines
+            self.mark_line_start = self.buf.rfind("\n", self.mark, pos) + 1
+        self.mark = pos
+        return self.mark_line, pos - self.mark_line_start + 1
+
+    def error(self, message: str, pos: int = None, kind=StreamSyntaxError) -> StreamError:
+        return kind(message, *self.location(self.pos if pos is None else pos))
+
+    def peek(self) -> str:
+        """空白を読み飛ばして次の1文字を返す（終端なら空文字列）"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos : self.pos + 1]
+            self.fill()
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def decode(self) -> Tuple[Any, int]:
+        """次の値を1つ解析する。戻り値：(値, 開始位置)"""
+        while True:
+            if not self.peek():
+                raise self.error("Expecting value")
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof or _value_end(self.buf, self.pos) >= 0:
+                    raise self.error(e.msg, e.pos)
+                self.fill()
+                continue
+            if end == len(self.buf) and not self.eof:
+                # 数値などがチャンクの境目で切れている可能性がある
+                self.fill()
+                continue
+            start = self.pos
+            self.pos = end
+            return value, start
+
+
+def _iter_array(reader: _Reader) -> Iterator[Tuple[int, int, int, Any]]:
+    """"[" の位置から配列の要素を順に返す（"]" の次まで読む）"""
+    reader.pos += 1
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    index = 0
+    while True:
+        value, start = reader.decode()
+        line, column = reader.location(start)
+        yield index, line, column, value
+        index += 1
+        char = reader.peek()
+        reader.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise reader.error("Expecting ',' delimiter", reader.pos - 1)
+
+
+def iter_tasks(
+    filepath: str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[Tuple[int, int, int, Any]]:
+    """
+    tasks 配列の要素を読み終えた順に返す
+    戻り値：(インデックス, 行, 列, 要素) のイテレータ
+    構文エラーは StreamSyntaxError、{"tasks": [...]} の形でなければ StreamFormatError
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        reader = _Reader(f, chunk_size)
+        if reader.peek() != "{":
+            raise reader.error(
+                "Top level must be a dictionary with 'tasks' key", kind=StreamFormatError
+            )
+        reader.pos += 1
+
+        found = False
+        if reader.peek() == "}":
+            reader.pos += 1
+        else:
+            while True:
+                key, start = reader.decode()
+                if not isinstance(key, str):
+                    raise reader.error("Expecting property name", start)
+                reader.expect(":")
+
+                if key != "tasks":
+                    # tasks 以外の値は読み捨てる
+                    reader.decode()
+                else:
+                    found = True
+                    if reader.peek() != "[":
+                        raise reader.error("'tasks' must be a list", kind=StreamFormatError)
+                    yield from _iter_array(reader)
+
+                char = reader.peek()
+                reader.pos += 1
+                if char == "}":
+                    break
+                if char != ",":
+                    raise reader.error("Expecting ',' delimiter", reader.pos - 1)
+
+        if reader.peek():
+            raise reader.error("Extra data")
+        if not found:
+            raise reader.error(
+                "Top level must be a dictionary with 'tasks' key", kind=StreamFormatError
+            )
+
+
+def iter_records(f: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, int, int, Any]]:
+    """
+    JSON配列・JSON Lines（1行1値）・{"tasks": [...]} のいずれかの入力から値を順に返す
+    標準入力のような読み戻せないストリームでもよい（{"tasks": [...]} だけは全体を読み込む）
+    戻り値：(インデックス, 行, 列, 値) のイテレータ
+    """
+    reader = _Reader(f, chunk_size)
+    if reader.peek() == "[":
+        yield from _iter_array(reader)
+        if reader.peek():
+            raise reader.error("Extra data")
+        return
+
+    index = 0
+    while reader.peek():
+        value, start = reader.decode()
+        line, column = reader.location(start)
+        if (
+            index == 0
+            and isinstance(value, dict)
+            and isinstance(value.get("tasks"), list)
+            and not reader.peek()
+        ):
+            for i, task in enumerate(value["tasks"]):
+                yield i, line, column, task
+            return
+        yield index, line, column, value
+        index += 1
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+TF-IDF による類似タスクの検出 / Batch TF-IDF similarity with blockwise top-k neighbours
+
+全タスクのタイトルと説明を文字2-gramの TF-IDF ベクトル（疎行列）にし、
+行のブロックごとに全タスクとのコサイン類似度を行列積で求めて、
+各タスクの類似度の高いタスクを top_k 件まで similar_tasks の形で返します。
+n×n の類似度行列全体は作らないので、メモリはブロックの大きさで決まります。
+Builds sparse character-bigram TF-IDF vectors for every task title and
+description, multiplies one block of rows at a time against the whole
+matrix to get cosine similarities, and keeps the top_k neighbours per task
+in the similar_tasks schema. The full n x n matrix is never materialized;
+memory is bounded by the block size.
+
+- NumPy と SciPy が必要（このモジュールを使うときだけ読み込む）
+  Requires NumPy and SciPy, imported only when this module is used
+- 2-gramの抽出は全タスクの文字列をつないだ配列の上でまとめて行う
+  Bigrams are extracted in one vectorized pass over the concatenated text
+- 語彙が少なく密にしても収まる行列は密な行列積、それ以外は疎な行列積で求め、
+  どちらもブロックごとに上位 top_k 件だけを残す
+  Small vocabularies use dense BLAS products, others sparse products; either
+  way only the top_k entries of each block row are kept
+- TF は 1 + log(tf)、IDF は log((1 + n) / (1 + df)) + 1、各行はL2正規化
+  TF is 1 + log(tf), IDF is log((1 + n) / (1 + df)) + 1, rows are L2-normalized
+
+使用方法 / Usage:
+    python similarity.py --method tfidf [--threshold 0.5] [--top-k 5]
+"""
+
+from typing import Dict, List
+
+from similarity import TOP_K, normalize_text, task_reference
+
+DEFAULT_THRESHOLD = 0.5
+# 1ブロックで作る類似度の要素数の上限（float32 で約32MB）
+BLOCK_CELLS = 8 * 1024 * 1024
+# 行列を密にして BLAS の行列積を使う要素数の上限（float32 で約128MB）
+DENSE_CELLS = 32 * 1024 * 1024
+# Unicode のコードポイントは21ビットに収まる
+_CODE_BITS = 21
+
+
+def build_matrix(tasks: List[Dict]):
+    """
+    タイトルと説明の文字2-gramの TF-IDF 行列（CSR、float32、行はL2正規化済み）
+    タイトルと説明、タスクとタスクの境目をまたぐ2-gramは数えない
+    """
+    import numpy as np
+    from scipy import sparse
+
+    # "\0" は正規化後の文字列には現れないので、境目の印に使う
+    texts = [
+        normalize_text(task.get("title") or "") + "\0" + normalize_text(task.get("description") or "")
+        for task in tasks
+    ]
+    joined = "\0".join(texts)
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+    rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)[: max(len(codes) - 1, 0)]
+
+    left, right = codes[:-1], codes[1:]
+    valid = (left != 0) & (right != 0)
+    grams = (left[valid] << _CODE_BITS) | right[valid]
+    rows = rows[valid]
+    vocabulary, columns = np.unique(grams, return_inverse=True)
+
+    counts = sparse.csr_matrix(
+        (np.ones(len(columns), dtype=np.float32), (rows, columns.ravel())),
+        shape=(len(tasks), len(vocabulary)),
+    )
+    counts.sum_duplicates()
+    counts.data = 1 + np.log(counts.data)
+
+    document_frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(tasks)) / (1 + document_frequency)) + 1
+    matrix = counts.multiply(idf.astype(np.float32)).tocsr()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags((1 / norms).astype(np.float32)) @ matrix
+
+
+def _top_k_dense(scores, start: int, k: int, threshold: float):
+    """密な類似度のブロックから各行の上位k件 (行, 列, 類似度) を選ぶ"""
+    import numpy as np
+
+    count = scores.shape[0]
+    # 自分自身は除く
+    scores[np.arange(count), np.arange(start, start + count)] = -1
+    columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(scores, columns, axis=1)
+    rows = np.repeat(np.arange(count), k)
+    return rows, columns.ravel(), values.ravel()
+
+
+def _top_k_sparse(scores, start: int, k: int, threshold: float):
+    """疎な類似度のブロック（CSR）から各行の上位k件 (行, 列, 類似度) を選ぶ"""
+    import numpy as np
+
+    rows = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+    keep = (scores.data >= threshold) & (scores.indices != rows + start)
+    rows, columns, values = rows[keep], scores.indices[keep], scores.data[keep]
+    order = np.lexsort((columns, -values, rows))
+    rows, columns, values = rows[order], columns[order], values[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    selected = rank < k
+    return rows[selected], columns[selected], values[selected]
+
+
+def top_neighbors(matrix, threshold: float, top_k: int, block_size: int = 0) -> Dict[int, List]:
+    """
+    各行について、コサイン類似度が threshold 以上の行を高い順に top_k 件
+    語彙が少なく行列を密にしてもメモリに収まるときは密な行列積（BLAS）、
+    そうでなければ疎な行列積を使い、結果から直接上位を選ぶ
+    戻り値：{行: [(類似度, 相手の行), ...]}
+    """
+    import numpy as np
+
+    count, features = matrix.shape
+    if count < 2 or top_k <= 0:
+        return {}
+    block_size = block_size or max(1, BLOCK_CELLS // count)
+    k = min(top_k, count - 1)
+    dense = count * features <= DENSE_CELLS
+    if dense:
+        vectors = matrix.toarray()
+        transposed = vectors.T
+    else:
+        transposed = matrix.T.tocsr()
+
+    neighbors: Dict[int, List] = {}
+    for start in range(0, count, block_size):
+        stop = min(start + block_size, count)
+        if dense:
+            rows, columns, values = _top_k_dense(vectors[start:stop] @ transposed, start, k, threshold)
+        else:
+            rows, columns, values = _top_k_sparse((matrix[start:stop] @ transposed).tocsr(), start, k, threshold)
+        for row, column, value in zip(rows.tolist(), columns.tolist(), values.tolist()):
+            if value >= threshold:
+                neighbors.setdefault(start + row, []).append((value, column))
+    # 類似度の高い順（同じなら前のタスク）に並べる
+    return {row: sorted(items, key=lambda item: (-item[0], item[1])) for row, items in neighbors.items()}
+
+
+def detect_similar_tasks(
+    tasks: List[Dict], threshold: float = DEFAULT_THRESHOLD, top_k: int = TOP_K, block_size: int = 0
+) -> Dict[str, List[Dict]]:
+    """
+    タスク間の類似性を TF-IDF のコサイン類似度で検出する（similarity.detect_similar_tasks と同じ形）
+    戻り値：タスクの位置をキーとし、類似タスクのリストを値とする辞書
+    自分と同じIDのタスクは含めず、同じIDの相手は1件だけにする（そのぶん top_k 件より少なくなることがある）
+    """
+    positions = [position for position, task in enumerate(tasks) if task_reference(task)]
+    references = [task_reference(tasks[position]) for position in positions]
+    neighbors = top_neighbors(build_matrix([tasks[p] for p in positions]), threshold, top_k, block_size)
+
+    similar = {}
+    for row, items in sorted(neighbors.items()):
+        seen = {references[row]}
+        entries = []
+        for score, other in items:
+            if references[other] in seen:
+                continue
+            seen.add(references[other])
+            entries.append(
+                {
+                    "task_id": references[other],
+                    "similarity_score": round(min(score, 1.0), 3),
+                    "note": f"文字2-gram TF-IDF のコサイン類似度: {score:.2f}",
+                }
+            )
+        if entries:
+            similar[positions[row]] = entries
+    return similar
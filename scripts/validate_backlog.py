@@ -39,7 +39,9 @@ This script validates the structure and content of backlog.json.
   UUIDs: Standard UUID format
 
 使用方法 / Usage:
-    python validate_backlog.py [backlog.json path]
+    python validate_backlog.py [backlog.json path] [--fix] [--no-cache] [--check-refs]
+    python validate_backlog.py --all [--jobs N] [--check-refs]   バックログとアーカイブを一括検証
+    python validate_backlog.py [path] --stream   巨大なファイルを逐次検証（行・列を表示）
 
 注意事項 / Notes:
 - 全てのエラーを収集して一括表示
@@ -48,6 +50,8 @@ This script validates the structure and content of backlog.json.
   Validates entire backlog consistency
 - ID重複を自動的に検出
   Automatically detects ID duplicates
+- 前回から変更のないタスクは検証結果のキャッシュを使う（validation_cache.py）
+  Unchanged tasks reuse cached results (validation_cache.py)
 
 ## スクリプトの概要
 
@@ -77,15 +81,30 @@ This script validates the structure and content of backlog.json.
 いずれの場合も、**バリデーション部分**を適切に修正することで整合性を保ち、誤入力や不正なJSON構造を防げます。
 """
 
+import hashlib
 import json
 import sys
 import uuid
 import re
 import os
 import argparse
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from common_id_utils import find_next_available_id
-from typing import Dict, List, Any
+import archive_store
+import backlog_journal
+import task_graph
+import task_stream
+import validation_cache
+from archive_manifest import iter_manifest_tasks, refresh_manifest
+from common_id_utils import (
+    get_storage_mode,
+    is_backlog_path,
+    load_backlog_file,
+    save_backlog_file,
+)
+from manage_4digit_ids import BACKLOG_PATH, IdRegistry
+from typing import Dict, List, Any, Optional, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -100,6 +119,9 @@ def format_task_identifier(task: Dict[str, Any]) -> str:
     """
     タスクのIDと名前をフォーマットして返す
     """
+    if not isinstance(task, dict):
+        # 辞書でない要素もエラー表示できるようにする
+        task = {}
     task_id = task.get("id", "UNKNOWN")
     task_title = task.get("title", "UNKNOWN")
     return f"Task ID: {task_id}, Name: {task_title}"
@@ -115,7 +137,7 @@ def is_valid_temp_id(task_id: str) -> bool:
     """
     if task_id == "":
         return True
-    return bool(re.match(r"^T\d{4}$", task_id))
+    return bool(_TEMP_ID_PATTERN.fullmatch(task_id))
 
 
 def is_valid_permanent_id(permanent_id: str) -> bool:
@@ -275,102 +297,199 @@ def validate_similar_tasks(similar: Any, task: Dict[str, Any]) -> List[str]:
 # 3. タスク単位のバリデーション
 # ---------------------------------
 
+# ルールはモジュール読み込み時に一度だけコンパイルする
+# fullmatch で使う（$ は末尾の改行も許し、\d は全角数字にも一致するため使わない）
+_TEMP_ID_PATTERN = re.compile(r"T[0-9]{4}")
+_UUID_PATTERN = re.compile(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+)
+_ISO_DATE_PATTERN = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+_WEEKDAY_PATTERN = re.compile(r"^(月曜|火曜|水曜|木曜|金曜|土曜|日曜)")
+_STATUSES = frozenset(["open", "done", "closed"])
+_VISIBILITIES = frozenset(["public", "private"])
+_SECURITY_LEVELS = frozenset(["normal", "sensitive", "confidential"])
+_HUMAN_DEP_STATUSES = frozenset(["waiting", "approved", "rejected"])
+_HUMAN_DEP_FIELDS = ("action", "assignee", "status", "reason")
+
+
+def _check_id(task, value):
+    if value != "" and not (isinstance(value, str) and _TEMP_ID_PATTERN.fullmatch(value)):
+        return [
+            f"{format_task_identifier(task)} - invalid temporary ID format: {task.get('id', 'UNKNOWN')} (must be TXXXX)"
+        ]
+
+
+def _check_string(field):
+    def check(task, value):
+        if not isinstance(value, str):
+            return [
+                f"{format_task_identifier(task)} - {field} must be a string, but got: {task.get(field, 'UNKNOWN')}"
+            ]
+
+    return check
+
+
+def _check_status(task, value):
+    if not (isinstance(value, str) and value.lower() in _STATUSES):
+        return [
+            f"{format_task_identifier(task)} - invalid status '{task['status']}' (must be Open/In Progress/Done/Blocked)"
+        ]
 
-def validate_task(task: Dict[str, Any]) -> List[str]:
-    """
-    Validate a single task in the tasks.json
-    戻り値：エラーメッセージのリスト（エラーがなければ空）
-    """
-    errors = []
 
-    # --- 必須フィールドチェック
-    required_fields = ["id", "title", "status", "description"]
-    for field in required_fields:
-        if field not in task:
-            errors.append(
-                f"{format_task_identifier(task)} - Missing required field: {field}"
-            )
+def _check_permanent_id(task, value):
+    if value == "" or (isinstance(value, str) and _UUID_PATTERN.fullmatch(value)):
+        return None
+    # 正規形以外はuuid.UUIDの判定に任せる
+    if isinstance(value, str) and is_valid_permanent_id(value):
+        return None
+    return [
+        f"{format_task_identifier(task)} - invalid permanent_id format (must be UUID)"
+    ]
 
-    task_id = task.get("id", "UNKNOWN")  # 不明時はUNKNOWN
 
-    # --- id フォーマット（TXXXX）
-    if "id" in task:
-        if not is_valid_temp_id(task["id"]):
-            errors.append(
-                f"{format_task_identifier(task)} - invalid temporary ID format: {task.get('id', 'UNKNOWN')} (must be TXXXX)"
-            )
+def _check_list(field):
+    def check(task, value):
+        if not isinstance(value, list):
+            return [f"{format_task_identifier(task)} - {field} must be a list"]
 
-    # --- title, descriptionは文字列チェック（必須）
-    for f in ["title", "description"]:
-        if f in task and not isinstance(task[f], str):
-            errors.append(
-                f"{format_task_identifier(task)} - {f} must be a string, but got: {task.get(f, 'UNKNOWN')}"
-            )
+    return check
 
-    # --- status
-    if "status" in task and not validate_status(task["status"]):
-        errors.append(
-            f"{format_task_identifier(task)} - invalid status '{task['status']}' (must be Open/In Progress/Done/Blocked)"
-        )
 
-    # # --- type
-    # if "type" in task and not validate_type(task["type"]):
-    #     errors.append(
-    #         f"{format_task_identifier(task)} - invalid type '{task.get('type', 'UNKNOWN')}' (must be task/project)"
-    #     )
+def _dependencies_ok(deps) -> bool:
+    if not isinstance(deps, dict):
+        return False
+    for dep_type in ("must", "nice_to_have"):
+        if dep_type in deps:
+            dep_list = deps[dep_type]
+            if not isinstance(dep_list, list):
+                return False
+            for dep in dep_list:
+                if not (isinstance(dep, dict) and "task_id" in dep and "reason" in dep):
+                    return False
+    if "human" in deps:
+        dep_list = deps["human"]
+        if not isinstance(dep_list, list):
+            return False
+        for dep in dep_list:
+            if not isinstance(dep, dict):
+                return False
+            for f in _HUMAN_DEP_FIELDS:
+                if f not in dep:
+                    return False
+            status = dep["status"]
+            if not (isinstance(status, str) and status in _HUMAN_DEP_STATUSES):
+                return False
+    return True
+
 
-    # --- permanent_id (オプション)
-    if "permanent_id" in task:
-        if not is_valid_permanent_id(task["permanent_id"]):
-            errors.append(
-                f"{format_task_identifier(task)} - invalid permanent_id format (must be UUID)"
-            )
+def _check_dependencies(task, value):
+    # 問題がなければ素早く抜け、エラーがあるときだけ詳細なメッセージを作る
+    if not _dependencies_ok(value):
+        return validate_dependencies(value, task)
 
-    # --- labels (オプション)
-    if "labels" in task:
-        if not isinstance(task["labels"], list):
-            errors.append(f"{format_task_identifier(task)} - labels must be a list")
 
-    # --- assignable_to (オプション)
-    if "assignable_to" in task:
-        if not isinstance(task["assignable_to"], list):
-            errors.append(
-                f"{format_task_identifier(task)} - assignable_to must be a list"
-            )
+def _similar_tasks_ok(similar) -> bool:
+    if not isinstance(similar, list):
+        return False
+    for item in similar:
+        if not (isinstance(item, dict) and "task_id" in item and "note" in item):
+            return False
+        if "similarity_score" in item:
+            score = item["similarity_score"]
+            if not isinstance(score, (int, float)) or score < 0 or score > 1:
+                return False
+    return True
+
+
+def _check_similar_tasks(task, value):
+    if not _similar_tasks_ok(value):
+        return validate_similar_tasks(value, task)
+
+
+def _check_date(field):
+    def check(task, value):
+        if not isinstance(value, str):
+            return [f"{format_task_identifier(task)} - {field} must be a string"]
+        m = _ISO_DATE_PATTERN.fullmatch(value)
+        if m:
+            try:
+                datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+                return None
+            except ValueError:
+                pass
+        elif _WEEKDAY_PATTERN.match(value):
+            return None
+        # 正規形以外はstrptimeの判定に任せる
+        return validate_date(value)
 
-    # --- dependencies (オプション)
-    if "dependencies" in task:
-        errors.extend(validate_dependencies(task["dependencies"], task))
+    return check
 
-    # --- similar_tasks (オプション)
-    if "similar_tasks" in task:
-        errors.extend(validate_similar_tasks(task["similar_tasks"], task))
 
-    # --- due_date / appointment_date (オプション)
-    for date_field in ["due_date", "appointment_date"]:
-        if date_field in task:
-            if not isinstance(task[date_field], str):
+def _check_choice(choices, message):
+    def check(task, value):
+        if not (isinstance(value, str) and value in choices):
+            return [f"{format_task_identifier(task)} - {message}"]
+
+    return check
+
+
+def compile_task_validator():
+    """
+    フィールドごとのチェック関数を組み立て、1件のタスクを検証する関数を返す
+    エラーの順序は validate_task の従来の順序と同じ
+    """
+    required_fields = ("id", "title", "status", "description")
+    checkers = (
+        ("id", _check_id),
+        ("title", _check_string("title")),
+        ("description", _check_string("description")),
+        ("status", _check_status),
+        ("permanent_id", _check_permanent_id),
+        ("labels", _check_list("labels")),
+        ("assignable_to", _check_list("assignable_to")),
+        ("dependencies", _check_dependencies),
+        ("similar_tasks", _check_similar_tasks),
+        ("due_date", _check_date("due_date")),
+        ("appointment_date", _check_date("appointment_date")),
+        (
+            "visibility",
+            _check_choice(_VISIBILITIES, "visibility must be public or private"),
+        ),
+        (
+            "security_level",
+            _check_choice(
+                _SECURITY_LEVELS,
+                "security_level must be normal/sensitive/confidential",
+            ),
+        ),
+    )
+
+    def validate(task: Dict[str, Any]) -> List[str]:
+        errors = []
+        for field in required_fields:
+            if field not in task:
                 errors.append(
-                    f"{format_task_identifier(task)} - {date_field} must be a string"
+                    f"{format_task_identifier(task)} - Missing required field: {field}"
                 )
-            else:
-                errors.extend(validate_date(task[date_field]))
+        for field, check in checkers:
+            if field in task:
+                found = check(task, task[field])
+                if found:
+                    errors.extend(found)
+        return errors
 
-    # --- visibility (オプション)
-    if "visibility" in task:
-        if not validate_visibility(task["visibility"]):
-            errors.append(
-                f"{format_task_identifier(task)} - visibility must be public or private"
-            )
+    return validate
 
-    # --- security_level (オプション)
-    if "security_level" in task:
-        if not validate_security_level(task["security_level"]):
-            errors.append(
-                f"{format_task_identifier(task)} - security_level must be normal/sensitive/confidential"
-            )
 
-    return errors
+_validate_task = compile_task_validator()
+
+
+def validate_task(task: Dict[str, Any]) -> List[str]:
+    """
+    Validate a single task in the tasks.json
+    戻り値：エラーメッセージのリスト（エラーがなければ空）
+    """
+    return _validate_task(task)
 
 
 # ---------------------------------
@@ -378,52 +497,137 @@ def validate_task(task: Dict[str, Any]) -> List[str]:
 # ---------------------------------
 
 
-def validate_tasks_json(filepath: str, fix: bool = False) -> bool:
+def get_rules_version() -> str:
     """
-    Validate tasks.json structure and each task.
-    戻り値：TrueならOK、Falseならエラーあり
+    検証ルールのバージョン（このファイルの内容のハッシュ）
+    ルールを変更すると検証結果のキャッシュは自動的に無効になる
+    """
+    with open(__file__, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _id_registry() -> IdRegistry:
+    """IDの確保に使うバックログとアーカイブのスナップショット（既定のバックログがなければ空）"""
+    if not os.path.exists(BACKLOG_PATH):
+        return IdRegistry(set(), {})
+    return IdRegistry.snapshot()
+
+
+def repair_ids(tasks: List[Any], registry: Optional[IdRegistry] = None) -> bool:
+    """
+    無効な一時IDと重複した一時ID（2件目以降）を1回の走査で集め、新しいIDをまとめて確保して振り直す
+    空の一時ID（""）は正当なので重複として扱わない
+    新しいIDはバックログとアーカイブの使用中IDを避けて確保する（registry 省略時はスナップショットを作る）
+    無効なIDを指していた dependencies / similar_tasks の参照も新しいIDに書き換える
+    戻り値：IDを振り直したタスクがあればTrue
+    """
+    targets = []
+    valid_ids = set()
+    for i, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            continue
+        _tid = task.get("id", None)
+        if _tid == "":
+            continue
+        if isinstance(_tid, str) and is_valid_temp_id(_tid) and _tid not in valid_ids:
+            valid_ids.add(_tid)
+        else:
+            targets.append(i)
+    if not targets:
+        return False
+
+    # 使用中IDは1回だけ集め、必要な数をまとめて確保する（アーカイブ済みのIDも再利用しない）
+    if registry is None:
+        registry = _id_registry()
+    registry.mark_used(valid_ids)
+    new_ids = registry.reserve(len(targets))
+
+    # 重複したIDへの参照は最初のタスクを指したままにする
+    renamed = {}
+    for i, new_id in zip(targets, new_ids):
+        task = tasks[i]
+        _tid = task.get("id", None)
+        task["id"] = new_id
+        if isinstance(_tid, str) and _tid in valid_ids:
+            print(f"Fixed duplicate ID {_tid} for {format_task_identifier(task)}: {new_id}")
+        else:
+            print(f"Fixed invalid ID for {format_task_identifier(task)}: {new_id}")
+            if isinstance(_tid, str) and _tid:
+                renamed.setdefault(_tid, new_id)
+
+    rewritten = task_graph.rewrite_references(tasks, renamed)
+    if rewritten:
+        print(f"Rewrote {rewritten} references to renamed IDs")
+    return True
+
+
+def check_with_cache(filepath: str):
     """
+    変更のあったタスクだけを検証する（validation_cache）
+    戻り値：(タスクの要約, エラー) のリスト。キャッシュを使えなければNone
+    """
+    journal_records = None
+    if is_backlog_path(filepath):
+        if get_storage_mode() == "sqlite":
+            return None
+        try:
+            journal_records = backlog_journal.read_journal(filepath)
+        except json.JSONDecodeError:
+            return None
+
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        return validation_cache.check_file(
+            filepath, _validate_task, get_rules_version(), journal_records
+        )
     except FileNotFoundError:
-        print(f"File not found: {filepath}")
-        return False
+        return None
+
+
+def read_tasks_file(filepath: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    ファイルを読み込み、{"tasks": [...]} の形であることを確かめる
+    戻り値：(データ, エラーメッセージ) のどちらか一方がNone
+    """
+    try:
+        if archive_store.is_compact_file(filepath):
+            data = {"tasks": archive_store.read_archive_file(filepath)}
+        else:
+            data = load_backlog_file(filepath)
+    except FileNotFoundError:
+        return None, f"File not found: {filepath}"
     except json.JSONDecodeError as e:
-        print(f"Invalid JSON format in {filepath}: {e}")
-        return False
+        return None, f"Invalid JSON format in {filepath}: {e}"
+    except zipfile.BadZipFile as e:
+        return None, f"Invalid archive pack {filepath}: {e}"
 
     if not isinstance(data, dict) or "tasks" not in data:
-        print(f"Invalid format: {filepath} must contain a dictionary with 'tasks' key")
-        return False
+        return (
+            None,
+            f"Invalid format: {filepath} must contain a dictionary with 'tasks' key",
+        )
 
-    tasks = data["tasks"]
+    if not isinstance(data["tasks"], list):
+        return None, f"Invalid format: 'tasks' in {filepath} must be a list"
+    return data, None
 
-    # すべてのIDを収集
-    existing_ids = set()
-    for task in tasks:
-        _tid = task.get("id", None)
-        if _tid:
-            existing_ids.add(_tid)
-
-    if not isinstance(tasks, list):
-        print(f"Invalid format: 'tasks' in {filepath} must be a list")
-        return False
 
+def collect_errors(checked) -> List[str]:
+    """
+    タスクごとの検証結果にID重複のエラーを加え、タスク順に並べる
+    checked: (タスクまたはその要約, エラー) のリスト
+    """
     # IDの重複チェック用
     temp_ids = {}
     permanent_ids = {}
 
     all_errors = []
-    for i, task in enumerate(tasks):
+    for i, (task, errors) in enumerate(checked):
         if not isinstance(task, dict):
             all_errors.append(
                 f"{format_task_identifier(task)} - Task at index {i} must be a dictionary"
             )
             continue
 
-        # 個別タスクのバリデーション
-        errors = validate_task(task)
         if errors:
             all_errors.extend(errors)
 
@@ -446,23 +650,90 @@ def validate_tasks_json(filepath: str, fix: bool = False) -> bool:
             else:
                 permanent_ids[_pid] = task.get("title", "UNKNOWN")
 
-        # 無効なIDを修正
+    return all_errors
+
+
+def get_archived_ids(filepath: str) -> List[str]:
+    """ファイルと同じディレクトリの archive にあるタスクのIDと永続ID（archive_manifest）"""
+    archive_dir = os.path.join(os.path.dirname(os.path.abspath(filepath)), "archive")
+    return [
+        task_id
+        for task in iter_manifest_tasks(refresh_manifest(archive_dir))
+        for task_id in (task["id"], task["permanent_id"])
+        if task_id
+    ]
+
+
+def check_references(tasks: List[Any], archived_ids) -> List[str]:
+    """
+    依存関係の参照先の存在・自己参照・循環依存を検査する（task_graph）
+    アーカイブ済みタスクへの参照は有効とみなす
+    """
+    report = task_graph.check_dependencies(tasks, archived_ids)
+    errors = []
+    for position, dep_type, dep_id in report["dangling"]:
+        errors.append(
+            f"{format_task_identifier(tasks[position])} - {dep_type} dependency refers to unknown task: {dep_id}"
+        )
+    for position, dep_type in report["self_loops"]:
+        errors.append(
+            f"{format_task_identifier(tasks[position])} - {dep_type} dependency refers to itself"
+        )
+    for members, cycle in report["cycles"]:
+        labels = [task_graph.task_label(tasks[p]) for p in members]
+        path = " -> ".join(task_graph.task_label(tasks[p]) for p in cycle + cycle[:1])
+        errors.append(
+            f"Dependency cycle among {len(members)} tasks ({', '.join(labels)}): {path}"
+        )
+    return errors
+
+
+def validate_tasks_json(
+    filepath: str, fix: bool = False, use_cache: bool = True, check_refs: bool = False
+) -> bool:
+    """
+    Validate tasks.json structure and each task.
+    検証とID重複チェックを1回の走査で行う（fix時は先に repair_ids でIDを直す）
+    use_cache の場合、前回から変更のないタスクは validate_task を通さない（fix時は使わない）
+    check_refs の場合、依存関係の参照先と循環も検査する
+    戻り値：TrueならOK、Falseならエラーあり
+    """
+    checked = check_with_cache(filepath) if use_cache and not fix else None
+    data = None
+
+    if checked is None:
+        data, message = read_tasks_file(filepath)
+        if message:
+            print(message)
+            return False
+
+        tasks = data["tasks"]
+        fixed = False
         if fix:
-            if not is_valid_temp_id(_tid):
-                new_id = find_next_available_id(existing_ids)
-                task["id"] = new_id
-                print("fix ", _tid, new_id)
-                temp_ids[new_id] = task.get("title", "UNKNOWN")
-                existing_ids.add(new_id)
-                print(f"Fixed invalid ID for {format_task_identifier(task)}: {new_id}")
-
-    if fix:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        print(f"Fixed IDs saved to {filepath}")
-
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+            try:
+                fixed = repair_ids(tasks)
+            except ValueError as e:
+                print(f"Cannot fix IDs in {filepath}: {e}")
+                return False
+
+        # 個別タスクのバリデーション
+        checked = [
+            (task, _validate_task(task)) if isinstance(task, dict) else (task, None)
+            for task in tasks
+        ]
+
+        if fixed:
+            save_backlog_file(filepath, data)
+            print(f"Fixed IDs saved to {filepath}")
+
+    all_errors = collect_errors(checked)
+    if check_refs:
+        if data is None:
+            data, message = read_tasks_file(filepath)
+            if message:
+                print(message)
+                return False
+        all_errors.extend(check_references(data["tasks"], get_archived_ids(filepath)))
 
     if all_errors:
         print("Validation errors:")
@@ -470,59 +741,245 @@ def validate_tasks_json(filepath: str, fix: bool = False) -> bool:
             print(f"  - {err}")
         return False
 
-    if not isinstance(data, dict) or "tasks" not in data:
-        print(f"Invalid format: {filepath} must contain a dictionary with 'tasks' key")
-        return False
+    print(f"{filepath} is valid.")
+    return True
 
-    tasks = data["tasks"]
-    if not isinstance(tasks, list):
-        print(f"Invalid format: 'tasks' in {filepath} must be a list")
-        return False
 
+def validate_tasks_stream(
+    filepath: str, chunk_size: int = task_stream.CHUNK_SIZE
+) -> bool:
+    """
+    ファイル全体を読み込まずに、tasks 配列のタスクを読み終えた順に検証する
+    エラーは見つかった時点で行・列とともに表示する（ID重複チェックを含む）
+    メモリ使用量は読み込み単位と最大のタスク1件分（とIDの一覧）に収まる
+    戻り値：TrueならOK、Falseならエラーあり
+    """
     # IDの重複チェック用
     temp_ids = {}
     permanent_ids = {}
+    error_count = 0
 
-    all_errors = []
-    for i, task in enumerate(tasks):
-        if not isinstance(task, dict):
-            all_errors.append(
-                f"{format_task_identifier(task)} - Task at index {i} must be a dictionary"
-            )
-            continue
+    def report(line: int, column: int, err: str) -> None:
+        nonlocal error_count
+        if error_count == 0:
+            print("Validation errors:")
+        error_count += 1
+        print(f"  - line {line}, column {column}: {err}")
 
-        # 個別タスクのバリデーション
-        errors = validate_task(task)
-        if errors:
-            all_errors.extend(errors)
+    try:
+        for i, line, column, task in task_stream.iter_tasks(filepath, chunk_size):
+            if not isinstance(task, dict):
+                report(
+                    line,
+                    column,
+                    f"{format_task_identifier(task)} - Task at index {i} must be a dictionary",
+                )
+                continue
 
-        # IDの重複チェック (id, permanent_id)
-        _tid = task.get("id", None)
-        if _tid:
-            if _tid in temp_ids:
-                all_errors.append(
-                    f"Duplicate temporary ID: {_tid} (Task Names: {temp_ids[_tid]}, {format_task_identifier(task)})"
+            for err in _validate_task(task):
+                report(line, column, err)
+
+            _tid = task.get("id", None)
+            if _tid:
+                if _tid in temp_ids:
+                    report(
+                        line,
+                        column,
+                        f"Duplicate temporary ID: {_tid} (Task Names: {temp_ids[_tid]}, {format_task_identifier(task)})",
+                    )
+                else:
+                    temp_ids[_tid] = task.get("title", "UNKNOWN")
+
+            _pid = task.get("permanent_id", None)
+            if _pid:
+                if _pid in permanent_ids:
+                    report(
+                        line,
+                        column,
+                        f"Duplicate permanent ID: {_pid} (Task Names: {permanent_ids[_pid]}, {format_task_identifier(task)})",
+                    )
+                else:
+                    permanent_ids[_pid] = task.get("title", "UNKNOWN")
+    except FileNotFoundError:
+        print(f"File not found: {filepath}")
+        return False
+    except UnicodeDecodeError as e:
+        print(f"Invalid JSON format in {filepath}: {e}")
+        return False
+    except task_stream.StreamSyntaxError as e:
+        print(f"Invalid JSON format in {filepath}: {e}")
+        return False
+    except task_stream.StreamFormatError as e:
+        print(f"Invalid format in {filepath}: {e}")
+        return False
+
+    if error_count:
+        return False
+
+    print(f"{filepath} is valid.")
+    return True
+
+
+# ---------------------------------
+# 5. バックログとアーカイブの一括検証
+# ---------------------------------
+
+# ワーカープロセスごとの設定と、アーカイブ全体で共有する検証結果のキャッシュ
+_audit_settings = None
+_audit_cache: Dict[str, list] = {}
+
+
+def _load_audit_cache(cache_path: str, rules_version: str, use_cache: bool):
+    global _audit_settings, _audit_cache
+    _audit_settings = (cache_path, rules_version, use_cache)
+    _audit_cache = (
+        validation_cache.load_cache(cache_path, rules_version) if use_cache else {}
+    )
+
+
+def _init_audit_worker(cache_path: str, rules_version: str, use_cache: bool):
+    # forkしたプロセスは親が読み込んだキャッシュをそのまま使う
+    if _audit_settings != (cache_path, rules_version, use_cache):
+        _load_audit_cache(cache_path, rules_version, use_cache)
+
+
+def _audit_file(filepath: str):
+    """
+    1ファイルのタスクを検証する（ID重複チェックの前まで）
+    戻り値：((タスクの要約, エラー) のリスト, エラーメッセージ, 共有キャッシュのエントリ)
+    """
+    use_cache = _audit_settings[2]
+    checked = None
+    entries = {}
+    if use_cache and is_backlog_path(filepath):
+        # バックログは専用のキャッシュとジャーナルを使う
+        checked = check_with_cache(filepath)
+    elif use_cache and not archive_store.is_compact_file(filepath):
+        # セグメントとパックは正規の書式でないのでキャッシュを使わない
+        try:
+            with open(filepath, "rb") as f:
+                result = validation_cache.check_data(
+                    f.read(), _validate_task, _audit_cache
                 )
-            else:
-                temp_ids[_tid] = task.get("title", "UNKNOWN")
+        except FileNotFoundError:
+            result = None
+        if result is not None:
+            checked, entries = result
+
+    if checked is None:
+        data, message = read_tasks_file(filepath)
+        if message:
+            return None, message, {}
+        checked = [
+            (validation_cache.summarize_task(task), _validate_task(task))
+            if isinstance(task, dict)
+            else (task, None)
+            for task in data["tasks"]
+        ]
+    return checked, None, entries
+
+
+def validate_all(
+    backlog_path: str,
+    jobs: Optional[int] = None,
+    use_cache: bool = True,
+    check_refs: bool = False,
+) -> bool:
+    """
+    backlog.json と tasks/archive 内の全ファイルをプロセスプールで並列に検証し、
+    最後にファイルをまたいだチェック（アーカイブ済みタスクの一時IDの再利用、
+    永続IDの重複、check_refs の場合は依存関係の参照先と循環）を行う
+    戻り値：TrueならOK、Falseならエラーあり
+    """
+    tasks_dir = os.path.dirname(backlog_path)
+    archive_dir = os.path.join(tasks_dir, "archive")
+    files = [backlog_path] + archive_store.list_archive_files(archive_dir)
+
+    cache_path = validation_cache.get_cache_path(archive_dir)
+    initargs = (cache_path, get_rules_version(), use_cache)
+    _load_audit_cache(*initargs)
+    workers = min(jobs or os.cpu_count() or 1, len(files))
+    if workers == 1:
+        results = [_audit_file(filepath) for filepath in files]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_audit_worker, initargs=initargs
+        ) as executor:
+            chunksize = max(1, len(files) // (workers * 4))
+            results = list(executor.map(_audit_file, files, chunksize=chunksize))
+
+    success = True
+    task_count = 0
+    entries = {}
+    active_ids = {}
+    archived_ids = set()
+    permanent_ids = {}
+    cross_errors = []
+    for filepath, (checked, message, file_entries) in zip(files, results):
+        entries.update(file_entries)
+        name = os.path.relpath(filepath, tasks_dir)
+        if message:
+            print(message)
+            success = False
+            continue
 
-        _pid = task.get("permanent_id", None)
-        if _pid:
+        task_count += len(checked)
+        errors = collect_errors(checked)
+        if errors:
+            print(f"Validation errors in {name}:")
+            for err in errors:
+                print(f"  - {err}")
+            success = False
+
+        # ファイルをまたいだチェック（同じファイル内の重複は collect_errors で報告済み）
+        file_pids = set()
+        for task, _ in checked:
+            if not isinstance(task, dict):
+                continue
+            _tid = task.get("id", None)
+            if filepath == backlog_path:
+                if _tid:
+                    active_ids.setdefault(_tid, task.get("title", "UNKNOWN"))
+            elif _tid:
+                archived_ids.add(_tid)
+                if _tid in active_ids:
+                    cross_errors.append(
+                        f"Temporary ID {_tid} is used by both active and archived tasks (Active: {active_ids[_tid]}, Archived: {format_task_identifier(task)} in {name})"
+                    )
+
+            _pid = task.get("permanent_id", None)
+            if not _pid or _pid in file_pids:
+                continue
+            file_pids.add(_pid)
             if _pid in permanent_ids:
-                all_errors.append(
-                    f"Duplicate permanent ID: {_pid} (Task Names: {permanent_ids[_pid]}, {format_task_identifier(task)})"
+                first_name, first_title = permanent_ids[_pid]
+                cross_errors.append(
+                    f"Duplicate permanent ID across files: {_pid} ({first_name}: {first_title}, {name}: {format_task_identifier(task)})"
                 )
             else:
-                permanent_ids[_pid] = task.get("title", "UNKNOWN")
-
-    if all_errors:
-        print("Validation errors:")
-        for err in all_errors:
+                permanent_ids[_pid] = (name, task.get("title", "UNKNOWN"))
+
+    if use_cache and entries.keys() != _audit_cache.keys():
+        validation_cache.save_cache(cache_path, initargs[1], entries)
+
+    if check_refs and results[0][1] is None:
+        data, message = read_tasks_file(backlog_path)
+        if message:
+            print(message)
+            success = False
+        else:
+            cross_errors.extend(check_references(data["tasks"], archived_ids))
+
+    if cross_errors:
+        print("Cross-file errors:")
+        for err in cross_errors:
             print(f"  - {err}")
-        return False
+        success = False
 
-    print(f"{filepath} is valid.")
-    return True
+    print(f"Validated {len(files)} files ({task_count} tasks).")
+    if success:
+        print("All files are valid.")
+    return success
 
 
 def main():
@@ -533,8 +990,37 @@ def main():
     parser.add_argument(
         "filepath", nargs="?", default=None, help="Path to backlog.json"
     )
-    parser.add_argument("--fix", action="store_true", help="Fix invalid temporary IDs")
+    parser.add_argument(
+        "--fix", action="store_true", help="Fix invalid and duplicate temporary IDs"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Validate every task without using the validation cache",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Validate backlog.json and every file in tasks/archive in parallel",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="Number of worker processes for --all"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Validate tasks while reading the file, with line/column positions",
+    )
+    parser.add_argument(
+        "--check-refs",
+        action="store_true",
+        help="Check that dependencies point to existing tasks and contain no cycles",
+    )
     args = parser.parse_args()
+    if args.all and args.fix:
+        parser.error("--fix cannot be combined with --all")
+    if args.stream and (args.all or args.fix or args.check_refs):
+        parser.error("--stream cannot be combined with --all, --fix or --check-refs")
 
     if args.filepath is None:
         REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -546,7 +1032,25 @@ def main():
     else:
         filepath = args.filepath
 
-    success = validate_tasks_json(filepath, fix=args.fix)
+    if args.stream:
+        success = validate_tasks_stream(filepath)
+        sys.exit(0 if success else 1)
+
+    if args.all:
+        success = validate_all(
+            filepath,
+            jobs=args.jobs,
+            use_cache=not args.no_cache,
+            check_refs=args.check_refs,
+        )
+        sys.exit(0 if success else 1)
+
+    success = validate_tasks_json(
+        filepath,
+        fix=args.fix,
+        use_cache=not args.no_cache,
+        check_refs=args.check_refs,
+    )
     sys.exit(0 if success else 1)
 
 
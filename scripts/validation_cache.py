@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+検証結果のキャッシュ / Content-hash validation cache for validate_backlog.py
+
+各タスクの正規JSON（write_backlog_file と同じ indent=2 の書式）のハッシュをキーに、
+validate_task の結果とID重複チェックに必要な要約（id, permanent_id, title）を
+検証対象ファイルの隣の .<ファイル名>.validate_cache に保存します。
+正規の書式で書かれたファイルはタスクごとのバイト列に切り分けてハッシュするため、
+変更のないタスクはJSONとしてパースすることも validate_task を通すこともありません。
+Caches validate_task results and the summary needed for duplicate-ID checks
+(id, permanent_id, title), keyed by a hash of each task's canonical JSON
+(the indent=2 layout written by write_backlog_file), in
+.<file name>.validate_cache beside the validated file. Files in the canonical
+layout are sliced into per-task byte ranges and hashed directly, so
+unchanged tasks are neither parsed nor re-validated.
+
+- 検証ルール（validate_backlog.py）が変わるとキャッシュ全体が無効になる
+  Any change to the rules (validate_backlog.py) invalidates the whole cache
+- 正規の書式でないファイルではキャッシュを使わず、通常の検証を行う
+  Files not in the canonical layout fall back to the regular validation
+"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import backlog_journal
+
+CACHE_VERSION = 1
+
+# indent=2 の {"tasks": [...]} でタスク配列が占める範囲の目印
+# 文字列は改行を含まないため、インデント4の行はタスクの開始・終了だけになる
+_TASKS_KEY = b'\n  "tasks": '
+_TASKS_OPEN = b'\n  "tasks": [\n    {\n'
+_TASKS_CLOSE = b"\n    }\n  ]"
+_TASK_SEPARATOR = b"\n    },\n    {\n"
+
+SUMMARY_FIELDS = ("id", "permanent_id", "title")
+
+
+def get_cache_path(filepath: str) -> str:
+    directory, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, f".{name}.validate_cache")
+
+
+def canonical_task_text(task: Dict) -> bytes:
+    """タスク単体の正規JSON（ファイル内のタスクを4文字分字下げしたもの）"""
+    return json.dumps(task, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def task_key(text: bytes) -> str:
+    return hashlib.blake2b(text, digest_size=16).hexdigest()
+
+
+def summarize_task(task: Dict) -> Dict:
+    """ID重複チェックとエラー表示に使うフィールドだけを残す"""
+    return {field: task[field] for field in SUMMARY_FIELDS if field in task}
+
+
+def split_tasks(data: bytes) -> Optional[List[bytes]]:
+    """
+    正規の書式で書かれた {"tasks": [...]} から各タスクの正規JSONを切り出す
+    タスク以外の部分もJSONとして検証する。書式が違えばNone
+    """
+    if data.count(_TASKS_KEY) != 1:
+        return None
+    start = data.find(_TASKS_OPEN)
+    if start < 0:
+        return None
+    body_start = start + len(_TASKS_OPEN)
+    end = data.find(_TASKS_CLOSE, body_start)
+    if end < 0:
+        return None
+
+    # タスク配列を空にした残りの部分が {"tasks": []} の形であること
+    skeleton = data[:start] + b'\n  "tasks": []' + data[end + len(_TASKS_CLOSE) :]
+    try:
+        document = json.loads(skeleton)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(document, dict) or document.get("tasks") != []:
+        return None
+
+    return [
+        b"{" + (b"\n" + part).replace(b"\n    ", b"\n") + b"\n}"
+        for part in data[body_start:end].split(_TASK_SEPARATOR)
+    ]
+
+
+def load_cache(cache_path: str, rules_version: str) -> Dict[str, list]:
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if (
+                cache.get("version") == CACHE_VERSION
+                and cache.get("rules") == rules_version
+            ):
+                return cache["tasks"]
+        except (json.JSONDecodeError, KeyError):
+            pass
+    return {}
+
+
+def save_cache(cache_path: str, rules_version: str, entries: Dict[str, list]) -> None:
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": CACHE_VERSION, "rules": rules_version, "tasks": entries},
+            f,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+    os.replace(tmp_path, cache_path)
+
+
+def check_data(
+    data: bytes,
+    validate: Callable[[Dict], List[str]],
+    cached: Dict[str, list],
+    journal_records: Optional[List[Dict]] = None,
+) -> Optional[Tuple[List[Tuple[Dict, List[str]]], Dict[str, list]]]:
+    """
+    正規の書式のファイル内容をタスクごとに検証する（cached にあるタスクは検証しない）
+    journal_records を渡すと、その内容を反映したタスクリストとして検証する
+    戻り値：(タスクの要約とエラーの組のリスト, このファイルのキャッシュエントリ)
+    キャッシュを使えなければNone
+    """
+    texts = split_tasks(data)
+    if texts is None:
+        return None
+
+    entries: Dict[str, list] = {}
+
+    def check(text: bytes, task: Optional[Dict] = None) -> Optional[list]:
+        key = task_key(text)
+        entry = entries.get(key) or cached.get(key)
+        if entry is None:
+            if task is None:
+                # 切り出し位置がタスクの途中であれば括弧が釣り合わずパースに失敗する
+                try:
+                    task = json.loads(text)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    return None
+                if not isinstance(task, dict):
+                    return None
+            entry = [summarize_task(task), validate(task)]
+        entries[key] = entry
+        return entry
+
+    results = []
+    for text in texts:
+        entry = check(text)
+        if entry is None:
+            return None
+        results.append(entry)
+
+    if journal_records:
+        # backlog_journal.replay はidで位置を決めるので、要約をidと組にして再生する
+        records = []
+        for record in journal_records:
+            if record["op"] == "put":
+                task = record["task"]
+                if not isinstance(task, dict):
+                    return None
+                entry = check(canonical_task_text(task), task)
+                record = dict(record, task={"id": task.get("id"), "entry": entry})
+            records.append(record)
+        items = [{"id": entry[0].get("id"), "entry": entry} for entry in results]
+        replayed = backlog_journal.replay(items, records)
+        results = [item["entry"] for item in replayed]
+
+    return [(summary, errors) for summary, errors in results], entries
+
+
+def check_file(
+    filepath: str,
+    validate: Callable[[Dict], List[str]],
+    rules_version: str,
+    journal_records: Optional[List[Dict]] = None,
+) -> Optional[List[Tuple[Dict, List[str]]]]:
+    """
+    ファイル専用のキャッシュ（get_cache_path）を使って各タスクを検証する
+    戻り値：タスクの要約とエラーの組のリスト（タスク順）。キャッシュを使えなければNone
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    cache_path = get_cache_path(filepath)
+    cached = load_cache(cache_path, rules_version)
+    checked = check_data(data, validate, cached, journal_records)
+    if checked is None:
+        return None
+
+    results, entries = checked
+    if entries.keys() != cached.keys():
+        save_cache(cache_path, rules_version, entries)
+    return results
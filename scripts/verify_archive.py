@@ -1,47 +1,90 @@
 #!/usr/bin/env python3
+"""
+アーカイブ済みタスクの completion_time の検証 / Verify archived completion times
+
+指定したタスクをアーカイブから探し（archive_query.py の索引を使う）、
+completion_time が保持されていてISO 8601形式かを確認します。
+Looks up the given tasks in the archive through the archive_query.py
+index and checks that completion_time was preserved in ISO 8601 format.
+
+使用方法 / Usage:
+    python verify_archive.py [TASK_ID ...] [--date YYYY-MM-DD]
+
+- TASK_ID を省略すると、--date の日（省略時は今日）にアーカイブされたタスクをすべて検証する
+  Without TASK_IDs, every task archived on --date (default: today) is verified
+"""
+
+import argparse
 import json
-from datetime import datetime
 import os
+import sys
+from datetime import datetime
+
+
+def verify_task(task, record) -> bool:
+    label = task.get("id") or task.get("permanent_id")
+    print(f"Archived Task {label} verification results:")
+    print(json.dumps(task, indent=2, ensure_ascii=False))
+
+    # Verify completion_time format
+    completion_time = task.get("completion_time")
+    if not completion_time:
+        print("✗ completion_time field missing from archived task")
+        return False
+    try:
+        # Verify ISO 8601 format by parsing
+        datetime.fromisoformat(completion_time)
+    except (TypeError, ValueError) as e:
+        print(f"✗ Invalid ISO 8601 format in archive: {e}")
+        return False
+    print("\nArchived completion time validation:")
+    print(f"✓ completion_time preserved: {completion_time}")
+    print("✓ valid ISO 8601 format maintained")
+    print("✓ properly formatted as JSON string")
+    print(f"✓ found in archive file: {record['file']} ({record['date']})")
+    return True
+
 
 def verify_archived_completion_time():
     # Load environment variables
     from dotenv import load_dotenv
+    from archive_query import ArchiveIndex, load_tasks
+    from common_id_utils import get_backlog_path
+
     load_dotenv()
-    
-    # Get today's date in JST
-    archive_date = datetime.now().strftime("%Y-%m-%d")
-    REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_root = os.getenv("DATA_ROOT", os.path.join(os.path.dirname(REPO_ROOT), "ai_project_manager_data"))
-    archive_file = os.path.join(data_root, "tasks", "archive", f"{archive_date}.json")
-    
-    if not os.path.exists(archive_file):
-        print(f"Error: Archive file not found: {archive_file}")
-        return
-        
-    with open(archive_file, "r") as f:
-        data = json.load(f)
-        for task in data["tasks"]:
-            if task.get("id") == "T0026":
-                print("Archived Task T0026 verification results:")
-                print(json.dumps(task, indent=2, ensure_ascii=False))
-                
-                # Verify completion_time format
-                completion_time = task.get("completion_time")
-                if completion_time:
-                    try:
-                        # Verify ISO 8601 format by parsing
-                        datetime.fromisoformat(completion_time)
-                        print("\nArchived completion time validation:")
-                        print(f"✓ completion_time preserved: {completion_time}")
-                        print("✓ valid ISO 8601 format maintained")
-                        print("✓ properly formatted as JSON string")
-                        print(f"✓ found in correct archive file: {archive_date}.json")
-                    except ValueError as e:
-                        print(f"✗ Invalid ISO 8601 format in archive: {e}")
-                else:
-                    print("✗ completion_time field missing from archived task")
-                return
-        print("✗ Task T0026 not found in archive")
+
+    parser = argparse.ArgumentParser(description="Verify completion_time of archived tasks")
+    parser.add_argument("task_ids", nargs="*", help="Temporary or permanent IDs")
+    parser.add_argument("--date", help="Archive date (YYYY-MM-DD, default: today)")
+    args = parser.parse_args()
+
+    archive_dir = os.path.join(os.path.dirname(get_backlog_path()), "archive")
+    index = ArchiveIndex.load(archive_dir)
+    if args.task_ids:
+        records = index.find(ids=args.task_ids)
+        if args.date:
+            records = [r for r in records if r["date"] == args.date]
+    else:
+        archive_date = args.date or datetime.now().strftime("%Y-%m-%d")
+        records = [r for r in index.records if r["date"] == archive_date]
+        if not records:
+            print(f"✗ No tasks archived on {archive_date}")
+            sys.exit(1)
+
+    ok = True
+    found = set()
+    for record, task in zip(records, load_tasks(archive_dir, records)):
+        if task is None:
+            continue
+        found.update(value for value in (record["id"], record["permanent_id"]) if value)
+        ok = verify_task(task, record) and ok
+        print()
+    for task_id in args.task_ids:
+        if task_id not in found:
+            print(f"✗ Task {task_id} not found in archive")
+            ok = False
+    sys.exit(0 if ok else 1)
+
 
 if __name__ == "__main__":
     verify_archived_completion_time()
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import networkx as nx
-from graphviz import Digraph
 import json
 from typing import Dict, List, Optional
 import os
@@ -67,6 +66,9 @@ def create_task_graph(tasks: List[Dict]) -> nx.DiGraph:
 
 def visualize_task_graph(G: nx.DiGraph, output: str = "task_graph"):
     """グラフを可視化してファイルに出力"""
+    # graphviz は描画するときだけ必要（create_task_graph はなくても使える）
+    from graphviz import Digraph
+
     dot = Digraph("Tasks")
     dot.attr(rankdir="LR")  # 左から右へのレイアウト
 
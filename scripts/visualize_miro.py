@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 import requests
 import networkx as nx
 
+import task_graph
+
 load_dotenv()
 
 MIRO_ACCESS_TOKEN = os.getenv("MIRO_ACCESS_TOKEN")
@@ -131,7 +133,8 @@ class MiroVisualizer:
         
         # 循環依存のチェック
         if not nx.is_directed_acyclic_graph(G):
-            cycles = list(nx.simple_cycles(G))
+            # simple_cyclesは循環の数に比例して遅くなるため、成分ごとに最短の循環だけを示す
+            cycles = task_graph.find_cycles(tasks)
             raise ValueError(f"循環依存が検出されました: {cycles}")
             
         positions = self.calculate_positions(G)
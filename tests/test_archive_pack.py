@@ -0,0 +1,80 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+import archive_pack
+
+
+def _write_daily(archive_dir, date, tasks):
+    path = archive_dir / f"{date}.json"
+    path.write_text(json.dumps({"tasks": tasks}, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    directory = tmp_path / "archive"
+    directory.mkdir()
+    _write_daily(
+        directory,
+        "2026-01-05",
+        [
+            {"id": "T0001", "permanent_id": "P1", "title": "一つ目", "completion_time": "2026-01-05T09:00:00", "labels": ["a"]},
+            {"id": "T0002", "title": "二つ目", "completion_time": "2026-01-05T18:00:00", "labels": ["b"]},
+        ],
+    )
+    _write_daily(directory, "2026-01-20", [{"id": "T0003", "title": "三つ目", "completion_time": "2026-01-20T12:00:00"}])
+    # 締まっていない月はまとめない
+    _write_daily(directory, "2026-02-01", [{"id": "T0004", "title": "四つ目"}])
+    return directory
+
+
+def test_compact_packs_closed_months_and_round_trips(archive_dir):
+    originals = {
+        name: json.loads((archive_dir / name).read_text(encoding="utf-8"))["tasks"]
+        for name in ["2026-01-05.json", "2026-01-20.json"]
+    }
+    assert archive_pack.compact_archive(str(archive_dir), "2026-02") == [("2026-01", 2, 3)]
+
+    pack_path = archive_pack.get_pack_path(str(archive_dir), "2026-01")
+    assert archive_pack.list_packs(str(archive_dir)) == [pack_path]
+    assert sorted(os.listdir(archive_dir)) == ["2026-02-01.json", "pack-2026-01.zip"]
+
+    index = archive_pack.read_index(pack_path)
+    assert index["month"] == "2026-01"
+    assert index["count"] == 3
+    assert index["completion_time"] == ["2026-01-05T09:00:00", "2026-01-20T12:00:00"]
+    assert index["labels"] == ["a", "b"]
+    day = index["members"]["2026-01-05.json"]
+    assert day["count"] == 2
+    assert day["completion_time"] == ["2026-01-05T09:00:00", "2026-01-05T18:00:00"]
+    assert [(task["id"], task["permanent_id"], task["title"]) for task in day["tasks"]] == [
+        ("T0001", "P1", "一つ目"),
+        ("T0002", None, "二つ目"),
+    ]
+
+    assert archive_pack.read_pack(pack_path) == originals
+    assert list(archive_pack.iter_pack(pack_path, ["2026-01-20"])) == [("2026-01-20", originals["2026-01-20.json"][0])]
+    with zipfile.ZipFile(pack_path) as pack:
+        assert pack.getinfo("2026-01-05.json").compress_type == zipfile.ZIP_LZMA
+
+
+def test_later_daily_files_are_merged_without_duplicates(archive_dir):
+    archive_pack.compact_archive(str(archive_dir), "2026-02")
+    late = {"id": "T0005", "title": "遅れて追加", "completion_time": "2026-01-05T20:00:00"}
+    # 前回の中断で残った既存タスクと、新しいタスク
+    _write_daily(archive_dir, "2026-01-05", [{"id": "T0002", "title": "二つ目", "completion_time": "2026-01-05T18:00:00", "labels": ["b"]}, late])
+
+    assert archive_pack.compact_archive(str(archive_dir), "2026-02") == [("2026-01", 1, 4)]
+    members = archive_pack.read_pack(archive_pack.get_pack_path(str(archive_dir), "2026-01"))
+    assert [task["id"] for task in members["2026-01-05.json"]] == ["T0001", "T0002", "T0005"]
+
+
+def test_daily_files_survive_failed_verification(archive_dir, monkeypatch):
+    monkeypatch.setattr(zipfile.ZipFile, "testzip", lambda self: "2026-01-05.json")
+    with pytest.raises(ValueError, match="Pack verification failed"):
+        archive_pack.compact_archive(str(archive_dir), "2026-02")
+    assert (archive_dir / "2026-01-05.json").exists()
+    assert (archive_dir / "2026-01-20.json").exists()
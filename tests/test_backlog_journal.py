@@ -0,0 +1,131 @@
+import json
+import os
+
+import pytest
+
+import backlog_journal
+import common_id_utils
+
+
+def _task(task_id, title="t"):
+    return {"id": task_id, "title": title}
+
+
+@pytest.fixture
+def backlog_path(tmp_path, monkeypatch):
+    (tmp_path / "tasks").mkdir()
+    path = tmp_path / "tasks" / "backlog.json"
+    path.write_text(json.dumps({"tasks": [_task("T0001"), _task("T0002"), _task("T0003")]}), encoding="utf-8")
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("BACKLOG_STORAGE", "journal")
+    monkeypatch.setenv("SIMILAR_TASKS", "manual")
+    yield str(path)
+    backlog_journal.drop_snapshot(str(path))
+
+
+def _file_ids(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [task["id"] for task in json.load(f)["tasks"]]
+
+
+def test_replay_replaces_in_place_appends_and_deletes():
+    tasks = [_task("T0001"), _task("T0002"), _task("T0003")]
+    records = [
+        {"op": "put", "id": "T0002", "task": _task("T0002", "changed")},
+        {"op": "put", "id": "T0004", "task": _task("T0004")},
+        {"op": "del", "id": "T0001"},
+        {"op": "del", "id": "T0009"},
+        {"op": "put", "id": "T0001", "task": _task("T0001", "again")},
+    ]
+    result = backlog_journal.replay(tasks, records)
+    assert [(task["id"], task["title"]) for task in result] == [
+        ("T0002", "changed"),
+        ("T0003", "t"),
+        ("T0004", "t"),
+        ("T0001", "again"),
+    ]
+    # 元のリストは変えない
+    assert [task["id"] for task in tasks] == ["T0001", "T0002", "T0003"]
+
+    with pytest.raises(ValueError, match="Unknown journal op"):
+        backlog_journal.replay(tasks, [{"op": "move", "id": "T0001"}])
+
+
+def test_save_appends_only_changed_tasks_and_load_replays(backlog_path):
+    tasks = common_id_utils.load_tasks()
+    tasks[1] = _task("T0002", "changed")
+    del tasks[2]
+    tasks.append(_task("T0004"))
+    common_id_utils.save_tasks(tasks)
+
+    assert backlog_journal.read_journal(backlog_path) == [
+        {"op": "put", "id": "T0002", "task": _task("T0002", "changed")},
+        {"op": "put", "id": "T0004", "task": _task("T0004")},
+        {"op": "del", "id": "T0003"},
+    ]
+    # backlog.json 自体はまだ書き換えていない
+    assert _file_ids(backlog_path) == ["T0001", "T0002", "T0003"]
+    assert common_id_utils.load_tasks() == [_task("T0001"), _task("T0002", "changed"), _task("T0004")]
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda tasks: tasks.reverse(),
+        lambda tasks: tasks.append(_task("T0001", "duplicate")),
+        lambda tasks: tasks.append({"title": "no id"}),
+    ],
+    ids=["reordered", "duplicate-id", "missing-id"],
+)
+def test_diff_falls_back_to_full_write(backlog_path, change):
+    tasks = common_id_utils.load_tasks()
+    change(tasks)
+    assert backlog_journal.diff_tasks(backlog_path, tasks) is None
+
+    common_id_utils.save_tasks(tasks)
+    assert not os.path.exists(backlog_journal.get_journal_path(backlog_path))
+    with open(backlog_path, "r", encoding="utf-8") as f:
+        assert json.load(f)["tasks"] == tasks
+
+
+def test_diff_needs_a_snapshot(backlog_path):
+    assert backlog_journal.diff_tasks(backlog_path, [_task("T0001")]) is None
+
+
+def test_torn_tail_is_ignored(backlog_path):
+    journal_path = backlog_journal.get_journal_path(backlog_path)
+    complete = {"op": "put", "id": "T0002", "task": _task("T0002", "changed")}
+    with open(journal_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(complete) + "\n")
+        f.write('{"op": "del", "id": "T00')
+
+    assert backlog_journal.read_journal(backlog_path) == [complete]
+    assert [task["title"] for task in common_id_utils.load_tasks()] == ["t", "changed", "t"]
+
+
+def test_compaction_folds_journal_into_backlog(backlog_path):
+    tasks = common_id_utils.load_tasks()
+    tasks[0] = _task("T0001", "changed")
+    common_id_utils.save_tasks(tasks)
+    journal_path = backlog_journal.get_journal_path(backlog_path)
+    assert os.path.exists(journal_path)
+
+    common_id_utils.compact_backlog()
+    assert not os.path.exists(journal_path)
+    with open(backlog_path, "r", encoding="utf-8") as f:
+        assert json.load(f)["tasks"][0]["title"] == "changed"
+
+
+def test_save_compacts_once_journal_exceeds_limit(backlog_path, monkeypatch):
+    monkeypatch.setattr(backlog_journal, "JOURNAL_MAX_BYTES", 10)
+    tasks = common_id_utils.load_tasks()
+    tasks[0] = _task("T0001", "first")
+    common_id_utils.save_tasks(tasks)
+    journal_path = backlog_journal.get_journal_path(backlog_path)
+    assert backlog_journal.needs_compaction(backlog_path)
+
+    tasks[1] = _task("T0002", "second")
+    common_id_utils.save_tasks(tasks)
+    assert not os.path.exists(journal_path)
+    with open(backlog_path, "r", encoding="utf-8") as f:
+        assert [task["title"] for task in json.load(f)["tasks"]] == ["first", "second", "t"]
@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+import backlog_sqlite
+
+
+def _write(path, tasks, mtime_ns=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"tasks": tasks}, f)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def paths(tmp_path):
+    json_path = str(tmp_path / "backlog.json")
+    _write(json_path, [{"id": "T0001", "title": "a"}], mtime_ns=10**18)
+    return json_path, backlog_sqlite.get_db_path(json_path)
+
+
+def _ids(db_path):
+    return [task["id"] for task in backlog_sqlite.load_backlog(db_path)["tasks"]]
+
+
+def test_external_change_is_reimported(paths):
+    json_path, db_path = paths
+    assert backlog_sqlite.sync_from_json(db_path, json_path) is True
+    assert backlog_sqlite.sync_from_json(db_path, json_path) is False
+
+    _write(json_path, [{"id": "T0001", "title": "a"}, {"id": "T0002", "title": "b"}], 2 * 10**18)
+    assert backlog_sqlite.sync_from_json(db_path, json_path) is True
+    assert _ids(db_path) == ["T0001", "T0002"]
+
+
+def test_external_change_with_unexported_changes_is_refused(paths):
+    json_path, db_path = paths
+    backlog_sqlite.sync_from_json(db_path, json_path)
+    backlog_sqlite.put_tasks(db_path, [{"id": "T0003", "title": "c"}])
+
+    _write(json_path, [{"id": "T0002", "title": "b"}], 2 * 10**18)
+    with pytest.raises(ValueError):
+        backlog_sqlite.sync_from_json(db_path, json_path)
+    assert _ids(db_path) == ["T0001", "T0003"]
+
+
+def test_export_is_not_an_external_change(paths):
+    json_path, db_path = paths
+    backlog_sqlite.sync_from_json(db_path, json_path)
+    backlog_sqlite.put_tasks(db_path, [{"id": "T0003", "title": "c"}])
+    backlog_sqlite.export_json(db_path, json_path)
+    assert backlog_sqlite.sync_from_json(db_path, json_path) is False
+    assert _ids(db_path) == ["T0001", "T0003"]
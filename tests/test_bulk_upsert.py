@@ -0,0 +1,156 @@
+import io
+import json
+import sys
+
+import pytest
+
+import bulk_upsert
+from bulk_upsert import BulkUpsert, upsert
+from manage_4digit_ids import IdRegistry
+from task_stream import iter_records
+
+UUID1 = "11111111-1111-4111-8111-111111111111"
+UUID2 = "22222222-2222-4222-8222-222222222222"
+
+
+def _task(task_id, permanent_id, title, **extra):
+    return dict({"id": task_id, "permanent_id": permanent_id, "title": title, "description": "d", "status": "Open"}, **extra)
+
+
+def _tasks():
+    return [_task("T0001", UUID1, "a", priority="high"), _task("T0003", UUID2, "b")]
+
+
+def _run(tasks, mode, lines, registry=None):
+    bulk = BulkUpsert(tasks, mode, registry)
+    for index, line, _column, record in iter_records(io.StringIO("\n".join(json.dumps(r) for r in lines))):
+        bulk.apply(index, line, record)
+    bulk.finish()
+    return bulk
+
+
+def _statuses(bulk):
+    return [(outcome["status"], outcome["message"]) for outcome in bulk.outcomes]
+
+
+def test_update_by_id_or_permanent_id_and_null_deletes():
+    tasks = _tasks()
+    original = tasks[0]
+    bulk = _run(
+        tasks,
+        "update",
+        [
+            {"id": "t1", "title": "renamed", "priority": None},
+            {"permanent_id": UUID2.upper(), "title": "b"},
+            {"id": "T0009", "title": "x"},
+        ],
+    )
+    assert _statuses(bulk) == [("updated", ""), ("unchanged", ""), ("error", "task not found: id T0009")]
+    assert tasks[0] == _task("T0001", UUID1, "renamed")
+    # 元のタスクは書き換えない
+    assert original["title"] == "a" and original["priority"] == "high"
+    assert len(tasks) == 2
+
+
+def test_update_rejects_new_validation_errors():
+    tasks = _tasks()
+    bulk = _run(tasks, "update", [{"id": "T0001", "status": "Bogus"}, {"id": "T0003", "title": "ok"}])
+    assert bulk.outcomes[0]["status"] == "error"
+    assert "invalid status" in bulk.outcomes[0]["message"]
+    assert tasks[0]["status"] == "Open" and tasks[1]["title"] == "ok"
+
+
+def test_update_reports_conflicting_and_duplicate_keys():
+    tasks = _tasks() + [_task("T0003", "33333333-3333-4333-8333-333333333333", "c")]
+    bulk = _run(tasks, "update", [{"id": "T0001", "permanent_id": UUID2}, {"id": "T0003", "title": "x"}])
+    assert _statuses(bulk) == [
+        ("error", f"id T0001, permanent_id {UUID2} refer to different tasks"),
+        ("error", "id T0003 matches 2 tasks"),
+    ]
+
+
+def test_insert_rejects_existing_and_archived_ids():
+    tasks = _tasks()
+    registry = IdRegistry({"T0001", "T0003", "T0002"}, {})
+    bulk = _run(
+        tasks,
+        "insert",
+        [
+            {"id": "T0001", "title": "x", "description": "d"},
+            {"id": "T0002", "title": "x", "description": "d"},
+            {"id": "TXYZ", "title": "x", "description": "d"},
+            {"id": "T0005", "title": "new", "description": "d"},
+        ],
+        registry,
+    )
+    assert _statuses(bulk) == [
+        ("error", "task already exists"),
+        ("error", "id T0002 is already used (archived task)"),
+        ("error", "invalid id TXYZ (must be T0001-T9999)"),
+        ("created", ""),
+    ]
+    assert tasks[2]["id"] == "T0005" and tasks[2]["status"] == "Open"
+    assert "T0005" in registry.used_ids
+
+
+def test_upsert_allocates_ids_in_one_batch():
+    tasks = _tasks()
+    registry = IdRegistry({"T0001", "T0002", "T0003"}, {})
+    bulk = _run(
+        tasks,
+        "upsert",
+        [
+            {"title": "first", "description": "d"},
+            {"id": "T0001", "title": "updated"},
+            {"title": "second", "description": "d"},
+        ],
+        registry,
+    )
+    assert [outcome["status"] for outcome in bulk.outcomes] == ["created", "updated", "created"]
+    assert [task["id"] for task in tasks] == ["T0001", "T0003", "T0004", "T0005"]
+    assert tasks[0]["title"] == "updated"
+    assert bulk.counts() == {"created": 2, "updated": 1, "unchanged": 0, "error": 0}
+    assert not bulk.warnings
+
+
+def test_upsert_keeps_tasks_without_id_when_ids_run_out():
+    tasks = _tasks()
+    registry = IdRegistry({f"T{n:04d}" for n in range(1, 10000) if n != 9999}, {})
+    bulk = _run(tasks, "upsert", [{"title": "x", "description": "d"}, {"title": "y", "description": "d"}], registry)
+    assert [task["id"] for task in tasks[2:]] == ["T9999", ""]
+    assert len(bulk.warnings) == 1
+
+
+def test_upsert_marks_backlog_ids_used(monkeypatch):
+    monkeypatch.setattr(IdRegistry, "snapshot", classmethod(lambda cls: cls(set(), {})))
+    tasks = [_task("T0001", UUID1, "a")]
+    upsert(iter_records(io.StringIO(json.dumps({"title": "x", "description": "d"}))), tasks, "upsert")
+    assert tasks[1]["id"] == "T0002"
+
+
+@pytest.fixture
+def backlog_path(tmp_path, monkeypatch):
+    (tmp_path / "tasks").mkdir()
+    path = tmp_path / "tasks" / "backlog.json"
+    path.write_text(json.dumps({"tasks": _tasks()}), encoding="utf-8")
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("BACKLOG_STORAGE", "json")
+    monkeypatch.setenv("SIMILAR_TASKS", "manual")
+    return path
+
+
+@pytest.mark.parametrize(
+    "text",
+    ['{"id": "T0001", "title": "x"}\n{"id": "T0003", "title": ', '[{"id": "T0001", "title": "x"} {"id": "T0003"}]'],
+    ids=["truncated", "missing-comma"],
+)
+def test_malformed_stream_saves_nothing(backlog_path, tmp_path, monkeypatch, capsys, text):
+    before = backlog_path.read_bytes()
+    source = tmp_path / "records.jsonl"
+    source.write_text(text, encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["update_tasks.py", "--mode", "update", str(source)])
+    with pytest.raises(SystemExit) as exc:
+        bulk_upsert.main()
+    assert exc.value.code == 1
+    assert "何も保存しませんでした" in capsys.readouterr().out
+    assert backlog_path.read_bytes() == before
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+import common_id_utils
+
+
+@pytest.fixture
+def backlog_path(tmp_path, monkeypatch):
+    (tmp_path / "tasks").mkdir()
+    path = tmp_path / "tasks" / "backlog.json"
+    path.write_text(json.dumps({"tasks": [{"id": "T0001", "title": "a"}]}), encoding="utf-8")
+    monkeypatch.setenv("DATA_ROOT", str(tmp_path))
+    monkeypatch.setenv("SIMILAR_TASKS", "manual")
+    return str(path)
+
+
+@pytest.mark.parametrize("mode", ["json", "journal", "sqlite"])
+def test_top_level_members_survive_saves(backlog_path, monkeypatch, mode):
+    monkeypatch.setenv("BACKLOG_STORAGE", mode)
+    backlog = common_id_utils.load_backlog_file(backlog_path)
+    backlog["meta"] = {"version": 1}
+    common_id_utils.save_backlog_file(backlog_path, backlog)
+    assert common_id_utils.load_backlog()["meta"] == {"version": 1}
+
+    # tasks だけの保存でも残る
+    tasks = common_id_utils.load_tasks()
+    tasks.append({"id": "T0002", "title": "b"})
+    common_id_utils.save_tasks(tasks)
+    common_id_utils.compact_backlog()
+    with open(backlog_path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["meta"] == {"version": 1}
+    assert [task["id"] for task in saved["tasks"]] == ["T0001", "T0002"]
@@ -0,0 +1,79 @@
+import json
+
+import dependency_index
+from dependency_index import DependencyIndex
+
+
+def _task(task_id, status="open", requires=(), permanent_id=""):
+    return {
+        "id": task_id,
+        "permanent_id": permanent_id,
+        "title": task_id,
+        "status": status,
+        "dependencies": {"must": [{"task_id": t, "reason": "r"} for t in requires]},
+    }
+
+
+def _state(index):
+    entries = sorted(json.dumps(entry, sort_keys=True) for entry in index.entries.values())
+    dependents = {
+        target: sorted(json.dumps(index.entries[k], sort_keys=True) for k in keys)
+        for target, keys in index.dependents.items()
+    }
+    return entries, dependents
+
+
+def test_tasks_sharing_an_id_are_kept_separately():
+    first = _task("T0001", requires=["T0005"])
+    second = _task("T0001", requires=["T0006"])
+    index = DependencyIndex.from_tasks([first, second])
+    assert len(index.entries) == 2
+
+    index.remove(second)
+    assert [entry["requires"] for entry in index.entries.values()] == [["T0005"]]
+    assert "T0006" not in index.dependents
+    assert index.aliases["T0001"] == list(index.entries)
+
+
+def test_shared_reference_is_done_only_when_every_match_is_done():
+    tasks = [_task("T0001", "Done"), _task("T0001"), _task("T0002", requires=["T0001"])]
+    index = DependencyIndex.from_tasks(tasks)
+    assert not index.is_done("T0001")
+    index.update(tasks[1], dict(tasks[1], status="Done"))
+    assert index.is_done("T0001")
+
+
+def test_apply_changes_matches_rebuild():
+    before = [
+        _task("T0001"),
+        _task("T0002", requires=["T0001"]),
+        _task("T0003", requires=["T0001", "T0002"]),
+        _task("T0003", requires=["T0002"]),
+    ]
+    after = list(before)
+    after[1] = dict(before[1], dependencies={"must": [{"task_id": "T0004", "reason": "r"}]})
+    del after[2]
+    after.append(_task("T0004", requires=["T0003"], permanent_id="P4"))
+
+    index = DependencyIndex.from_tasks(before)
+    index.apply_changes(before, after)
+    assert _state(index) == _state(DependencyIndex.from_tasks(after))
+
+
+def test_saved_index_is_reused_after_a_writer_updates_it(tmp_path, monkeypatch):
+    backlog_path = str(tmp_path / "backlog.json")
+    before = [_task("T0001"), _task("T0002", requires=["T0001"])]
+    with open(backlog_path, "w", encoding="utf-8") as f:
+        json.dump({"tasks": before}, f)
+    index = dependency_index.load_index(backlog_path, before)
+
+    after = [before[0], _task("T0002"), _task("T0003", requires=["T0002"])]
+    with open(backlog_path, "w", encoding="utf-8") as f:
+        json.dump({"tasks": after}, f)
+    index.apply_changes(before, after)
+    dependency_index.save_index(backlog_path, index)
+
+    # 作り直さずに保存した索引を使う
+    monkeypatch.setattr(DependencyIndex, "from_tasks", None)
+    loaded = dependency_index.load_index(backlog_path, after)
+    assert _state(loaded) == _state(index)
@@ -0,0 +1,14 @@
+import pytest
+
+from id_allocator import IdAllocator
+
+
+@pytest.mark.parametrize("task_id", ["T0001\n", "T０００１", "t0001", "T00001", "T001", None])
+def test_parse_rejects_malformed_ids(task_id):
+    assert IdAllocator.parse(task_id) == -1
+
+
+def test_malformed_ids_do_not_mark_numbers_used():
+    allocator = IdAllocator.from_ids(["T0001", "T0002\n", "T０００２"])
+    assert IdAllocator.parse("T0042") == 42
+    assert allocator.next() == "T0002"
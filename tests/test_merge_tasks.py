@@ -0,0 +1,17 @@
+from manage_4digit_ids import IdRegistry
+from merge_tasks import merge_into
+
+
+def test_merged_task_does_not_reuse_archived_id():
+    tasks = [
+        {"id": "T0001", "title": "a", "status": "open", "description": "x"},
+        {"id": "T0003", "title": "b", "status": "open", "description": "y"},
+        {"id": "T0004", "title": "c", "status": "open", "description": "z",
+         "dependencies": {"must": [{"task_id": "T0001", "reason": "r"}]}},
+    ]
+    # T0002 はアーカイブで使用中
+    registry = IdRegistry({"T0002"}, {})
+    merged = merge_into(tasks, [0, 1], registry=registry)
+    assert merged["task"]["id"] == "T0005"
+    assert [task["id"] for task in tasks] == ["T0004", "T0005"]
+    assert tasks[0]["dependencies"]["must"][0]["task_id"] == "T0005"
@@ -0,0 +1,38 @@
+import pytest
+
+from patch_engine import PatchError, apply_patch
+
+
+def test_ambiguous_id_fails_whole_patch():
+    backlog = {"tasks": [{"id": "T0001", "permanent_id": "P", "s": 1}, {"id": "T0001", "s": 1}]}
+    patch = [
+        {"op": "replace", "path": "/tasks/@P/s", "value": 2},
+        {"op": "replace", "path": "/tasks/@T0001/s", "value": 2},
+    ]
+    with pytest.raises(PatchError, match="Ambiguous @ID"):
+        apply_patch(backlog, patch)
+    assert [task["s"] for task in backlog["tasks"]] == [1, 1]
+
+
+def test_permanent_id_matching_another_tasks_id_is_ambiguous():
+    backlog = {"tasks": [{"id": "T0001"}, {"id": "T0002", "permanent_id": "T0001"}]}
+    with pytest.raises(PatchError, match="Ambiguous @ID"):
+        apply_patch(backlog, [{"op": "remove", "path": "/tasks/@T0001"}])
+
+
+def test_id_becomes_unique_after_rename_in_same_patch():
+    backlog = {"tasks": [{"id": "T0001", "permanent_id": "P"}, {"id": "T0001", "s": 1}]}
+    patched = apply_patch(
+        backlog,
+        [
+            {"op": "replace", "path": "/tasks/@P/id", "value": "T0009"},
+            {"op": "replace", "path": "/tasks/@T0001/s", "value": 2},
+        ],
+    )
+    assert patched["tasks"] == [{"id": "T0009", "permanent_id": "P"}, {"id": "T0001", "s": 2}]
+
+
+def test_same_id_and_permanent_id_is_one_match():
+    backlog = {"tasks": [{"id": "T0001", "permanent_id": "T0001", "s": 1}]}
+    patched = apply_patch(backlog, [{"op": "replace", "path": "/tasks/@T0001/s", "value": 2}])
+    assert patched["tasks"][0]["s"] == 2
@@ -0,0 +1,84 @@
+import pytest
+
+from patch_engine import apply_patch
+from patch_log import diff_tasks, read_log, record
+
+
+def _roundtrip(before, after, partial=False):
+    forward, inverse = diff_tasks(before, after, partial)
+    assert apply_patch({"tasks": before}, forward)["tasks"] == after
+    assert apply_patch({"tasks": after}, inverse)["tasks"] == before
+    return forward, inverse
+
+
+def test_key_shared_with_another_tasks_id_is_not_used():
+    # 2番目のタスクの id が1番目のタスクの id と同じ
+    before = [{"id": "T0001", "permanent_id": "P", "s": 1}, {"id": "T0001", "s": 1}]
+    after = [{"id": "T0001", "permanent_id": "P", "s": 1}, {"id": "T0001", "s": 2}]
+    forward, inverse = _roundtrip(before, after)
+    assert not any(op["path"].startswith("/tasks/@T0001") for op in forward + inverse)
+
+
+def test_permanent_id_equal_to_another_tasks_id():
+    before = [{"id": "T0001", "s": 1}, {"id": "T0002", "permanent_id": "T0001", "s": 1}]
+    after = [{"id": "T0001", "s": 2}, {"id": "T0002", "permanent_id": "T0001", "s": 1}]
+    _roundtrip(before, after)
+
+
+def test_unique_keys_use_id_paths():
+    before = [{"id": "T0001", "s": 1}, {"id": "T0002", "permanent_id": "P2", "s": 1}]
+    after = [{"id": "T0001", "s": 1}, {"id": "T0002", "permanent_id": "P2", "s": 2}]
+    forward, _ = _roundtrip(before, after)
+    assert forward == [{"op": "replace", "path": "/tasks/@P2/s", "value": 2}]
+
+
+def test_partial_refuses_shared_keys():
+    before = [{"id": "T0001", "s": 1}, {"id": "T0001", "s": 1}]
+    after = [{"id": "T0001", "s": 2}, {"id": "T0001", "s": 1}]
+    with pytest.raises(ValueError):
+        diff_tasks(before, after, partial=True)
+
+
+DUPLICATES = [
+    {"id": "T0001", "title": "a"},
+    {"id": "T9998", "title": "x"},
+    {"id": "T9998", "title": "y"},
+    {"id": "T9998", "title": "z"},
+    {"id": "", "title": "temp"},
+    {"id": "T0002", "title": "b"},
+]
+
+
+def test_duplicate_ids_without_changes_make_no_patch(tmp_path):
+    before = [dict(task) for task in DUPLICATES]
+    after = [dict(task) for task in DUPLICATES]
+    assert diff_tasks(before, after) == ([], [])
+    assert record(str(tmp_path / "backlog.json"), "test", before, after) is None
+    assert read_log(str(tmp_path / "backlog.json")) == []
+
+
+def test_duplicate_ids_stay_in_place_when_another_task_changes():
+    before = [dict(task) for task in DUPLICATES]
+    after = [dict(task) for task in DUPLICATES]
+    after[0]["title"] = "changed"
+    forward, _ = _roundtrip(before, after)
+    assert forward == [{"op": "replace", "path": "/tasks/@T0001/title", "value": "changed"}]
+
+
+def test_appending_to_duplicate_ids_adds_one_task():
+    before = [dict(task) for task in DUPLICATES]
+    after = before + [{"id": "T0003", "title": "new"}]
+    forward, inverse = _roundtrip(before, after)
+    assert forward == [{"op": "add", "path": "/tasks/6", "value": after[6]}]
+    assert inverse == [{"op": "remove", "path": "/tasks/@T0003"}]
+
+
+def test_one_of_duplicate_ids_changes():
+    before = [dict(task) for task in DUPLICATES]
+    after = [dict(task) for task in DUPLICATES]
+    after[2]["title"] = "changed"
+    forward, _ = _roundtrip(before, after)
+    assert forward == [
+        {"op": "remove", "path": "/tasks/2"},
+        {"op": "add", "path": "/tasks/2", "value": after[2]},
+    ]
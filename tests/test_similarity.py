@@ -0,0 +1,109 @@
+import similarity
+import similarity_index
+
+
+def _task(task_id, title, description="", **extra):
+    return dict({"id": task_id, "title": title, "description": description}, **extra)
+
+
+TEXT = "バックログの保存を高速化する 差分だけを書き出して保存時間を短くする"
+
+
+def _duplicates():
+    return [
+        _task("T0001", TEXT),
+        _task("T0001", TEXT),
+        _task("T0002", TEXT),
+        _task("T0003", "まったく別の話題 請求書のPDFを作る"),
+    ]
+
+
+def _references(task):
+    return [entry["task_id"] for entry in task.get("similar_tasks", [])]
+
+
+def test_detect_keys_results_by_position_and_skips_own_id():
+    tasks = _duplicates()
+    similar = similarity.detect_similar_tasks(tasks)
+    assert set(similar) == {0, 1, 2}
+    assert [entry["task_id"] for entry in similar[0]] == ["T0002"]
+    assert [entry["task_id"] for entry in similar[1]] == ["T0002"]
+    # 同じIDのタスクは1件として数える
+    assert [entry["task_id"] for entry in similar[2]] == ["T0001"]
+
+    assert similarity.apply_similar_tasks(tasks, similar) == 3
+    assert [_references(task) for task in tasks] == [["T0002"], ["T0002"], ["T0001"], []]
+
+
+def test_apply_only_touches_given_positions():
+    tasks = _duplicates()
+    original = list(tasks)
+    similar = similarity.detect_similar_tasks(tasks)
+    assert similarity.apply_similar_tasks(tasks, similar, [1]) == 1
+    assert tasks[0] is original[0] and "similar_tasks" not in original[1]
+    assert _references(tasks[1]) == ["T0002"]
+
+
+def test_index_keeps_duplicate_ids_in_separate_rows():
+    tasks = _duplicates()
+    index, changed = similarity_index.rebuild(tasks)
+    assert changed == 3
+    assert sorted(index.positions) == ["T0001", "T0001\0" + "1", "T0002", "T0003"]
+    assert [_references(task) for task in tasks] == [["T0002"], ["T0002"], ["T0001"], []]
+
+    # 2件目の T0001 を変えても、最初の T0001 の行と取り違えない
+    tasks[1] = _task("T0001", "まったく別の話題 請求書のPDFを作る", "月末に送る")
+    index.refresh(tasks)
+    assert _references(tasks[0]) == ["T0002"]
+    assert _references(tasks[1]) == ["T0003"]
+    assert all(task["id"] not in _references(task) for task in tasks)
+
+
+GROUPS = [
+    "バックログの保存を高速化する 差分だけを書き出して保存時間を短くする",
+    "アーカイブを月ごとに圧縮する 日付別のファイルをまとめて容量を減らす",
+    "依存関係の索引を保存する 依存先から依存元を引けるようにする",
+]
+
+
+def _corpus():
+    tasks = []
+    for group, text in enumerate(GROUPS):
+        for variant in range(4):
+            tasks.append(_task(f"T{group * 10 + variant + 1:04d}", text + " " + "追記" * variant))
+    return tasks
+
+
+def _state(tasks, index):
+    similar = {task["id"]: [(e["task_id"], e["similarity_score"]) for e in task.get("similar_tasks", [])] for task in tasks}
+    neighbors = {key: index.get_neighbors(key) for key in index.positions}
+    return similar, neighbors
+
+
+def _assert_reciprocal(tasks):
+    listed = {task["id"]: {e["task_id"] for e in task.get("similar_tasks", [])} for task in tasks}
+    for task_id, others in listed.items():
+        assert len(others) < similarity.TOP_K
+        for other in others:
+            assert task_id in listed[other]
+
+
+def test_refresh_matches_rebuild_after_add_change_and_remove():
+    tasks = _corpus()
+    index, _ = similarity_index.rebuild(tasks)
+    _assert_reciprocal(tasks)
+
+    # 追加・変更・削除をまとめて反映する
+    tasks.append(_task("T0005", GROUPS[0] + " 新規"))
+    position = next(i for i, task in enumerate(tasks) if task["id"] == "T0012")
+    tasks[position] = dict(tasks[position], title=GROUPS[2] + " 移動")
+    tasks = [task for task in tasks if task["id"] != "T0023"]
+
+    assert index.refresh(tasks) > 0
+    expected_tasks = [{k: v for k, v in task.items() if k != "similar_tasks"} for task in tasks]
+    expected_index, _ = similarity_index.rebuild(expected_tasks)
+    assert _state(tasks, index) == _state(expected_tasks, expected_index)
+    _assert_reciprocal(tasks)
+
+    # 変わっていなければ何もしない
+    assert index.refresh(tasks) == 0
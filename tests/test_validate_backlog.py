@@ -0,0 +1,53 @@
+import pytest
+
+from manage_4digit_ids import IdRegistry
+from validate_backlog import (
+    is_valid_permanent_id,
+    is_valid_temp_id,
+    repair_ids,
+    validate_date,
+    validate_task,
+)
+
+
+def test_empty_ids_are_not_duplicates(capsys):
+    tasks = [{"id": ""}, {"id": ""}, {"id": ""}, {"id": "T0001"}]
+    assert repair_ids(tasks, IdRegistry(set(), {})) is False
+    assert [task["id"] for task in tasks] == ["", "", "", "T0001"]
+    assert "duplicate" not in capsys.readouterr().out
+
+
+def test_new_ids_skip_archived_ids():
+    # T0002 はアーカイブで使用中
+    registry = IdRegistry({"T0001", "T0002"}, {})
+    tasks = [{"id": "T0001"}, {"id": "T0001"}, {"id": "bad"}, {"id": ""}]
+    assert repair_ids(tasks, registry) is True
+    assert [task["id"] for task in tasks] == ["T0001", "T0003", "T0004", ""]
+
+
+# コンパイル済みのルールは、従来の validate_date / uuid.UUID による判定と同じ結果になる
+DATES = ["2025-01-01", "2025-01-01\n", "２０２５-０１-０１", "2025-02-30", "2025-1-1", "月曜", "2025/01/01", ""]
+UUID = "6f1c2d3e-4a5b-4c6d-8e7f-0a1b2c3d4e5f"
+PERMANENT_IDS = [UUID, UUID + "\n", UUID.upper(), "{" + UUID + "}", UUID.replace("-", ""), "６" + UUID[1:], ""]
+
+
+def _task(**fields):
+    return dict({"id": "T0001", "title": "t", "status": "open", "description": "d"}, **fields)
+
+
+@pytest.mark.parametrize("value", DATES)
+def test_date_rule_matches_old_validator(value):
+    errors = validate_task(_task(due_date=value))
+    assert bool(errors) == bool(validate_date(value))
+
+
+@pytest.mark.parametrize("value", PERMANENT_IDS)
+def test_permanent_id_rule_matches_old_validator(value):
+    errors = validate_task(_task(permanent_id=value))
+    assert bool(errors) == (not is_valid_permanent_id(value))
+
+
+@pytest.mark.parametrize("value", ["T0001\n", "T０００１", "T00001", "t0001"])
+def test_temporary_id_rejects_non_ascii_and_trailing_newline(value):
+    assert not is_valid_temp_id(value)
+    assert validate_task(_task(id=value))